@@ -0,0 +1,10 @@
+import os
+import sys
+
+
+# the src modules import the N+3 maps and cycle components from example_cycles/N+3ref by module
+# name, as the scripts do with both directories on PYTHONPATH. Spawned workers inherit sys.path
+ROOT = os.path.dirname(os.path.abspath(__file__))
+for path in (os.path.join(ROOT, "example_cycles", "N+3ref"), os.path.join(ROOT, "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -6,12 +6,18 @@ import openmdao.api as om
 import pycycle.api as pyc
 
 from small_core_eff_balance import SmallCoreEffBalance
+from cycle_comps import FanDiameter, SimpleOPR, ExtractionRatio, CoreSize, T4Ratio
 
-from N3_Fan_map import FanMap
-from N3_LPC_map import LPCMap
-from N3_HPC_map import HPCMap
-from N3_HPT_map import HPTMap
-from N3_LPT_map import LPTMap
+from batched_maps import batched_compressor_maps
+from map_registry import get_map, shared_map_interpolants
+
+# loaded once per process; every compressor and turbine of every point shares
+# the same arrays (and their interpolation tables when set up within shared_map_interpolants())
+FanMap = get_map('FanMap')
+LPCMap = get_map('LPCMap')
+HPCMap = get_map('HPCMap')
+HPTMap = get_map('HPTMap')
+LPTMap = get_map('LPTMap')
 
 
 class N3(pyc.Cycle):
@@ -91,12 +97,7 @@ class N3(pyc.Cycle):
         self.connect('fc.Fl_O:stat:P', 'core_nozz.Ps_exhaust')
         self.connect('fc.Fl_O:stat:P', 'byp_nozz.Ps_exhaust')
 
-        self.add_subsystem('ext_ratio', om.ExecComp('ER = core_V_ideal * core_Cv / ( byp_V_ideal *  byp_Cv )',
-                        core_V_ideal={'val':1000.0, 'units':'ft/s'},
-                        core_Cv={'val':0.98, 'units':None},
-                        byp_V_ideal={'val':1000.0, 'units':'ft/s'},
-                        byp_Cv={'val':0.98, 'units':None},
-                        ER={'val':1.4, 'units':None}))
+        self.add_subsystem('ext_ratio', ExtractionRatio())
 
         self.connect('core_nozz.ideal_flow.V', 'ext_ratio.core_V_ideal')
         self.connect('byp_nozz.ideal_flow.V', 'ext_ratio.byp_V_ideal')
@@ -152,12 +153,7 @@ class N3(pyc.Cycle):
             self.connect('balance.lpt_eff', 'lpt.eff')
             self.connect('lpt.eff_poly', 'balance.lhs:lpt_eff')
 
-            self.add_subsystem('hpc_CS',
-                    om.ExecComp('CS = Win *(power(Tout/518.67,0.5)/(Pout/14.696))',
-                            Win= {'val': 10.0, 'units':'lbm/s'},
-                            Tout={'val': 14.696, 'units':'degR'},
-                            Pout={'val': 518.67, 'units':'psi'},
-                            CS={'val': 10.0, 'units':'lbm/s'}))
+            self.add_subsystem('hpc_CS', CoreSize())
             self.connect('duct25.Fl_O:stat:W', 'hpc_CS.Win')
             self.connect('hpc.Fl_O:tot:T', 'hpc_CS.Tout')
             self.connect('hpc.Fl_O:tot:P', 'hpc_CS.Pout')
@@ -166,17 +162,10 @@ class N3(pyc.Cycle):
             self.connect('hpc.eff_poly', 'hpc_EtaBalance.eta_p')
             self.connect('hpc_EtaBalance.eta_a', 'hpc.eff')
 
-            self.add_subsystem('fan_dia', om.ExecComp('FanDia = 2.0*(area/(pi*(1.0-hub_tip**2.0)))**0.5',
-                            area={'val':7000.0, 'units':'inch**2'},
-                            hub_tip={'val':0.3125, 'units':None},
-                            FanDia={'val':100.0, 'units':'inch'}))
+            self.add_subsystem('fan_dia', FanDiameter())
             self.connect('inlet.Fl_O:stat:area', 'fan_dia.area')
 
-            self.add_subsystem('opr_calc', om.ExecComp('OPR_simple = FPR*LPCPR*HPCPR',
-                            FPR={'val':1.3, 'units':None},
-                            LPCPR={'val':3.0, 'units':None},
-                            HPCPR={'val':14.0, 'units':None},
-                            OPR_simple={'val':55.0, 'units':None}))
+            self.add_subsystem('opr_calc', SimpleOPR())
 
 
             # order_add = ['hpc_CS', 'fan_dia', 'opr_calc']
@@ -354,6 +343,10 @@ class MPN3(pyc.MPCycle):
         self.pyc_add_pnt('TOC', N3(), promotes_inputs=[('fan.PR', 'fan:PRdes'), ('lpc.PR', 'lpc:PRdes'),
                                                         ('opr_calc.FPR', 'fan:PRdes'), ('opr_calc.LPCPR', 'lpc:PRdes')])
 
+        # the compressors and opr_calc default to different pressure ratios
+        self.set_input_defaults('fan:PRdes', 1.300)
+        self.set_input_defaults('lpc:PRdes', 3.000)
+
         # POINT 1: Top-of-climb (TOC)
         self.set_input_defaults('TOC.fc.alt', 35000., units='ft'),
         self.set_input_defaults('TOC.fc.MN', 0.8),
@@ -485,11 +478,7 @@ class MPN3(pyc.MPCycle):
         self.connect('RTO.balance.hpt_chrg_cool_frac', 'CRZ.bld3.bld_exit:frac_W')
         self.connect('RTO.balance.hpt_nochrg_cool_frac', 'CRZ.bld3.bld_inlet:frac_W')
 
-        self.add_subsystem('T4_ratio',
-                             om.ExecComp('TOC_T4 = RTO_T4*TR',
-                                         RTO_T4={'val': 3400.0, 'units':'degR'},
-                                         TOC_T4={'val': 3150.0, 'units':'degR'},
-                                         TR={'val': 0.926470588, 'units': None}), promotes_inputs=['RTO_T4',])
+        self.add_subsystem('T4_ratio', T4Ratio(), promotes_inputs=['RTO_T4',])
         self.connect('T4_ratio.TOC_T4', 'TOC.balance.rhs:FAR')
         initial_order = ['T4_ratio', 'TOC', 'RTO', 'SLS', 'CRZ']
         self.set_order(self.options['order_start'] + initial_order + self.options['order_add'])
@@ -552,7 +541,8 @@ if __name__ == "__main__":
         "*.Wc", "*.map.scalars.PR", "*.map.scalars.eff", "*.Wp"
     ]
 
-    prob.setup()
+    with shared_map_interpolants(), batched_compressor_maps():
+        prob.setup()
 
     # Define the design point
     prob.set_val('TOC.fc.W', 820.44097898, units='lbm/s')
@@ -0,0 +1,191 @@
+import contextlib
+import inspect
+
+import numpy as np
+import openmdao.api as om
+from openmdao.components.interp_util.outofbounds_error import OutOfBoundsError
+
+import pycycle.elements.compressor as compressor
+from pycycle.elements.compressor_map import MapScalars, ScaledMapValues, StallCalcs
+
+from map_registry import shared_interp
+
+
+class MapLookups(om.ExplicitComponent):
+    """
+    Several lookups of one map evaluated together: each output of the map is interpolated at
+    every lookup point in a single vectorised call, which also gives the derivatives of all
+    points. `lookups` maps the prefix of each lookup's outputs to the input giving each map
+    parameter; inputs may be shared between lookups.
+    """
+
+    def initialize(self):
+        self.options.declare('map_data')
+        self.options.declare('lookups', types=dict,
+                             desc='output prefix -> {map parameter: input name} of each lookup')
+        self.options.declare('interp_method', default='slinear')
+        self.options.declare('extrap', default=False)
+
+    def setup(self):
+        map_data = self.options['map_data']
+        lookups = self.options['lookups']
+
+        self._params = [p['name'] for p in map_data.param_data]
+        self._input_names = list(dict.fromkeys(names[p] for names in lookups.values() for p in self._params))
+        # position of the input of each parameter of each lookup, shape (lookups, parameters)
+        self._input_index = np.array([[self._input_names.index(names[p]) for p in self._params]
+                                for names in lookups.values()])
+
+        for p in map_data.param_data:
+            for name in dict.fromkeys(names[p['name']] for names in lookups.values()):
+                self.add_input(name, val=p['default'], units=p['units'])
+
+        self._last_x = None
+        self._grads = {}
+        self._interps = {}
+        for o in map_data.output_data:
+            for prefix in lookups:
+                self.add_output(prefix + o['name'], val=o['default'], units=o['units'])
+            self._interps[o['name']] = shared_interp(
+                [p['values'] for p in map_data.param_data], o['values'],
+                self.options['interp_method'], self.options['extrap'])
+
+        for prefix, names in lookups.items():
+            for o in self._interps:
+                self.declare_partials(prefix + o, list(dict.fromkeys(names.values())))
+
+        if self.options['interp_method'] == 'slinear':
+            # as in MetaModelStructuredComp, a point exactly on the grid takes the slope of the
+            # bin behind it, e.g. the SMN and SMW lookups on the stall R line
+            self.set_check_partial_options('*', form='backward')
+
+    def _interpolate(self, x, out_name):
+        # values and derivatives at every lookup point
+        try:
+            return self._interps[out_name].interpolate(x[self._input_index], compute_derivative=True)
+        except OutOfBoundsError as err:
+            raise om.AnalysisError(f"{self.msginfo}: Error interpolating output '{out_name}' because "
+                                   f"map parameter '{self._params[err.idx]}' was out of bounds "
+                                   f"('{err.lower}', '{err.upper}') with value '{err.value}'",
+                                   inspect.currentframe(), self.msginfo)
+
+    def compute(self, inputs, outputs):
+        x = np.array([inputs[name][0] for name in self._input_names])
+        for o in self._interps:
+            vals, self._grads[o] = self._interpolate(x, o)
+            for prefix, val in zip(self.options['lookups'], vals):
+                outputs[prefix + o] = val
+        self._last_x = x
+
+    def compute_partials(self, inputs, J):
+        x = np.array([inputs[name][0] for name in self._input_names])
+        for o in self._interps:
+            # the derivatives of the last compute(), normally at these inputs
+            if not np.array_equal(x, self._last_x):
+                self._grads[o] = self._interpolate(x, o)[1]
+            grad = self._grads[o]
+
+            for k, (prefix, names) in enumerate(self.options['lookups'].items()):
+                partials = dict.fromkeys(names.values(), 0.0)
+                for j, p in enumerate(self._params):
+                    partials[names[p]] += grad[k, j]
+                for name, val in partials.items():
+                    J[prefix + o, name] = val
+
+
+class BatchedCompressorMap(om.Group):
+    """
+    Drop-in for pyCycle's CompressorMap with the same variables and solver structure, where the
+    operating point and the two stall margin lookups (SMN at the stall R line for the current
+    speed, SMW at the stall R line for the current corrected flow) are done by one MapLookups
+    'map' component instead of three separate map components. The SMN and SMW map values are
+    the map.SMN:* and map.SMW:* outputs.
+    """
+
+    def initialize(self):
+        self.options.declare('map_data')
+        self.options.declare('design', default=True)
+        self.options.declare('interp_method', default='slinear')
+        self.options.declare('extrap', default=False)
+
+    def setup(self):
+        map_data = self.options['map_data']
+        design = self.options['design']
+
+        # Define the Rline corresponding to stall
+        RlineStall = om.IndepVarComp()
+        RlineStall.add_output('RlineStall', val=map_data.RlineStall, units=None)
+        self.add_subsystem('stall_R', subsys=RlineStall)
+
+        lookups = {
+            '': {'alphaMap': 'alphaMap', 'NcMap': 'NcMap', 'RlineMap': 'RlineMap'},
+            'SMN:': {'alphaMap': 'alphaMap', 'NcMap': 'NcMap', 'RlineMap': 'RlineStall'},
+            'SMW:': {'alphaMap': 'alphaMap', 'NcMap': 'SMW:NcMap', 'RlineMap': 'RlineStall'},
+        }
+        readmap = MapLookups(map_data=map_data, lookups=lookups,
+                             interp_method=self.options['interp_method'], extrap=self.options['extrap'])
+        self.add_subsystem('map', readmap, promotes_inputs=['RlineMap', 'NcMap', 'alphaMap'],
+                           promotes_outputs=['effMap', 'PRmap', 'WcMap'])
+        self.connect('stall_R.RlineStall', 'map.RlineStall')
+
+        if design:
+            # In design mode, operating point specified by default values for RlineMap, NcMap and alphaMap
+            self.set_input_defaults('RlineMap', val=map_data.defaults['RlineMap'], units=None)
+            self.set_input_defaults('NcMap', val=map_data.defaults['NcMap'], units='rpm')
+
+            # Compute map scalars based on input PR, eff, Nc and Wc as well as unscaled map values
+            self.add_subsystem('scalars', MapScalars(),
+                               promotes_inputs=['PR', 'eff', 'Nc', 'Wc', 'NcMap', 'effMap', 'PRmap', 'WcMap'],
+                               promotes_outputs=['s_Nc', 's_PR', 's_eff', 's_Wc'])
+
+        else:
+            # Compute scaled map outputs base on input scalars and unscaled map values
+            self.add_subsystem('scaledOutput', ScaledMapValues(),
+                               promotes_inputs=['s_PR', 's_eff', 's_Wc', 's_Nc', 'NcMap', 'effMap', 'PRmap', 'WcMap'],
+                               promotes_outputs=['PR', 'eff'])
+
+            # Use balance component to vary NcMap and RlineMap to match incoming corrected flow and speed
+            map_bal = om.BalanceComp()
+            map_bal.add_balance('NcMap', val=map_data.defaults['NcMap'], units='rpm', eq_units='rpm')
+            map_bal.add_balance('RlineMap', val=map_data.defaults['RlineMap'], units=None,
+                                eq_units='lbm/s', lower=map_data.RlineStall)
+            self.add_subsystem(name='map_bal', subsys=map_bal,
+                               promotes_inputs=[('lhs:NcMap', 'Nc'), ('lhs:RlineMap', 'Wc')],
+                               promotes_outputs=['NcMap', 'RlineMap'])
+            self.connect('scaledOutput.Nc', 'map_bal.rhs:NcMap')
+            self.connect('scaledOutput.Wc', 'map_bal.rhs:RlineMap')
+
+        # Use balance to vary NcMap on SMW map to hold corrected flow constant
+        SMW_bal = om.BalanceComp()
+        SMW_bal.add_balance('NcMap', val=map_data.defaults['NcMap'], units='rpm', eq_units='lbm/s')
+        self.add_subsystem(name='SMW_bal', subsys=SMW_bal)
+        self.connect('SMW_bal.NcMap', 'map.SMW:NcMap')
+        self.connect('WcMap', 'SMW_bal.lhs:NcMap')
+        self.connect('map.SMW:WcMap', 'SMW_bal.rhs:NcMap')
+
+        # Compute the stall margins
+        self.add_subsystem('stall_margins', StallCalcs(),
+                           promotes_inputs=[('PR_actual', 'PRmap'), ('Wc_actual', 'WcMap')],
+                           promotes_outputs=['SMN', 'SMW'])
+        self.connect('map.SMN:PRmap', 'stall_margins.PR_SMN')
+        self.connect('map.SMW:PRmap', 'stall_margins.PR_SMW')
+        self.connect('map.SMN:WcMap', 'stall_margins.Wc_SMN')
+
+
+@contextlib.contextmanager
+def batched_compressor_maps():
+    """
+    Within the block, every pyc.Compressor set up is built with a BatchedCompressorMap, so each
+    Newton iteration of a point makes one vectorised map evaluation per compressor instead of
+    three. Turbines make a single map lookup per point and are left as they are. The maps are
+    built when the compressors are set up, so wrap Problem.setup():
+
+        with batched_compressor_maps():
+            prob.setup()
+    """
+    original = compressor.CompressorMap
+    compressor.CompressorMap = BatchedCompressorMap
+    try:
+        yield
+    finally:
+        compressor.CompressorMap = original
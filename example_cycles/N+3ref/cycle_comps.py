@@ -0,0 +1,129 @@
+import numpy as np
+
+import openmdao.api as om
+
+
+""" Small cycle calculations as explicit components with analytic partials, in place of ExecComps """
+
+
+class FanDiameter(om.ExplicitComponent):
+    """ Fan tip diameter from the inlet flow area and the hub to tip ratio. """
+
+    def setup(self):
+        self.add_input('area', val=7000.0, units='inch**2', desc='inlet flow area')
+        self.add_input('hub_tip', val=0.3125, units=None, desc='fan hub to tip radius ratio')
+
+        self.add_output('FanDia', val=100.0, units='inch', desc='fan tip diameter')
+
+        self.declare_partials('FanDia', ['area', 'hub_tip'])
+
+    def compute(self, inputs, outputs):
+        outputs['FanDia'] = 2.0 * (inputs['area'] / (np.pi * (1.0 - inputs['hub_tip']**2)))**0.5
+
+    def compute_partials(self, inputs, J):
+        area = inputs['area']
+        hub_tip = inputs['hub_tip']
+        dia = 2.0 * (area / (np.pi * (1.0 - hub_tip**2)))**0.5
+
+        J['FanDia', 'area'] = 0.5 * dia / area
+        J['FanDia', 'hub_tip'] = dia * hub_tip / (1.0 - hub_tip**2)
+
+
+class SimpleOPR(om.ExplicitComponent):
+    """ Overall pressure ratio as the product of the fan, LPC and HPC pressure ratios. """
+
+    def setup(self):
+        self.add_input('FPR', val=1.3, units=None, desc='fan pressure ratio')
+        self.add_input('LPCPR', val=3.0, units=None, desc='LPC pressure ratio')
+        self.add_input('HPCPR', val=14.0, units=None, desc='HPC pressure ratio')
+
+        self.add_output('OPR_simple', val=55.0, units=None, desc='overall pressure ratio')
+
+        self.declare_partials('OPR_simple', ['FPR', 'LPCPR', 'HPCPR'])
+
+    def compute(self, inputs, outputs):
+        outputs['OPR_simple'] = inputs['FPR'] * inputs['LPCPR'] * inputs['HPCPR']
+
+    def compute_partials(self, inputs, J):
+        FPR = inputs['FPR']
+        LPCPR = inputs['LPCPR']
+        HPCPR = inputs['HPCPR']
+
+        J['OPR_simple', 'FPR'] = LPCPR * HPCPR
+        J['OPR_simple', 'LPCPR'] = FPR * HPCPR
+        J['OPR_simple', 'HPCPR'] = FPR * LPCPR
+
+
+class ExtractionRatio(om.ExplicitComponent):
+    """ Ratio of the core to the bypass nozzle exit velocity. """
+
+    def setup(self):
+        self.add_input('core_V_ideal', val=1000.0, units='ft/s', desc='ideal core nozzle exit velocity')
+        self.add_input('core_Cv', val=0.98, units=None, desc='core nozzle velocity coefficient')
+        self.add_input('byp_V_ideal', val=1000.0, units='ft/s', desc='ideal bypass nozzle exit velocity')
+        self.add_input('byp_Cv', val=0.98, units=None, desc='bypass nozzle velocity coefficient')
+
+        self.add_output('ER', val=1.4, units=None, desc='extraction ratio')
+
+        self.declare_partials('ER', ['core_V_ideal', 'core_Cv', 'byp_V_ideal', 'byp_Cv'])
+
+    def compute(self, inputs, outputs):
+        outputs['ER'] = inputs['core_V_ideal'] * inputs['core_Cv'] / (inputs['byp_V_ideal'] * inputs['byp_Cv'])
+
+    def compute_partials(self, inputs, J):
+        core_V = inputs['core_V_ideal']
+        core_Cv = inputs['core_Cv']
+        byp_V = inputs['byp_V_ideal']
+        byp_Cv = inputs['byp_Cv']
+        ER = core_V * core_Cv / (byp_V * byp_Cv)
+
+        J['ER', 'core_V_ideal'] = core_Cv / (byp_V * byp_Cv)
+        J['ER', 'core_Cv'] = core_V / (byp_V * byp_Cv)
+        J['ER', 'byp_V_ideal'] = -ER / byp_V
+        J['ER', 'byp_Cv'] = -ER / byp_Cv
+
+
+class CoreSize(om.ExplicitComponent):
+    """ Core size: the flow at the HPC exit corrected to standard day conditions. """
+
+    def setup(self):
+        self.add_input('Win', val=10.0, units='lbm/s', desc='HPC flow')
+        self.add_input('Tout', val=14.696, units='degR', desc='HPC exit total temperature')
+        self.add_input('Pout', val=518.67, units='psi', desc='HPC exit total pressure')
+
+        self.add_output('CS', val=10.0, units='lbm/s', desc='core size')
+
+        self.declare_partials('CS', ['Win', 'Tout', 'Pout'])
+
+    def compute(self, inputs, outputs):
+        outputs['CS'] = inputs['Win'] * (inputs['Tout'] / 518.67)**0.5 / (inputs['Pout'] / 14.696)
+
+    def compute_partials(self, inputs, J):
+        Win = inputs['Win']
+        Tout = inputs['Tout']
+        Pout = inputs['Pout']
+        dCS_dWin = (Tout / 518.67)**0.5 / (Pout / 14.696)
+        CS = Win * dCS_dWin
+
+        J['CS', 'Win'] = dCS_dWin
+        J['CS', 'Tout'] = 0.5 * CS / Tout
+        J['CS', 'Pout'] = -CS / Pout
+
+
+class T4Ratio(om.ExplicitComponent):
+    """ Top of climb T4 as a fraction of the rolling takeoff T4. """
+
+    def setup(self):
+        self.add_input('RTO_T4', val=3400.0, units='degR', desc='rolling takeoff T4')
+        self.add_input('TR', val=0.926470588, units=None, desc='top of climb to rolling takeoff T4 ratio')
+
+        self.add_output('TOC_T4', val=3150.0, units='degR', desc='top of climb T4')
+
+        self.declare_partials('TOC_T4', ['RTO_T4', 'TR'])
+
+    def compute(self, inputs, outputs):
+        outputs['TOC_T4'] = inputs['RTO_T4'] * inputs['TR']
+
+    def compute_partials(self, inputs, J):
+        J['TOC_T4', 'RTO_T4'] = inputs['TR']
+        J['TOC_T4', 'TR'] = inputs['RTO_T4']
@@ -0,0 +1,121 @@
+import contextlib
+import copy
+import importlib.util
+import os
+
+import numpy as np
+import openmdao.api as om
+import pycycle.api as pyc
+from openmdao.components.interp_util.interp import InterpND
+
+
+MAP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# map name -> module of this directory defining it
+MAP_MODULES = {
+    'FanMap': 'N3_Fan_map',
+    'LPCMap': 'N3_LPC_map',
+    'HPCMap': 'N3_HPC_map',
+    'HPTMap': 'N3_HPT_map',
+    'LPTMap': 'N3_LPT_map',
+}
+
+_maps = {}
+_interps = {}
+
+
+def _import_map(name):
+    path = os.path.join(MAP_DIR, MAP_MODULES[name] + '.py')
+    spec = importlib.util.spec_from_file_location(MAP_MODULES[name], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, name)
+
+
+def get_map(name):
+    """
+    MapData of the N+3 map `name` (one of MAP_MODULES, e.g. 'HPTMap'), loaded once per process.
+    The arrays are read only, as every element using the map shares them.
+    """
+    if name not in _maps:
+        map_data = _import_map(name)
+        for val in vars(map_data).values():
+            if isinstance(val, np.ndarray):
+                val.flags.writeable = False
+        _maps[name] = map_data
+    return _maps[name]
+
+
+def shared_interp(points, values, method, extrapolate):
+    """
+    InterpND of one map output for the private use of one component. The checked grid and table of each distinct map output
+    are built once; a component gets copies of the table objects (they keep the state of the
+    last evaluation) that share the grid and value arrays.
+    """
+    key = (tuple(id(p) for p in points), id(values), method, extrapolate)
+    if key not in _interps:
+        # the arrays are kept alive with the entry, so their ids stay unique
+        _interps[key] = (points, values, InterpND(method=method, points=points, values=values,
+                                                  extrapolate=extrapolate))
+    interp = copy.copy(_interps[key][2])
+
+    table = interp.table = copy.copy(interp.table)
+    while table.subtable is not None:
+        table.subtable = copy.copy(table.subtable)
+        table = table.subtable
+    return interp
+
+
+def register_map(name, map_data):
+    """
+    Add an already loaded MapData, e.g. one of the maps bundled with pyCycle, to the registry
+    so shared_map_interpolants() covers it too
+    """
+    _maps.setdefault(name, map_data)
+    return _maps[name]
+
+
+def _registered(arr):
+    return any(arr is val for map_data in _maps.values() for val in vars(map_data).values())
+
+
+_setup_var_data = om.MetaModelStructuredComp._setup_var_data
+
+
+def _shared_setup_var_data(self):
+    if self.options['training_data_gradients'] or \
+            not all(_registered(p) for p in self.inputs + list(self.training_outputs.values())):
+        return _setup_var_data(self)
+
+    for name, train_data in self.training_outputs.items():
+        self.interps[name] = shared_interp(self.inputs, train_data, self.options['method'],
+                                           self.options['extrapolate'])
+
+    # the rest of MetaModelStructuredComp._setup_var_data, with the interps already in place
+    super(om.MetaModelStructuredComp, self)._setup_var_data()
+
+
+@contextlib.contextmanager
+def shared_map_interpolants():
+    """
+    Within the block, every map component (pyCycle builds an om.MetaModelStructuredComp per map
+    lookup of each Compressor and Turbine, e.g. 4 per compressor of an off-design point) set up
+    reuses the interpolation tables of the registry maps instead of rebuilding them. The maps of
+    get_map() and register_map() are shared, including pyCycle's own pyc.FanMap, pyc.HPTMap etc.,
+    others are set up as usual. Sharing happens when the components are set up, so wrap
+    Problem.setup():
+
+        with shared_map_interpolants():
+            prob.setup()
+
+    The tables are shared within the process only; every process loads its own copy of the maps.
+    """
+    for name in ('FanMap', 'LPCMap', 'HPCMap', 'HPTMap', 'LPTMap'):
+        register_map(f'pyc.{name}', getattr(pyc, name))
+
+    original = om.MetaModelStructuredComp._setup_var_data
+    om.MetaModelStructuredComp._setup_var_data = _shared_setup_var_data
+    try:
+        yield
+    finally:
+        om.MetaModelStructuredComp._setup_var_data = original
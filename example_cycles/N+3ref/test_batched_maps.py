@@ -0,0 +1,81 @@
+import unittest
+
+import openmdao.api as om
+from openmdao.utils.assert_utils import assert_check_partials, assert_near_equal
+from pycycle.elements.compressor_map import CompressorMap
+
+from batched_maps import BatchedCompressorMap, MapLookups
+from map_registry import get_map
+
+
+# inputs of a compressor map at the HPC design point
+DESIGN_INPUTS = {'PR': 14.0, 'eff': 0.87, 'Nc': (9800.0, 'rpm'), 'Wc': (25.0, 'lbm/s'), 'alphaMap': 0.0}
+
+
+def _map_problem(map_class, design, inputs):
+    prob = om.Problem(reports=False)
+    # extrapolated, as the N3ref compressors are
+    comp_map = map_class(map_data=get_map('HPCMap'), design=design, extrap=True)
+    prob.model.add_subsystem('map', comp_map, promotes=['*'])
+    newton = prob.model.nonlinear_solver = om.NewtonSolver(solve_subsystems=True, atol=1e-12, rtol=1e-12,
+                                                           maxiter=30, iprint=-1)
+    newton.linesearch = om.BoundsEnforceLS()
+    prob.model.linear_solver = om.DirectSolver()
+    prob.setup(force_alloc_complex=True)
+    for name, val in inputs.items():
+        val, units = val if isinstance(val, tuple) else (val, None)
+        prob.set_val(name, val, units=units)
+    prob.run_model()
+    return prob
+
+
+def _od_inputs():
+    # the map scalars of the design point, run at a lower speed and flow
+    prob = _map_problem(CompressorMap, True, DESIGN_INPUTS)
+    inputs = {name: prob.get_val(name)[0] for name in ('s_PR', 's_eff', 's_Wc', 's_Nc')}
+    inputs.update({'Nc': (9600.0, 'rpm'), 'Wc': (22.8, 'lbm/s'), 'alphaMap': 0.0})
+    return inputs
+
+
+class BatchedMapsTestCase(unittest.TestCase):
+
+    def test_map_lookups_partials(self):
+        map_data = get_map('HPCMap')
+        lookups = {
+            '': {'alphaMap': 'alphaMap', 'NcMap': 'NcMap', 'RlineMap': 'RlineMap'},
+            'SMN:': {'alphaMap': 'alphaMap', 'NcMap': 'NcMap', 'RlineMap': 'RlineStall'},
+        }
+        prob = om.Problem(reports=False)
+        prob.model.add_subsystem('map', MapLookups(map_data=map_data, lookups=lookups))
+        prob.setup(force_alloc_complex=True)
+        prob.set_val('map.alphaMap', 30.0)
+        prob.set_val('map.NcMap', 0.87, units='rpm')
+        prob.set_val('map.RlineMap', 2.13)
+        prob.set_val('map.RlineStall', 1.07)
+        prob.run_model()
+
+        # backward differences, see MapLookups.setup; exact for a point inside a map cell
+        assert_check_partials(prob.check_partials(out_stream=None), atol=1e-6, rtol=1e-6)
+
+    def test_matches_compressor_map(self):
+        for design, inputs in ((True, DESIGN_INPUTS), (False, _od_inputs())):
+            with self.subTest(design=design):
+                batched = _map_problem(BatchedCompressorMap, design, inputs)
+                ref = _map_problem(CompressorMap, design, inputs)
+
+                names = ['NcMap', 'RlineMap', 'effMap', 'PRmap', 'WcMap', 'SMN', 'SMW']
+                names += ['s_Nc', 's_PR', 's_eff', 's_Wc'] if design else ['PR', 'eff']
+                for name in names:
+                    assert_near_equal(batched.get_val(name), ref.get_val(name), 1e-10)
+                for name in ['PRmap', 'WcMap']:
+                    assert_near_equal(batched.get_val(f'map.SMN:{name}'), ref.get_val(f'SMN_map.{name}'), 1e-10)
+                    assert_near_equal(batched.get_val(f'map.SMW:{name}'), ref.get_val(f'SMW_map.{name}'), 1e-10)
+
+                of = names[2:]
+                totals = batched.compute_totals(of, list(inputs))
+                for key, val in ref.compute_totals(of, list(inputs)).items():
+                    assert_near_equal(totals[key], val, 1e-10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+
+import openmdao.api as om
+from openmdao.utils.assert_utils import assert_check_partials, assert_near_equal
+
+from cycle_comps import FanDiameter, SimpleOPR, ExtractionRatio, CoreSize, T4Ratio
+
+
+# component -> (the ExecComp expression it replaces, inputs at a typical operating point)
+CASES = {
+    FanDiameter: ('FanDia = 2.0*(area/(pi*(1.0-hub_tip**2.0)))**0.5',
+                  {'area': 6200.0, 'hub_tip': 0.3125}),
+    SimpleOPR: ('OPR_simple = FPR*LPCPR*HPCPR',
+                {'FPR': 1.45, 'LPCPR': 1.9, 'HPCPR': 14.3}),
+    ExtractionRatio: ('ER = core_V_ideal * core_Cv / ( byp_V_ideal *  byp_Cv )',
+                      {'core_V_ideal': 1420.0, 'core_Cv': 0.9999, 'byp_V_ideal': 1010.0, 'byp_Cv': 0.9975}),
+    CoreSize: ('CS = Win *(power(Tout/518.67,0.5)/(Pout/14.696))',
+               {'Win': 43.0, 'Tout': 1480.0, 'Pout': 250.0}),
+    T4Ratio: ('TOC_T4 = RTO_T4*TR',
+              {'RTO_T4': 3400.0, 'TR': 0.926470588}),
+}
+
+
+def _problem(comp, inputs):
+    prob = om.Problem(reports=False)
+    prob.model.add_subsystem('comp', comp)
+    prob.setup(force_alloc_complex=True)
+    for name, val in inputs.items():
+        prob.set_val(f'comp.{name}', val)
+    prob.run_model()
+    return prob
+
+
+class CycleCompsTestCase(unittest.TestCase):
+
+    def test_partials(self):
+        for comp_class, (expr, inputs) in CASES.items():
+            with self.subTest(comp_class.__name__):
+                prob = _problem(comp_class(), inputs)
+                data = prob.check_partials(method='cs', out_stream=None)
+                assert_check_partials(data, atol=1e-10, rtol=1e-10)
+
+    def test_matches_exec_comp(self):
+        for comp_class, (expr, inputs) in CASES.items():
+            with self.subTest(comp_class.__name__):
+                comp = comp_class()
+                prob = _problem(comp, inputs)
+
+                out = expr.split('=')[0].strip()
+                ref = _problem(om.ExecComp(expr, **{name: {'units': meta['units']}
+                                                    for name, meta in comp.get_io_metadata(metadata_keys=['units']).items()}),
+                               inputs)
+                assert_near_equal(prob.get_val(f'comp.{out}'), ref.get_val(f'comp.{out}'), 1e-14)
+
+    def test_partials_off_design(self):
+        # away from the design point, where the hub to tip and velocity ratios change
+        rng = np.random.default_rng(0)
+        for comp_class, (expr, inputs) in CASES.items():
+            with self.subTest(comp_class.__name__):
+                perturbed = {name: val * rng.uniform(0.7, 1.3) for name, val in inputs.items()}
+                prob = _problem(comp_class(), perturbed)
+                data = prob.check_partials(method='cs', out_stream=None)
+                assert_check_partials(data, atol=1e-10, rtol=1e-10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+import openmdao.api as om
+from openmdao.utils.assert_utils import assert_near_equal
+
+import map_registry
+from map_registry import get_map, shared_map_interpolants
+
+
+# map -> operating points the two components of each map are evaluated at
+CASES = {
+    'HPCMap': [{'alphaMap': 0.0, 'NcMap': 0.93, 'RlineMap': 2.1},
+               {'alphaMap': 0.0, 'NcMap': 0.71, 'RlineMap': 1.55}],
+    'HPTMap': [{'alphaMap': 1.0, 'NpMap': 97.0, 'PRmap': 4.6},
+               {'alphaMap': 1.0, 'NpMap': 64.0, 'PRmap': 7.1}],
+}
+
+
+def _map_comp(map_data):
+    # as pyCycle's CompressorMap and TurbineMap build them
+    comp = om.MetaModelStructuredComp(method='slinear', extrapolate=False)
+    for p in map_data.param_data:
+        comp.add_input(p['name'], val=p['default'], units=p['units'], training_data=p['values'])
+    for o in map_data.output_data:
+        comp.add_output(o['name'], val=o['default'], units=o['units'], training_data=o['values'])
+    return comp
+
+
+def _problem(shared):
+    # two components per map, at different points, as the map and stall margin lookups of a compressor
+    prob = om.Problem(reports=False)
+    for name, points in CASES.items():
+        for i in range(len(points)):
+            prob.model.add_subsystem(f'{name}_{i}', _map_comp(get_map(name)))
+
+    if shared:
+        with shared_map_interpolants():
+            prob.setup(force_alloc_complex=True)
+    else:
+        prob.setup(force_alloc_complex=True)
+
+    for name, points in CASES.items():
+        for i, point in enumerate(points):
+            for var, val in point.items():
+                prob.set_val(f'{name}_{i}.{var}', val)
+    prob.run_model()
+    return prob
+
+
+class MapRegistryTestCase(unittest.TestCase):
+
+    def test_get_map(self):
+        for name in map_registry.MAP_MODULES:
+            with self.subTest(name):
+                map_data = get_map(name)
+                self.assertIs(get_map(name), map_data)
+                for entry in map_data.param_data + map_data.output_data:
+                    self.assertIs(entry['values'], getattr(map_data, entry['name']))
+                    self.assertFalse(entry['values'].flags.writeable)
+
+    def test_shared_interpolants(self):
+        original = om.MetaModelStructuredComp._setup_var_data
+        shared = _problem(shared=True)
+        self.assertIs(om.MetaModelStructuredComp._setup_var_data, original)
+        plain = _problem(shared=False)
+
+        # the components of one map copy its registry interpolant, but not the state of their last evaluation
+        cached = [entry[2] for key, entry in map_registry._interps.items()
+                  if entry[1] is get_map('HPCMap').WcMap and key[2:] == ('slinear', False)]
+        self.assertEqual(len(cached), 1)
+        interp = [shared.model._get_subsystem(f'HPCMap_{i}').interps['WcMap'] for i in range(2)]
+        self.assertIsNot(interp[0].table, interp[1].table)
+        self.assertIsNot(interp[0].table, cached[0].table)
+
+        for name, val in plain.model.list_outputs(out_stream=None, return_format='dict').items():
+            assert_near_equal(shared.get_val(name), val['val'], 1e-15)
+
+        data = shared.check_partials(method='cs', out_stream=None)
+        ref = plain.check_partials(method='cs', out_stream=None)
+        for comp, partials in ref.items():
+            for key, vals in partials.items():
+                assert_near_equal(data[comp][key]['J_fwd'], vals['J_fwd'], 1e-15)
+                assert_near_equal(data[comp][key]['J_fd'], vals['J_fd'], 1e-15)
+
+
+if __name__ == '__main__':
+    unittest.main()
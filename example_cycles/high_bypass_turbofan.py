@@ -6,12 +6,17 @@ import openmdao.api as om
 
 import pycycle.api as pyc
 
+from tab_thermo_format import load_tab_thermo
+
 
 class HBTF(pyc.Cycle):
 
     def initialize(self):
         # Initialize the model here by setting option variables such as a switch for design vs off-des cases
         self.options.declare('throttle_mode', default='T4', values=['T4', 'percent_thrust'])
+        self.options.declare('thermo_table', default=None, allow_none=True,
+                             desc='tabular thermo data, or the path of a table written by save_tab_thermo '
+                                  '(e.g. the refined air_jetA_adaptive.tab), used instead of CEA when given')
 
         super().initialize()
 
@@ -22,10 +27,12 @@ class HBTF(pyc.Cycle):
         #Create any relavent short hands here:
         design = self.options['design']
         
-        USE_TABULAR = False
-        if USE_TABULAR: 
+        thermo_table = self.options['thermo_table']
+        if thermo_table is not None: 
+            if isinstance(thermo_table, str):
+                thermo_table = load_tab_thermo(thermo_table)
             self.options['thermo_method'] = 'TABULAR'
-            self.options['thermo_data'] = pyc.AIR_JETA_TAB_SPEC
+            self.options['thermo_data'] = thermo_table
             FUEL_TYPE = 'FAR'
         else: 
             self.options['thermo_method'] = 'CEA'
@@ -293,9 +300,17 @@ def viewer(prob, pt, file=sys.stdout):
 
 class MPhbtf(pyc.MPCycle):
 
+    def initialize(self):
+        self.options.declare('thermo_table', default=None, allow_none=True,
+                             desc='thermo_table of every HBTF point, CEA when None')
+
+        super().initialize()
+
     def setup(self):
 
-        self.pyc_add_pnt('DESIGN', HBTF(thermo_method='CEA')) # Create an instace of the High Bypass ratio Turbofan
+        thermo_table = self.options['thermo_table']
+
+        self.pyc_add_pnt('DESIGN', HBTF(thermo_method='CEA', thermo_table=thermo_table)) # Create an instace of the High Bypass ratio Turbofan
 
         self.set_input_defaults('DESIGN.inlet.MN', 0.751)
         self.set_input_defaults('DESIGN.fan.MN', 0.4578)
@@ -353,13 +368,13 @@ class MPhbtf(pyc.MPCycle):
         self.od_Fn_target = [5500.0, 5300]
         self.od_dTs = [0.0, 0.0]
 
-        self.pyc_add_pnt('OD_full_pwr', HBTF(design=False, thermo_method='CEA', throttle_mode='T4'))
+        self.pyc_add_pnt('OD_full_pwr', HBTF(design=False, thermo_method='CEA', throttle_mode='T4', thermo_table=thermo_table))
 
         self.set_input_defaults('OD_full_pwr.fc.MN', 0.8)
         self.set_input_defaults('OD_full_pwr.fc.alt', 35000, units='ft')
         self.set_input_defaults('OD_full_pwr.fc.dTs', 0., units='degR')
 
-        self.pyc_add_pnt('OD_part_pwr', HBTF(design=False, thermo_method='CEA', throttle_mode='percent_thrust'))
+        self.pyc_add_pnt('OD_part_pwr', HBTF(design=False, thermo_method='CEA', throttle_mode='percent_thrust', thermo_table=thermo_table))
 
         self.set_input_defaults('OD_part_pwr.fc.MN', 0.8)
         self.set_input_defaults('OD_part_pwr.fc.alt', 35000, units='ft')
@@ -3,20 +3,29 @@ Sample script showing how to generate tabular thermodynamic
 data for use with tabular thermodynamics
 
 This scrip generates a pickle file called 'air_jetA.pkl' which is 
-equivalent to the default tabular thermo data in pyCycle. 
+equivalent to the default tabular thermo data in pyCycle. The same data is
+also written to 'air_jetA.tab', a memory-mappable version (see tab_thermo_format.py).
 
 You can generate a custom pickle file, then provide the path to that file 
 as the thermo_spec for tabular therm
+
+Each FAR slice is computed by its own worker process and saved to
+'tab_thermo_slices/', so an interrupted run picks up where it stopped.
 """
 
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import numpy as np
 import openmdao.api as om
-import pickle
 
 from pycycle.thermo.thermo import Thermo, ThermoAdd
 from pycycle.constants import CEA_AIR_COMPOSITION, CEA_AIR_FUEL_COMPOSITION, ALLOWED_THERMOS
 from pycycle.thermo.cea.species_data import janaf, wet_air
 
+from tab_thermo_format import save_tab_thermo
+
 
 class TabThermoGenAir(om.Group):
 
@@ -83,91 +92,118 @@ class TabThermoGenAirFuel(om.Group):
         self.set_input_defaults('P', val=101325, units='Pa')
 
 
-if __name__ == "__main__":
-
-    # FAR - lower: 0.0,  upper 0.05
-    # P - lower: 0.886280 Pa,  upper: 10132500 Pa
-    # T - lower: 196.650 degK,  upper: 2500 degK
+# property name -> units it is tabulated in
+TAB_PROPS = [('h', 'J/kg'), ('S', 'J/kg/degK'), ('gamma', None), ('Cp', 'J/kg/degK'),
+             ('Cv', 'J/kg/degK'), ('rho', 'kg/m**3'), ('R', 'J/kg/degK')]
 
-    # FAR_range = [0, 0.03]
-    # P_range = [1e6]
-    # T_range = [1500]
 
-    FAR_range = np.linspace(0.0, 0.05, num=20)
-    # WAR_range = np.linspace(0.0, 1.0, num=5)
-    # P_range = np.linspace(1, 1e7, num=30)
-    P_range = np.logspace(0, 7, num=110)
-    T_range = np.linspace(100, 3500, num=100)
-    numFAR = len(FAR_range)
-    numP = len(P_range)
-    numT = len(T_range)
+def _slice_file(out_dir, i):
+    return os.path.join(out_dir, 'FAR_%03d.npz' % i)
 
-    h = np.empty([numFAR,numP,numT])
-    S = np.empty([numFAR,numP,numT])
-    gamma = np.empty([numFAR,numP,numT])
-    Cp = np.empty([numFAR,numP,numT])
-    Cv = np.empty([numFAR,numP,numT])
-    rho = np.empty([numFAR,numP,numT])
-    R = np.empty([numFAR,numP,numT])
 
+def _species_data(FAR):
+    # FAR=0 uses pure air, anything else the vitiated air-fuel mixture
+    return janaf if FAR == 0.0 else wet_air
 
-    #############################################
-    # Pure Air  - Run this for FAR=0 cases
-    #############################################
 
-    p = om.Problem()
-    p.model = TabThermoGenAir(thermo_data=janaf, thermo_method='CEA')
+def generate_far_slice(i, FAR, P_range, T_range, fuel_type, out_dir):
+    """
+    Tabulate every (P, T) pair for a single FAR value and save the slice to out_dir.
+    FAR=0 uses pure air, anything else the vitiated air-fuel mixture.
+    """
+    thermo_data = _species_data(FAR)
+    p = om.Problem(reports=False)
+    if FAR == 0.0:
+        p.model = TabThermoGenAir(thermo_data=thermo_data, thermo_method='CEA')
+    else:
+        p.model = TabThermoGenAirFuel(fuel_type=fuel_type, thermo_data=thermo_data, thermo_method='CEA')
 
     p.setup(check=False)
     p.set_solver_print(level=-1)
+    if FAR != 0.0:
+        p['FAR'] = FAR
 
+    tables = {name: np.empty([len(P_range), len(T_range)]) for name, units in TAB_PROPS}
+
+    # T is the inner loop so every equilibrium solve starts from its neighbour's solution
     for j, P in enumerate(P_range):
         p['P'] = P
         for k, T in enumerate(T_range):
             p['T'] = T
             p.run_model()
+            for name, units in TAB_PROPS:
+                tables[name][j, k] = p.get_val('flow:'+name, units=units)[0]
+
+    # write under a temporary name so an interrupted run never leaves a truncated slice behind
+    tmp_file = os.path.join(out_dir, 'FAR_%03d.tmp.npz' % i)
+    np.savez(tmp_file, FAR=FAR, P=P_range, T=T_range, fuel_type=fuel_type, species=thermo_data.__name__,
+             **tables)
+    os.replace(tmp_file, _slice_file(out_dir, i))
+
+    return i
+
+
+def _slice_done(out_dir, i, FAR, P_range, T_range, fuel_type):
+    # a slice is only reused if it was computed for the same grid, fuel and species data
+    try:
+        with np.load(_slice_file(out_dir, i)) as data:
+            if 'fuel_type' not in data or 'species' not in data:
+                return False
+            return (data['FAR'] == FAR and np.array_equal(data['P'], P_range)
+                    and np.array_equal(data['T'], T_range) and str(data['fuel_type']) == fuel_type
+                    and str(data['species']) == _species_data(FAR).__name__)
+    except FileNotFoundError:
+        return False
+
+
+def generate_tables(FAR_range, P_range, T_range, fuel_type='Jet-A(g)', out_dir='tab_thermo_slices',
+                    num_procs=None):
+    """
+    Generate the full FAR/P/T property table, one FAR slice per task on a process pool.
+    Finished slices are kept in out_dir, so re-running after an interruption only computes
+    the missing ones; slices of another fuel or grid are recomputed. Returns the thermo_data_dict expected by tabular thermo.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    todo = [i for i, FAR in enumerate(FAR_range) if not _slice_done(out_dir, i, FAR, P_range, T_range, fuel_type)]
+    print('%d of %d FAR slices to compute' % (len(todo), len(FAR_range)))
+
+    with ProcessPoolExecutor(max_workers=num_procs) as pool:
+        futures = [pool.submit(generate_far_slice, i, FAR_range[i], P_range, T_range, fuel_type, out_dir)
+                   for i in todo]
+        for future in as_completed(futures):
+            i = future.result()
+            print('FAR: %.4f done' % FAR_range[i], flush=True)
+
+    thermo_data_dict = {'T':T_range, 'P':P_range, 'FAR':FAR_range}
+    for name, units in TAB_PROPS:
+        thermo_data_dict[name] = np.empty([len(FAR_range), len(P_range), len(T_range)])
+
+    for i in range(len(FAR_range)):
+        with np.load(_slice_file(out_dir, i)) as data:
+            for name, units in TAB_PROPS:
+                thermo_data_dict[name][i] = data[name]
+
+    return thermo_data_dict
+
 
-            print('FAR: %.3f, P: %.1f, T: %.1f' %(0.0,p['P'][0],p['T'][0]))
-            h[0,j,k] = p.get_val('flow:h', units='J/kg')[0]
-            S[0,j,k] = p.get_val('flow:S', units='J/kg/degK')[0]
-            gamma[0,j,k] = p.get_val('flow:gamma')[0]
-            Cp[0,j,k] = p.get_val('flow:Cp', units='J/kg/degK')[0]
-            Cv[0,j,k] = p.get_val('flow:Cv', units='J/kg/degK')[0]
-            rho[0,j,k] = p.get_val('flow:rho', units='kg/m**3')[0]
-            R[0,j,k] = p.get_val('flow:R', units='J/kg/degK')[0]
-
-
-    #############################################
-    # Vitiated Air  - Run this for FAR>0 cases
-    #############################################
-    p2 = om.Problem()
-    p2.model = TabThermoGenAirFuel(fuel_type='Jet-A(g)', thermo_data=wet_air, thermo_method='CEA')
-
-    p2.setup(check=False)
-    p2.set_solver_print(level=-1)
-
-    for i, FAR in enumerate(FAR_range):
-        if i==0:
-            pass
-        else:
-            p2['FAR'] = FAR
-            for j, P in enumerate(P_range):
-                p2['P'] = P
-                for k, T in enumerate(T_range):
-                    p2['T'] = T
-                    p2.run_model()
-
-                    print('FAR: %.3f, P: %.1f, T: %.1f' %(p2['FAR'][0],p2['P'][0],p2['T'][0]))
-                    h[i,j,k] = p2.get_val('flow:h', units='J/kg')[0]
-                    S[i,j,k] = p2.get_val('flow:S', units='J/kg/degK')[0]
-                    gamma[i,j,k] = p2.get_val('flow:gamma')[0]
-                    Cp[i,j,k] = p2.get_val('flow:Cp', units='J/kg/degK')[0]
-                    Cv[i,j,k] = p2.get_val('flow:Cv', units='J/kg/degK')[0]
-                    rho[i,j,k] = p2.get_val('flow:rho', units='kg/m**3')[0]
-                    R[i,j,k] = p2.get_val('flow:R', units='J/kg/degK')[0]
-
-    thermo_data_dict = {'T':T_range, 'P':P_range, 'FAR':FAR_range, 'h':h, 'S':S, 'gamma':gamma, 'Cp':Cp,
-                        'Cv':Cv, 'rho':rho, 'R':R}
+if __name__ == "__main__":
+
+    # FAR - lower: 0.0,  upper 0.05
+    # P - lower: 0.886280 Pa,  upper: 10132500 Pa
+    # T - lower: 196.650 degK,  upper: 2500 degK
+
+    # FAR_range = [0, 0.03]
+    # P_range = [1e6]
+    # T_range = [1500]
+
+    FAR_range = np.linspace(0.0, 0.05, num=20)
+    # WAR_range = np.linspace(0.0, 1.0, num=5)
+    # P_range = np.linspace(1, 1e7, num=30)
+    P_range = np.logspace(0, 7, num=110)
+    T_range = np.linspace(100, 3500, num=100)
 
+    thermo_data_dict = generate_tables(FAR_range, P_range, T_range, fuel_type='Jet-A(g)')
 
     pickle.dump( thermo_data_dict, open('air_jetA.pkl', 'wb'))
+    save_tab_thermo(thermo_data_dict, 'air_jetA.tab')
@@ -0,0 +1,84 @@
+"""
+On-disk format for tabular thermodynamic data.
+
+A table is a directory holding one .npy file per entry of the thermo_data_dict
+(T, P, FAR, h, S, gamma, Cp, Cv, rho, R) plus a small 'meta.json' with the format
+version and the array shapes. Unlike the pickle, the .npy files can be memory
+mapped read-only, so every worker process of a sweep shares the same pages
+instead of holding its own copy of the table.
+
+The loaded dict is passed as the thermo_data option of a pyc.Cycle, the same
+way as pyc.AIR_JETA_TAB_SPEC:
+
+    self.options['thermo_method'] = 'TABULAR'
+    self.options['thermo_data'] = load_tab_thermo('air_jetA.tab')
+"""
+
+import json
+import os
+
+import numpy as np
+
+
+TAB_FORMAT_VERSION = 1
+
+TAB_KEYS = ['T', 'P', 'FAR', 'h', 'S', 'gamma', 'Cp', 'Cv', 'rho', 'R']
+
+
+def save_tab_thermo(thermo_data_dict, path):
+    """
+    Write a thermo_data_dict to the directory `path`
+    """
+    os.makedirs(path, exist_ok=True)
+
+    # an overwritten table is incomplete until its new meta.json is written
+    meta_file = os.path.join(path, 'meta.json')
+    if os.path.exists(meta_file):
+        os.remove(meta_file)
+
+    meta = {'version': TAB_FORMAT_VERSION, 'arrays': {}}
+    for key in TAB_KEYS:
+        data = np.ascontiguousarray(thermo_data_dict[key], dtype=np.float64)
+        np.save(os.path.join(path, key + '.npy'), data)
+        meta['arrays'][key] = list(data.shape)
+
+    # meta.json is written last, so a table without it is an incomplete write
+    with open(meta_file + '.tmp', 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(meta_file + '.tmp', meta_file)
+
+
+def load_tab_thermo(path, mmap=True):
+    """
+    Read a table written by save_tab_thermo. With `mmap` the arrays are read-only
+    memory maps of the files rather than copies in memory.
+    """
+    meta_file = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_file):
+        raise IOError(f'{path} is not a complete tabular thermo table (no meta.json)')
+
+    with open(meta_file) as f:
+        meta = json.load(f)
+
+    if meta['version'] != TAB_FORMAT_VERSION:
+        raise ValueError(f'{path} has tabular thermo format version {meta["version"]}, '
+                         f'expected {TAB_FORMAT_VERSION}')
+
+    thermo_data_dict = {}
+    for key, shape in meta['arrays'].items():
+        data = np.load(os.path.join(path, key + '.npy'), mmap_mode='r' if mmap else None)
+        if list(data.shape) != shape:
+            raise ValueError(f'{key} in {path} has shape {data.shape}, expected {tuple(shape)}')
+        thermo_data_dict[key] = data
+
+    return thermo_data_dict
+
+
+if __name__ == "__main__":
+
+    import pickle
+    import sys
+
+    # convert an existing pickle: python tab_thermo_format.py air_jetA.pkl air_jetA.tab
+    with open(sys.argv[1], 'rb') as f:
+        save_tab_thermo(pickle.load(f), sys.argv[2])
@@ -0,0 +1,170 @@
+"""
+Adaptive refinement of the FAR/P/T grid used for tabular thermodynamics.
+
+Starting from a coarse grid, CEA is solved at the centre of every grid cell
+and compared with the multilinear interpolation of the cell corners, which is
+what the tables do. In the cells above the tolerance, the error of 1D
+interpolation along each axis through the cell centre (between the centres of
+opposite faces) tells which axes to split. Errors are relative to the spread
+of each property over the grid. The result is a non-uniform (but still
+rectilinear) grid that is dense only where the properties curve, e.g. around
+dissociation at high T, plus an error report for each refinement pass.
+"""
+
+import itertools
+import json
+import pickle
+
+import numpy as np
+import openmdao.api as om
+
+from pycycle.thermo.cea.species_data import janaf, wet_air
+
+from tab_thermo_data_generator import TabThermoGenAir, TabThermoGenAirFuel, TAB_PROPS, generate_tables
+from tab_thermo_format import save_tab_thermo
+
+
+AXIS_NAMES = ['FAR', 'P', 'T']
+
+
+class CEAEvaluator:
+    """
+    Solves CEA properties at single (FAR, P, T) states, caching every result
+    so points shared between refinement passes are only solved once.
+    """
+
+    def __init__(self, fuel_type='Jet-A(g)'):
+        self.cache = {}
+
+        self.p_air = om.Problem(reports=False)
+        self.p_air.model = TabThermoGenAir(thermo_data=janaf, thermo_method='CEA')
+        self.p_air.setup(check=False)
+        self.p_air.set_solver_print(level=-1)
+
+        self.p_fuel = om.Problem(reports=False)
+        self.p_fuel.model = TabThermoGenAirFuel(fuel_type=fuel_type, thermo_data=wet_air, thermo_method='CEA')
+        self.p_fuel.setup(check=False)
+        self.p_fuel.set_solver_print(level=-1)
+
+    def __call__(self, FAR, P, T):
+        key = (FAR, P, T)
+        if key not in self.cache:
+            if FAR == 0.0:
+                p = self.p_air
+            else:
+                p = self.p_fuel
+                p['FAR'] = FAR
+            p['P'] = P
+            p['T'] = T
+            p.run_model()
+            self.cache[key] = np.array([p.get_val('flow:'+name, units=units)[0] for name, units in TAB_PROPS])
+        return self.cache[key]
+
+
+def _midpoints(x, axis):
+    # P is spaced logarithmically, so split its intervals geometrically
+    if AXIS_NAMES[axis] == 'P':
+        return np.sqrt(x[:-1] * x[1:])
+    return 0.5 * (x[:-1] + x[1:])
+
+
+def _solve_grid(evaluate, axes):
+    # properties at every point of the rectilinear grid `axes`, shape (n_FAR, n_P, n_T, n_props)
+    vals = np.array([evaluate(*state) for state in itertools.product(*axes)])
+    return vals.reshape(*[len(x) for x in axes], -1)
+
+
+def _interp_axis(vals, axis, weight):
+    # linear interpolation between neighbouring points along `axis` of vals
+    shape = [1] * vals.ndim
+    shape[axis] = -1
+    lo = np.delete(vals, -1, axis=axis)
+    hi = np.delete(vals, 0, axis=axis)
+    return lo + weight.reshape(shape) * (hi - lo)
+
+
+def cell_errors(evaluate, axes):
+    """
+    Normalised interpolation errors at the centre of every cell: the error of the multilinear
+    interpolation of the corners, shape (n_FAR - 1, n_P - 1, n_T - 1), and for each axis the
+    error of interpolating along that axis only, between the centres of the two cell faces.
+    """
+    mids = [_midpoints(x, axis) for axis, x in enumerate(axes)]
+    weights = [(m - x[:-1]) / (x[1:] - x[:-1]) for m, x in zip(mids, axes)]
+
+    nodes = _solve_grid(evaluate, axes)
+    centres = _solve_grid(evaluate, mids)
+
+    scale = np.ptp(nodes.reshape(-1, nodes.shape[-1]), axis=0)
+    scale[scale == 0.0] = 1.0
+
+    interp = nodes
+    for axis, weight in enumerate(weights):
+        interp = _interp_axis(interp, axis, weight)
+    errors = np.max(np.abs(interp - centres) / scale, axis=-1)
+
+    axis_errors = []
+    for axis, weight in enumerate(weights):
+        faces = _solve_grid(evaluate, [axes[b] if b == axis else mids[b] for b in range(3)])
+        interp = _interp_axis(faces, axis, weight)
+        axis_errors.append(np.max(np.abs(interp - centres) / scale, axis=-1))
+
+    return errors, axis_errors
+
+
+def split_intervals(errors, axis_errors, tol):
+    """
+    Intervals of each axis to split: in every cell above `tol`, the axes whose own error is
+    above a third of it, or the worst axis when the error is spread over all three.
+    """
+    axis_errors = np.array(axis_errors)
+    split = (axis_errors > tol / 3.0) | (axis_errors == axis_errors.max(axis=0))
+    split &= errors > tol
+    return [split[axis].any(axis=tuple(b for b in range(3) if b != axis)) for axis in range(3)]
+
+
+def refine_axes(FAR_axis, P_axis, T_axis, tol=1e-3, max_iter=6, fuel_type='Jet-A(g)'):
+    """
+    Refine the three grid axes until every cell is below `tol` or max_iter passes are done.
+    Returns the refined axes and a report with the grid size and worst errors of each pass;
+    the last entry describes the returned grid.
+    """
+    evaluate = CEAEvaluator(fuel_type)
+    axes = [np.asarray(FAR_axis, dtype=float), np.asarray(P_axis, dtype=float),
+            np.asarray(T_axis, dtype=float)]
+    report = []
+
+    # the last pass only measures the error of the final grid
+    for it in range(max_iter + 1):
+        errors, axis_errors = cell_errors(evaluate, axes)
+        split = split_intervals(errors, axis_errors, tol)
+
+        entry = {'iteration': it, 'shape': [len(x) for x in axes], 'max_error': float(errors.max()),
+                 'max_axis_error': {name: float(e.max()) for name, e in zip(AXIS_NAMES, axis_errors)},
+                 'num_split': {name: int(s.sum()) for name, s in zip(AXIS_NAMES, split)}}
+        report.append(entry)
+        print('pass %d: shape %s, max error %g' % (it, entry['shape'], entry['max_error']), flush=True)
+
+        if it == max_iter or not any(entry['num_split'].values()):
+            break
+        axes = [np.sort(np.concatenate([x, _midpoints(x, axis)[s]])) for axis, (x, s) in enumerate(zip(axes, split))]
+
+    return axes, report
+
+
+if __name__ == "__main__":
+
+    FAR_axis = np.linspace(0.0, 0.05, num=5)
+    P_axis = np.logspace(0, 7, num=15)
+    T_axis = np.linspace(100, 3500, num=20)
+
+    (FAR_axis, P_axis, T_axis), report = refine_axes(FAR_axis, P_axis, T_axis, tol=1e-3)
+
+    thermo_data_dict = generate_tables(FAR_axis, P_axis, T_axis, fuel_type='Jet-A(g)',
+                                       out_dir='tab_thermo_adaptive_slices')
+
+    pickle.dump(thermo_data_dict, open('air_jetA_adaptive.pkl', 'wb'))
+    save_tab_thermo(thermo_data_dict, 'air_jetA_adaptive.tab')
+
+    with open('air_jetA_adaptive_report.json', 'w') as f:
+        json.dump(report, f, indent=2)
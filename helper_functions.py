@@ -43,8 +43,10 @@ def convert_dia_to_fan_area(dia, units='m', hub_tip=0.3125):
         raise ValueError('units must be "m" or "in"')
 
 
-def convert_tsfc_to_kgNs():
-    tsfc = 0.56091148  # lbm/hr/lbf
+def convert_tsfc_to_kgNs(tsfc=0.56091148):
+    '''
+    convert tsfc in lbm/hr/lbf to kg/s/N, tsfc can be a number or a numpy array
+    '''
     # tsfc= 0.339
     # convert to kg/s/N
     tsfc = tsfc / 2.20462 / 3600 * 0.224809
@@ -0,0 +1,320 @@
+import argparse
+import contextlib
+import datetime
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import openmdao
+import openmdao.api as om
+
+from sweep import worker_env
+from telemetry import SolverTrace
+
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# case -> (kind, file relative to the repository). 'unittest' runs the benchmark_* methods of
+# the TestCase in the file, numerical checks included; 'script' runs the file as __main__
+CASES = {
+    "N3ref": ("unittest", "example_cycles/N+3ref/benchmark_N3ref.py"),
+    "N3_MDP": ("unittest", "example_cycles/N+3ref/benchmark_N3_MDP.py"),
+    "N3_MDP_verif": ("unittest", "example_cycles/N+3ref/benchmark_N3_MDP_verif.py"),
+    "N3_SPD": ("unittest", "example_cycles/N+3ref/benchmark_N3_SPD.py"),
+    "N3_MDP_Opt": ("unittest", "example_cycles/N+3ref/benchmark_N3_MDP_Opt.py"),
+    "optim_hbtf": ("script", "src/optim_hbtf.py"),
+    "optim_hbtf2": ("script", "src/optim_hbtf2.py"),
+    "design_only": ("script", "src/design_only.py"),
+    "high_thrust": ("script", "src/high_thrust.py"),
+    "example_hbtf": ("script", "src/example_hbtf.py"),
+    "simple_turbojet": ("script", "example_cycles/simple_turbojet.py"),
+    "afterburning_turbojet": ("script", "example_cycles/afterburning_turbojet.py"),
+    "high_bypass_turbofan": ("script", "example_cycles/high_bypass_turbofan.py"),
+    "mixedflow_turbofan": ("script", "example_cycles/mixedflow_turbofan.py"),
+    "single_spool_turboshaft": ("script", "example_cycles/single_spool_turboshaft.py"),
+    "multi_spool_turboshaft": ("script", "example_cycles/multi_spool_turboshaft.py"),
+    "electric_propulsor": ("script", "example_cycles/electric_propulsor.py"),
+    "wet_propulsor": ("script", "example_cycles/wet_propulsor.py"),
+    "wet_simple_turbojet": ("script", "example_cycles/wet_simple_turbojet.py"),
+}
+
+# metric -> allowed increase over the baseline, as a fraction, before it is flagged
+TOLERANCES = {
+    "setup_time": 0.25,
+    "run_time": 0.20,
+    "deriv_time": 0.20,
+    "newton_iterations": 0.0,
+    "peak_rss_mb": 0.10,
+}
+
+
+class _Meter:
+    """
+    Times the Problems made while a case runs by wrapping the Problem methods for the lifetime
+    of the benchmark process, and counts the Newton iterations of the model and its points with
+    a SolverTrace. Times are exclusive: the final_setup inside run_model or run_driver counts as
+    setup time only. The derivatives a driver computes itself count as run time, deriv_time is
+    that of Problem.compute_totals.
+    """
+
+    def __init__(self):
+        self.times = {"setup_time": 0.0, "run_time": 0.0, "deriv_time": 0.0}
+        self.traces = []
+        self._traced = set()
+        # time spent in nested timed calls, one entry per timed call in progress
+        self._nested = []
+
+    def _timed(self, cls, name, metric):
+        method = getattr(cls, name)
+
+        def timed(*args, **kwargs):
+            self._nested.append(0.0)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.times[metric] += elapsed - self._nested.pop()
+                if self._nested:
+                    self._nested[-1] += elapsed
+
+        setattr(cls, name, timed)
+
+    def install(self):
+        final_setup = om.Problem.final_setup
+
+        def traced_final_setup(prob):
+            # final_setup runs again at every run_model, so the solvers are wrapped only once
+            final_setup(prob)
+            if id(prob) not in self._traced:
+                self._traced.add(id(prob))
+                trace = SolverTrace(depth=1, elements=False)
+                trace.attach(prob.model)
+                self.traces.append(trace)
+
+        om.Problem.final_setup = traced_final_setup
+        self._timed(om.Problem, "setup", "setup_time")
+        self._timed(om.Problem, "final_setup", "setup_time")
+        self._timed(om.Problem, "run_model", "run_time")
+        self._timed(om.Problem, "run_driver", "run_time")
+        self._timed(om.Problem, "compute_totals", "deriv_time")
+
+    def results(self):
+        newton = [stats for trace in self.traces for stats in trace.newton.values()]
+        return {
+            **self.times,
+            "newton_solves": sum(stats["solves"] for stats in newton),
+            "newton_iterations": sum(stats["iterations"] for stats in newton),
+            "newton_failures": sum(stats["failures"] for stats in newton),
+            "linesearch_backtracks": sum(stats["backtracks"] for stats in newton),
+        }
+
+
+def _load_tests(path):
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    loader = unittest.TestLoader()
+    loader.testMethodPrefix = "benchmark"
+    return loader.loadTestsFromModule(module)
+
+
+def _run_case(name, work_dir):
+    """
+    Run benchmark case `name` in this (fresh) process with its output files and console
+    output in `work_dir`, and return its metrics
+    """
+    kind, rel_path = CASES[name]
+    path = os.path.join(REPO, rel_path)
+    for p in (os.path.join(REPO, "src"), os.path.join(REPO, "example_cycles", "N+3ref"), os.path.dirname(path)):
+        if p not in sys.path:
+            sys.path.insert(0, p)
+
+    os.makedirs(work_dir, exist_ok=True)
+    os.chdir(work_dir)
+    # the scripts may plot, never open a window
+    os.environ["MPLBACKEND"] = "Agg"
+
+    meter = _Meter()
+    meter.install()
+    status, message = "ok", ""
+    start = time.perf_counter()
+    with open("console.log", "w") as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            if kind == "unittest":
+                result = unittest.TextTestRunner(stream=log, verbosity=2).run(_load_tests(path))
+                if result.errors:
+                    status, message = "error", result.errors[0][1].strip().splitlines()[-1]
+                elif result.failures:
+                    status, message = "fail", result.failures[0][1].strip().splitlines()[-1]
+            else:
+                runpy.run_path(path, run_name="__main__")
+        except BaseException as err:
+            traceback.print_exc()
+            lines = str(err).strip().splitlines()
+            status, message = "error", f"{type(err).__name__}: {lines[0] if lines else ''}"
+
+    return {
+        "case": name,
+        "status": status,
+        "message": message,
+        "work_dir": work_dir,
+        "total_time": time.perf_counter() - start,
+        **meter.results(),
+        # kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    }
+
+
+def _environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "openmdao": openmdao.__version__,
+    }
+
+
+def run_benchmarks(cases=None, out_dir="benchmark_out", repeat=1):
+    """
+    Run the benchmark `cases` (default all of CASES) `repeat` times each, every run in a fresh
+    process so peak RSS and import costs belong to the case alone, and append one record per
+    case to <out_dir>/history.jsonl. Every run also gets a new directory under <out_dir>/<case>
+    for its output files, so none starts from the setup cache, guess database or results
+    store a previous run left in the working directory. Times and peak RSS are the minimum
+    over the repeats, the solver counts the maximum, and the status is that of the first run
+    that did not pass. Returns the records.
+    """
+    cases = list(CASES) if cases is None else list(cases)
+    unknown = [name for name in cases if name not in CASES]
+    if unknown:
+        raise ValueError(f"Unknown benchmark cases {unknown}, must be in {list(CASES)}")
+
+    out_dir = os.path.abspath(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    env = _environment()
+
+    ctx = multiprocessing.get_context("spawn")
+
+    records = []
+    for name in cases:
+        case_dir = os.path.join(out_dir, name)
+        os.makedirs(case_dir, exist_ok=True)
+        runs = []
+        for _ in range(repeat):
+            work_dir = tempfile.mkdtemp(prefix="run_", dir=case_dir)
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                # one BLAS thread, as in the sweeps, so timings don't depend on what else the machine runs
+                with worker_env():
+                    future = pool.submit(_run_case, name, work_dir)
+                runs.append(future.result())
+
+        record = dict(next((run for run in runs if run["status"] != "ok"), runs[-1]))
+        for metric in ("setup_time", "run_time", "deriv_time", "total_time", "peak_rss_mb"):
+            record[metric] = min(run[metric] for run in runs)
+        for metric in ("newton_solves", "newton_iterations", "newton_failures", "linesearch_backtracks"):
+            record[metric] = max(run[metric] for run in runs)
+        record.update(env, repeat=repeat)
+        records.append(record)
+
+        with open(os.path.join(out_dir, "history.jsonl"), "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    return records
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(records, path):
+    """
+    Store the metrics of `records` as the baselines of their cases, keeping those of other cases
+    """
+    baselines = load_baselines(path)
+    for record in records:
+        if record["status"] == "error":
+            continue
+        baselines[record["case"]] = {metric: record[metric] for metric in TOLERANCES}
+        baselines[record["case"]].update(commit=record["commit"], date=record["date"])
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=1)
+
+
+def compare(records, baselines, tolerances=TOLERANCES):
+    """
+    (case, metric, baseline, value) of every metric of `records` more than its tolerance above
+    the baseline of its case
+    """
+    regressions = []
+    for record in records:
+        base = baselines.get(record["case"])
+        if base is None or record["status"] == "error":
+            continue
+        for metric, tol in tolerances.items():
+            if metric in base and record[metric] > base[metric] * (1.0 + tol) + 1e-9:
+                regressions.append((record["case"], metric, base[metric], record[metric]))
+    return regressions
+
+
+def summary(records, regressions=()):
+    flagged = {(case, metric) for case, metric, *_ in regressions}
+    line = "-" * 110
+    lines = [line, f"{'Case':<26}{'status':>8}{'setup, s':>11}{'run, s':>11}{'deriv, s':>11}{'NL solves':>11}"
+                   f"{'NL iters':>10}{'failed':>8}{'RSS, MB':>10}{'total, s':>11}", line]
+    for r in records:
+        cells = []
+        for metric, fmt, width in (("setup_time", ".2f", 11), ("run_time", ".2f", 11), ("deriv_time", ".2f", 11),
+                                   ("newton_solves", "d", 11), ("newton_iterations", "d", 10),
+                                   ("newton_failures", "d", 8), ("peak_rss_mb", ".0f", 10)):
+            mark = "*" if (r["case"], metric) in flagged else ""
+            cells.append(f"{mark + format(r[metric], fmt):>{width}}")
+        lines.append(f"{r['case']:<26.26}{r['status']:>8}" + "".join(cells) + f"{r['total_time']:>11.2f}")
+    lines.append(line)
+    for case, metric, base, value in regressions:
+        lines.append(f"REGRESSION {case} {metric}: {value:.4g} against a baseline of {base:.4g}")
+    for r in records:
+        if r["status"] != "ok":
+            lines.append(f"{r['status'].upper()} {r['case']}: {r['message']}")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the N+3 reference models, the HBTF scripts and the "
+                                                 "example cycles, and flag regressions against baselines")
+    parser.add_argument("cases", nargs="*", help=f"cases to run, default all: {', '.join(CASES)}")
+    parser.add_argument("--out-dir", default="benchmark_out", help="history file and case output directory")
+    parser.add_argument("--baselines", default=None, help="baseline file, default <out-dir>/baselines.json")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case, the fastest is kept")
+    parser.add_argument("--update-baselines", action="store_true", help="store this run as the baselines")
+    args = parser.parse_args()
+
+    baselines_file = args.baselines or os.path.join(args.out_dir, "baselines.json")
+    records = run_benchmarks(args.cases or None, args.out_dir, args.repeat)
+    regressions = compare(records, load_baselines(baselines_file))
+    print(summary(records, regressions))
+
+    if args.update_baselines:
+        save_baselines(records, baselines_file)
+    elif regressions:
+        sys.exit(1)
@@ -0,0 +1,235 @@
+import argparse
+import collections
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from multiprocessing.connection import wait
+
+from cycle_spec import merge_spec, resolve_spec, setup_problem, run_spec
+from cea_cache import enable_cea_cache
+from guess_db import GuessDB
+from results_store import ResultsStore, run_record
+
+
+def load_campaign(path):
+    """
+    Read a campaign file: {"name": ..., "base": spec file, "common": {...}, "jobs": [...]}.
+    Each job is a spec merged over "common" and then over the base spec (see
+    cycle_spec.resolve_spec) and needs a unique "name", e.g.
+    {"name": "Fn6000", "inputs": {"DESIGN.Fn_DES": [6000.0, "lbf"]}}. Returns the campaign
+    name and the list of job specs.
+    """
+    with open(path) as f:
+        campaign = json.load(f)
+
+    base_dir = os.path.dirname(path)
+    base = resolve_spec({"extends": campaign["base"]}, base_dir) if "base" in campaign else {}
+    base = merge_spec(base, campaign.get("common", {}))
+    specs = [merge_spec(base, resolve_spec(job, base_dir)) for job in campaign["jobs"]]
+
+    names = [spec["name"] for spec in specs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Campaign {path} has duplicate job names: {duplicates}")
+
+    return campaign.get("name", os.path.splitext(os.path.basename(path))[0]), specs
+
+
+def job_key(spec):
+    """
+    Hash of a job spec, so a job that is edited after it finished is run again
+    """
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _finished(journal):
+    # keys of the jobs that completed in an earlier (possibly interrupted) run of the campaign
+    done = set()
+    if os.path.exists(journal):
+        with open(journal) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line of a campaign that was killed
+                if entry["status"] == "ok":
+                    done.add(entry["key"])
+    return done
+
+
+def _run_job(conn, spec, setup_cache, job_dir, guess_db):
+    # runs in its own process and sends back ("ok", record) or ("failed", message). The job
+    # works in its own directory, where the relative recorder files of the spec are written
+    os.makedirs(job_dir, exist_ok=True)
+    os.chdir(job_dir)
+    with open("run.log", "w") as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            prob = setup_problem(spec, setup_cache)
+            enable_cea_cache(prob)
+            # guesses are read from the database, never written from a worker
+            guess_db = GuessDB(guess_db) if guess_db is not None else None
+            if run_spec(prob, spec, guess_db=guess_db, out_dir="."):
+                record = run_record(prob, ["DESIGN"] + prob.model.od_pts)
+                if spec.get("run", "model") == "driver":
+                    record["driver_success"] = bool(prob.driver.result.success)
+                result = ("ok", record)
+            else:
+                result = ("failed", "AnalysisError")
+        except Exception:
+            traceback.print_exc()
+            result = ("failed", traceback.format_exc(limit=-1).strip())
+    conn.send(result)
+    conn.close()
+
+
+class _Job:
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.name = spec["name"]
+        self.key = job_key(spec)
+        self.attempts = 0
+        self.proc = None
+        self.conn = None
+        self.start = None
+
+
+def _stored(results, name):
+    # keys of the jobs of the campaign already in the results store
+    try:
+        return set(results.query([("campaign", "==", name)], ["job_key"])["job_key"])
+    except KeyError:
+        return set()  # nothing stored for any campaign yet
+
+
+def run_campaign(specs, name="campaign", num_procs=None, timeout=3600.0, retries=1,
+                 retry_on=("crashed", "timeout"), setup_cache="setup_cache", out_dir="campaign_out",
+                 store="output_data/results_store", guess_db=None, target=_run_job):
+    """
+    Run the job `specs` (see cycle_spec) in at most `num_procs` processes at a time, one fresh
+    process per job so a solver that hangs or a worker that crashes only takes down its own job.
+    A job still running after `timeout` seconds is killed. A job that ends with a status in
+    `retry_on` is run again up to `retries` times; a job that fails (an AnalysisError or an
+    exception) is not by default, as it would most likely fail the same way again.
+
+    Each job works in `<out_dir>/<name>/<job name>/`, which holds its log, report and recorder
+    files. Every finished job is appended to the results store `store` (with columns 'campaign',
+    'cycle', the job name, and 'job_key') and to the journal `<out_dir>/<name>/journal.jsonl` as
+    soon as it completes. Running the campaign again skips the jobs the journal or the store
+    has as completed, so an interrupted campaign resumes where it stopped without running or
+    storing a job twice. `target` is the function run in each worker process, see _run_job.
+    Returns {job name: final status}.
+    """
+    num_procs = num_procs or os.cpu_count()
+    campaign_dir = os.path.abspath(os.path.join(out_dir, name))
+    os.makedirs(campaign_dir, exist_ok=True)
+    journal_file = os.path.join(campaign_dir, "journal.jsonl")
+    # the jobs run in their own directories
+    setup_cache = os.path.abspath(setup_cache) if setup_cache is not None else None
+    guess_db = os.path.abspath(guess_db) if guess_db is not None else None
+
+    done = _finished(journal_file)
+
+    # spawn, so every job starts from a clean interpreter rather than the state of this one
+    ctx = multiprocessing.get_context("spawn")
+    running = []
+    with ResultsStore(store) as results, open(journal_file, "a") as journal:
+        # jobs stored by a campaign that was killed before it wrote their journal entry
+        stored = _stored(results, name) - done
+
+        statuses = {}
+        pending = collections.deque()
+        for spec in specs:
+            job = _Job(spec)
+            if job.key in stored:
+                journal.write(json.dumps({"job": job.name, "key": job.key, "status": "ok", "attempt": 0,
+                                          "recovered": True}) + "\n")
+                journal.flush()
+            if job.key in done or job.key in stored:
+                statuses[job.name] = "ok"
+            else:
+                pending.append(job)
+
+        while pending or running:
+            while pending and len(running) < num_procs:
+                job = pending.popleft()
+                job.attempts += 1
+                job.conn, child_conn = ctx.Pipe(duplex=False)
+                job_dir = os.path.join(campaign_dir, job.name)
+                job.proc = ctx.Process(target=target, args=(child_conn, job.spec, setup_cache, job_dir, guess_db),
+                                       name=f"campaign-{job.name}")
+                job.proc.start()
+                # only the worker holds the sending end, so a crash reads as end of file here
+                child_conn.close()
+                job.start = time.time()
+                running.append(job)
+
+            now = time.time()
+            wait([job.conn for job in running], timeout=max(0.0, min(job.start + timeout for job in running) - now))
+
+            for job in list(running):
+                status, payload = None, None
+                if job.conn.poll():
+                    try:
+                        status, payload = job.conn.recv()
+                    except EOFError:
+                        job.proc.join()
+                        status, payload = "crashed", f"worker exit code {job.proc.exitcode}"
+                elif time.time() - job.start > timeout:
+                    job.proc.kill()
+                    status, payload = "timeout", f"killed after {timeout:.0f} s"
+                if status is None:
+                    continue
+
+                job.proc.join()
+                job.conn.close()
+                running.remove(job)
+                elapsed = time.time() - job.start
+
+                entry = {"job": job.name, "key": job.key, "status": status, "attempt": job.attempts,
+                         "time": round(elapsed, 1), "finished": time.strftime("%Y-%m-%d %H:%M:%S")}
+                # stored before it is journalled: a job killed in between is found in the store on resume
+                if status == "ok":
+                    record = {"run_id": f"{name}/{job.name}", "timestamp": time.time(), "campaign": name,
+                              "cycle": job.name, "job_key": job.key}
+                    record.update(payload)
+                    results.append_record(record)
+                    results.flush()
+                else:
+                    entry["error"] = payload
+                journal.write(json.dumps(entry) + "\n")
+                journal.flush()
+
+                print(f"{job.name:<24} {status:<8} attempt {job.attempts}  {elapsed:8.1f} s")
+                if status in retry_on and job.attempts <= retries:
+                    pending.append(job)
+                else:
+                    statuses[job.name] = status
+
+    return statuses
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a campaign of HBTF optimisation jobs in a process pool")
+    parser.add_argument("campaign", help="campaign file, see campaigns/")
+    parser.add_argument("--num-procs", type=int, default=None, help="concurrent jobs, default one per core")
+    parser.add_argument("--timeout", type=float, default=3600.0, help="seconds before a job is killed")
+    parser.add_argument("--retries", type=int, default=1, help="reruns of a job that crashes or times out")
+    parser.add_argument("--retry-failed", action="store_true", help="also rerun jobs that fail")
+    parser.add_argument("--setup-cache", default="setup_cache", help="set up problem cache directory, '' to disable")
+    parser.add_argument("--out-dir", default="campaign_out", help="journal, job logs and reports directory")
+    parser.add_argument("--store", default="output_data/results_store", help="shared results store")
+    parser.add_argument("--guess-db", default=None, help="guess database the jobs read their initial guesses from")
+    args = parser.parse_args()
+
+    name, specs = load_campaign(args.campaign)
+    retry_on = ("crashed", "timeout", "failed") if args.retry_failed else ("crashed", "timeout")
+    statuses = run_campaign(specs, name, args.num_procs, args.timeout, args.retries, retry_on,
+                            args.setup_cache or None, args.out_dir, args.store, args.guess_db)
+    print()
+    for job, status in statuses.items():
+        print(f"{job:<24} {status}")
@@ -0,0 +1,206 @@
+import json
+import os
+import pickle
+import sqlite3
+import zlib
+
+import numpy as np
+
+
+TABLES = {"system": "system_iterations", "driver": "driver_iterations"}
+COLUMNS = ["outputs", "inputs"]
+
+_decoder = json.JSONDecoder()
+
+
+def _value_offsets(text):
+    """
+    Start and length of every value in the JSON object `text` written by the recorder
+    """
+    offsets = {}
+    pos = 1
+    while True:
+        while text[pos] in " ,\n":
+            pos += 1
+        if text[pos] == "}":
+            return offsets
+        key, pos = _decoder.raw_decode(text, pos)
+        pos = text.index(":", pos) + 1
+        while text[pos] == " ":
+            pos += 1
+        end = _decoder.raw_decode(text, pos)[1]
+        offsets[key] = (pos, end - pos)
+        pos = end
+
+
+class IndexedCaseReader:
+    """
+    Read-only front-end for SqliteRecorder files that never parses a whole case.
+
+    On first use every case of the table ('system' or 'driver') is scanned once and an index
+    of case id, counter, iteration coordinate and the character offsets of each variable in
+    the recorded JSON is saved next to the file (<filename>.<table>.idx). Later opens only index
+    the cases appended since (or rebuild the index when the file was recorded again), and
+    reading a variable fetches just its slice of the text from SQLite, so plotting one
+    iteration or the history of a few variables stays cheap however large the file is.
+    """
+
+    def __init__(self, filename, table="system"):
+        self.filename = filename
+        self.table = TABLES[table]
+        self.index_file = f"{filename}.{table}.idx"
+
+        self._connection = sqlite3.connect(f"file:{filename}?mode=ro", uri=True)
+        self._load_index()
+        self._update_index()
+
+    def _stamp(self):
+        # the first case as recorded, timestamp included; SqliteRecorder starts a new file on
+        # every run, so an index with another stamp describes an earlier run of the file
+        row = self._connection.execute(
+            f"SELECT id, counter, iteration_coordinate, timestamp FROM {self.table} ORDER BY id LIMIT 1"
+        ).fetchone()
+        return tuple(row) if row is not None else None
+
+    def _load_index(self):
+        stamp = self._stamp()
+        self.index = None
+        if os.path.exists(self.index_file):
+            with open(self.index_file, "rb") as f:
+                self.index = pickle.load(f)
+            if stamp is None or self.index.get("stamp") != stamp:
+                self.index = None
+
+        if self.index is None:
+            row = self._connection.execute("SELECT prom2abs, conns FROM metadata").fetchone()
+            self.index = {
+                "stamp": stamp,
+                "prom2abs": json.loads(zlib.decompress(row[0]).decode("ascii")),
+                "conns": json.loads(zlib.decompress(row[1]).decode("ascii")) if row[1] else {},
+                "ids": [],
+                "counters": [],
+                "coords": [],
+                "names": {col: {} for col in COLUMNS},
+                "offsets": {col: [] for col in COLUMNS},
+            }
+
+    def _update_index(self):
+        last = self.index["ids"][-1] if self.index["ids"] else 0
+        rows = self._connection.execute(
+            f"SELECT id, counter, iteration_coordinate, outputs, inputs FROM {self.table} "
+            "WHERE id > ? ORDER BY id", (last,)
+        )
+
+        added = False
+        for case_id, counter, coord, *texts in rows:
+            self.index["ids"].append(case_id)
+            self.index["counters"].append(counter)
+            self.index["coords"].append(coord)
+            for col, text in zip(COLUMNS, texts):
+                names = self.index["names"][col]
+                found = _value_offsets(text) if text else {}
+                for name in found:
+                    names.setdefault(name, len(names))
+                offsets = np.full((len(names), 2), -1, dtype=np.int64)
+                for name, (start, length) in found.items():
+                    offsets[names[name]] = start, length
+                self.index["offsets"][col].append(offsets)
+            added = True
+
+        if added:
+            if self.index["stamp"] is None:
+                self.index["stamp"] = self._stamp()
+            tmp = self.index_file + ".tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(self.index, f)
+            os.replace(tmp, self.index_file)
+
+    def __len__(self):
+        return len(self.index["ids"])
+
+    def list_cases(self):
+        """
+        (case id, counter, iteration coordinate) of every indexed case, in recording order
+        """
+        return list(zip(self.index["ids"], self.index["counters"], self.index["coords"]))
+
+    @property
+    def points(self):
+        """
+        Top level systems (the cycle points) with recorded variables
+        """
+        names = list(self.index["names"]["outputs"]) + list(self.index["names"]["inputs"])
+        return sorted({name.split(".")[0] for name in names if not name.startswith("_auto_ivc")})
+
+    def _resolve(self, name):
+        # (column, absolute name) of a promoted or absolute variable name
+        names = self.index["names"]
+        prom2abs = self.index["prom2abs"]
+
+        if name in names["outputs"]:
+            return "outputs", name
+        if name in prom2abs["output"]:
+            return "outputs", prom2abs["output"][name][0]
+
+        abs_inputs = [name] if name in names["inputs"] else prom2abs["input"].get(name, [])
+        for abs_name in abs_inputs:
+            if abs_name in names["inputs"]:
+                return "inputs", abs_name
+        for abs_name in abs_inputs:
+            src = self.index["conns"].get(abs_name)
+            if src in names["outputs"]:
+                return "outputs", src
+
+        raise KeyError(f'Variable name "{name}" not found in {self.filename}')
+
+    def _read(self, pos, col, abs_name):
+        i = self.index["names"][col][abs_name]
+        offsets = self.index["offsets"][col][pos]
+        if i >= len(offsets) or offsets[i, 0] < 0:
+            raise KeyError(f'Variable name "{abs_name}" not recorded in case {self.index["ids"][pos]}')
+
+        start, length = offsets[i]
+        text = self._connection.execute(
+            f"SELECT substr({col}, ?, ?) FROM {self.table} WHERE id = ?",
+            (int(start) + 1, int(length), self.index["ids"][pos]),
+        ).fetchone()[0]
+        return np.array(json.loads(text))
+
+    def get_case(self, pos):
+        """
+        LazyCase for the case at position `pos` (negative counts from the end)
+        """
+        return LazyCase(self, range(len(self))[pos])
+
+    def history(self, names, cases=None):
+        """
+        Values of each of `names` over the cases at positions `cases` (default all), as a dict of
+        arrays with the case as the first axis
+        """
+        cases = range(len(self)) if cases is None else [range(len(self))[pos] for pos in cases]
+        resolved = {name: self._resolve(name) for name in names}
+        return {name: np.array([self._read(pos, col, abs_name) for pos in cases])
+                for name, (col, abs_name) in resolved.items()}
+
+
+class LazyCase:
+    """
+    One recorded case; variables are read from the file when first accessed
+    """
+
+    def __init__(self, reader, pos):
+        self.reader = reader
+        self.pos = pos
+        self.name = reader.index["coords"][pos]
+        self.counter = reader.index["counters"][pos]
+        self._cache = {}
+
+    def get_val(self, name, units=None):
+        if units is not None:
+            raise ValueError("LazyCase returns values in their recorded units only")
+        if name not in self._cache:
+            self._cache[name] = self.reader._read(self.pos, *self.reader._resolve(name))
+        return self._cache[name]
+
+    def __getitem__(self, name):
+        return self.get_val(name)
@@ -0,0 +1,151 @@
+from collections import OrderedDict
+
+import numpy as np
+import openmdao.api as om
+
+from pycycle.thermo.cea.chem_eq import ChemEq
+
+
+class EquilibriumCache:
+    """
+    Bounded LRU cache of converged chemical equilibrium states for one ChemEq component.
+
+    Entries are keyed on the component inputs (composition, P, T) rounded to `digits`
+    significant figures. An exact hit returns the stored species vector, so the equilibrium
+    Newton starts converged. When the component would otherwise cold start, the entry whose
+    inputs are closest in relative terms is used as the starting point instead, if they are
+    within `max_dist` (unlimited when None) of the new ones.
+    """
+
+    def __init__(self, maxsize=500, digits=6, max_dist=None):
+        self.maxsize = maxsize
+        self.digits = digits
+        self.max_dist = max_dist
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.near = 0
+        self.misses = 0
+        # inputs and states of the entries for nearest(), in the same order; reordering the
+        # entries on a hit does not change them, only adding or evicting one does
+        self._X = None
+        self._states = None
+
+    def _key(self, x):
+        return tuple(float("%.*g" % (self.digits, v)) for v in x)
+
+    def store(self, x, state):
+        key = self._key(x)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return
+        self.entries[key] = (x.copy(), state.copy())
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        self._X = self._states = None
+
+    def lookup(self, x):
+        """
+        Stored state for inputs that round to the same key as `x`, or None
+        """
+        key = self._key(x)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][1]
+        self.misses += 1
+        return None
+
+    def nearest(self, x):
+        """
+        Stored state whose inputs are closest to `x` in relative terms, or None if there is
+        none within max_dist
+        """
+        if not self.entries:
+            return None
+
+        if self._X is None:
+            self._states = [entry[1] for entry in self.entries.values()]
+            self._X = np.array([entry[0] for entry in self.entries.values()])
+        dist = np.linalg.norm((self._X - x) / (np.abs(x) + 1e-12), axis=1)
+        i = int(np.argmin(dist))
+        if self.max_dist is not None and dist[i] > self.max_dist:
+            return None
+        self.near += 1
+        return self._states[i]
+
+
+def _residual_scale(comp):
+    # the solver measures the residuals divided by res_ref (ref when it is not set)
+    meta = comp.get_io_metadata(iotypes="output", metadata_keys=["ref", "res_ref", "size"])
+    return np.concatenate([np.broadcast_to(m["ref"] if m["res_ref"] is None else m["res_ref"], m["size"]).ravel()
+                           for m in meta.values()])
+
+
+def _wrap(comp, cache):
+    guess_nonlinear = comp.guess_nonlinear
+    apply_nonlinear = comp.apply_nonlinear
+    options = comp.nonlinear_solver.options
+    scale = _residual_scale(comp)
+    # residual norm at the start of the current solve, for the rtol test. The residuals are
+    # also evaluated before the guess with the new inputs and the old state, so only the
+    # evaluations between a guess and the first converged one count
+    solve = {"active": False, "norm0": None}
+
+    def cached_guess_nonlinear(inputs, outputs, resids):
+        solve.update(active=True, norm0=None)
+        x = inputs.asarray()
+        state = cache.lookup(x)
+        if state is not None:
+            outputs.set_val(state)
+            return
+
+        # the previous solution is normally the best start; only when pyCycle's own guess
+        # throws it away (bad or unset state) is the nearest cached state used instead
+        before = outputs.asarray(copy=True)
+        guess_nonlinear(inputs, outputs, resids)
+        if not np.array_equal(before, outputs.asarray()):
+            state = cache.nearest(x)
+            if state is not None:
+                outputs.set_val(state)
+
+    def recording_apply_nonlinear(inputs, outputs, resids):
+        apply_nonlinear(inputs, outputs, resids)
+        if not solve["active"]:
+            return
+        norm = np.linalg.norm(resids.asarray() / scale)
+        if solve["norm0"] is None:
+            solve["norm0"] = norm
+        if norm <= options["atol"] or norm <= options["rtol"] * solve["norm0"]:
+            cache.store(inputs.asarray(), outputs.asarray())
+            solve["active"] = False
+
+    comp.guess_nonlinear = cached_guess_nonlinear
+    comp.apply_nonlinear = recording_apply_nonlinear
+
+
+def enable_cea_cache(prob, maxsize=500, digits=6, max_dist=0.05):
+    """
+    Opt-in memoisation of every CEA chemical equilibrium solve in a set up Problem.
+    Each ChemEq component gets its own EquilibriumCache; states that pass the convergence
+    test of the component's Newton solver (atol, or rtol of the residual the solve started
+    from) are stored and reused as the starting point of later solves. Cached states more
+    than `max_dist` away are not used, the equilibrium Newton can stall on such a start.
+    Returns the caches by component path, e.g. to report hit rates.
+    """
+    caches = {}
+    for comp in prob.model.system_iter(recurse=True, typ=om.ImplicitComponent):
+        if isinstance(comp, ChemEq):
+            caches[comp.pathname] = cache = EquilibriumCache(maxsize, digits, max_dist)
+            _wrap(comp, cache)
+    return caches
+
+
+def cache_summary(caches):
+    hits = sum(c.hits for c in caches.values())
+    near = sum(c.near for c in caches.values())
+    misses = sum(c.misses for c in caches.values())
+    total = max(hits + misses, 1)
+    # a miss that is not warm started from the cache starts from the previous solution or
+    # from pyCycle's own guess
+    return (f"CEA cache: {len(caches)} equilibrium solvers, {hits + misses} lookups, {hits / total:.1%} exact hits, "
+            f"{misses / total:.1%} misses ({near / total:.1%} warm started from the nearest entry)")
@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+import time
+
+import openmdao.api as om
+
+from cea_cache import enable_cea_cache, cache_summary
+from guess_db import GuessDB, residual_norm
+from optim_hbtf import MPhbtf, DESIGN_DEFAULTS, INPUT_DEFAULTS
+from recording import add_recording_profile
+from report import write_report
+from results_store import ResultsStore
+from setup_cache import cached_setup
+
+
+# spec sections that define the set up Problem; specs that agree on all of them share one
+SETUP_KEYS = ("cycle", "input_defaults", "cycle_params", "balances", "driver", "design_vars",
+              "objective", "constraints", "recording")
+
+
+def merge_spec(base, override):
+    """
+    Merge `override` over `base`: nested dicts are merged, a null value removes the key
+    """
+    merged = dict(base)
+    for key, val in override.items():
+        if val is None:
+            merged.pop(key, None)
+        elif isinstance(val, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_spec(merged[key], val)
+        else:
+            merged[key] = val
+    return merged
+
+
+def _val_units(val):
+    # spec values are either a plain value or [value, units]
+    return tuple(val) if isinstance(val, list) and len(val) == 2 and isinstance(val[1], str) else (val, None)
+
+
+def resolve_spec(spec, base_dir="."):
+    """
+    Merge a spec with "extends" over the spec file it names (relative to `base_dir`), where a
+    null value removes a key. The name is not inherited.
+    """
+    spec = dict(spec)
+    parent = spec.pop("extends", None)
+    if parent is None:
+        return spec
+
+    base = load_spec(os.path.join(base_dir, parent))
+    base.pop("name")
+    return merge_spec(base, spec)
+
+
+def load_spec(path):
+    """
+    Read a JSON run spec, see resolve_spec. The name defaults to the file name.
+    """
+    with open(path) as f:
+        spec = json.load(f)
+
+    spec.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    return resolve_spec(spec, os.path.dirname(path))
+
+
+def setup_key(spec):
+    """
+    Canonical JSON of the sections of `spec` that define the set up Problem
+    """
+    return json.dumps({key: spec.get(key) for key in SETUP_KEYS}, sort_keys=True)
+
+
+def build_problem(spec):
+    """
+    Build the Problem described by the SETUP_KEYS sections of `spec`, not set up: the MPhbtf
+    variant, model balances, driver, design variables, objective, constraints and recorders.
+    """
+    cycle = dict(spec.get("cycle", {}))
+    cycle["design_defaults"] = {**DESIGN_DEFAULTS, **cycle.get("design_defaults", {})}
+    # set by the model itself, so the spec values replace its defaults rather than clash with them
+    cycle["input_defaults"] = {**INPUT_DEFAULTS, **{name: _val_units(val)
+                                                    for name, val in spec.get("input_defaults", {}).items()}}
+
+    prob = om.Problem(reports=False)
+    prob.model = MPhbtf(**cycle)
+
+    for name, val in spec.get("cycle_params", {}).items():
+        val, units = _val_units(val)
+        prob.model.pyc_add_cycle_param(name, val, units=units)
+
+    if spec.get("balances"):
+        bal = prob.model.add_subsystem("bal", om.BalanceComp())
+        for name, balance in spec["balances"].items():
+            bal.add_balance(name, **balance.get("options", {}))
+            prob.model.connect(f"bal.{name}", balance["output"])
+            prob.model.connect(balance["lhs"], f"bal.lhs:{name}")
+            if "rhs" in balance:
+                prob.model.connect(balance["rhs"], f"bal.rhs:{name}")
+
+    if spec.get("driver"):
+        prob.driver = om.ScipyOptimizeDriver()
+        for name, val in spec["driver"].items():
+            prob.driver.options[name] = val
+
+    for name, kwargs in spec.get("design_vars", {}).items():
+        prob.model.add_design_var(name, **kwargs)
+    for name, kwargs in spec.get("objective", {}).items():
+        prob.model.add_objective(name, **kwargs)
+    for name, kwargs in spec.get("constraints", {}).items():
+        prob.model.add_constraint(name, **kwargs)
+
+    for profile, filepath in spec.get("recording", {}).items():
+        add_recording_profile(prob, profile, filepath)
+
+    return prob
+
+
+def _build(setup_json):
+    # the setup sections as one string, so cached_setup hashes exactly what defines the problem;
+    # the sections a spec does not have are null there
+    return build_problem({key: val for key, val in json.loads(setup_json).items() if val is not None})
+
+
+def setup_problem(spec, setup_cache="setup_cache"):
+    """
+    Build and set up the problem of `spec`, restored from `setup_cache` when a spec with the
+    same setup_key was set up before
+    """
+    key = setup_key(spec)
+    if setup_cache is not None:
+        return cached_setup(_build, key, cache_dir=setup_cache)
+
+    prob = _build(key)
+    prob.setup()
+    return prob
+
+
+def apply_spec(prob, spec):
+    """
+    Set the "inputs" of `spec` and its initial "guesses" for each point on a set up problem
+    """
+    for name, val in spec.get("inputs", {}).items():
+        val, units = _val_units(val)
+        prob.set_val(name, val, units=units)
+
+    for pt, guesses in spec.get("guesses", {}).items():
+        for name, val in guesses.items():
+            prob.set_val(f"{pt}.{name}", val)
+
+
+def run_spec(prob, spec, guess_db=None, store=None, out_dir="output_data"):
+    """
+    Run one spec on a problem built from it (or from a spec with the same setup_key): set its
+    inputs and guesses, run the model or the driver and write the report. Returns False if
+    the run raised an AnalysisError.
+    """
+    name = spec["name"]
+    points = ["DESIGN"] + prob.model.od_pts
+
+    apply_spec(prob, spec)
+    if guess_db is not None:
+        for pt in points:
+            guess_db.apply(prob, pt, "hbtf")
+
+    prob.set_solver_print(level=-1)
+    prob.set_solver_print(level=2, depth=1)
+
+    # the residuals at the initial guesses stand in for the ones the Newton solves start from
+    # in their rtol test. The last solve of a driver run starts elsewhere, only atol is checked
+    run_driver = spec.get("run", "model") == "driver"
+    norms0 = {}
+    if guess_db is not None and not run_driver:
+        norms0 = {pt: residual_norm(prob, pt) for pt in points}
+
+    st = time.time()
+    try:
+        if run_driver:
+            prob.run_driver()
+        else:
+            prob.run_model()
+    except om.AnalysisError as err:
+        print(f"{name}: {err}")
+        return False
+
+    if guess_db is not None:
+        for pt in points:
+            guess_db.record(prob, pt, "hbtf", norms0.get(pt))
+    if store is not None:
+        store.append(prob, points, cycle=name)
+
+    date_time = time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime())
+    os.makedirs(out_dir, exist_ok=True)
+    write_report(prob, points, f"{out_dir}/{name}_{date_time}.out")
+    print(f"{name}: run time {time.time() - st:.1f} s")
+    return True
+
+
+def run_batch(specs, setup_cache="setup_cache", guess_db="hbtf_guesses.pkl",
+              store="output_data/results_store", out_dir="output_data"):
+    """
+    Run `specs` in one process. Specs with the same setup_key share one set up problem (and
+    its CEA cache), which is restored from `setup_cache` when it was set up before. Returns
+    {spec name: True if the run completed}.
+    """
+    groups = {}
+    for spec in specs:
+        groups.setdefault(setup_key(spec), []).append(spec)
+
+    guess_db = GuessDB(guess_db) if guess_db is not None else None
+    store = ResultsStore(store) if store is not None else None
+
+    completed = {}
+    for group in groups.values():
+        prob = setup_problem(group[0], setup_cache)
+        cea_caches = enable_cea_cache(prob)
+
+        for spec in group:
+            completed[spec["name"]] = run_spec(prob, spec, guess_db, store, out_dir)
+        print(cache_summary(cea_caches))
+
+    if guess_db is not None:
+        guess_db.save()
+    if store is not None:
+        store.flush()
+    return completed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and run HBTF cycles from JSON run specs")
+    parser.add_argument("specs", nargs="+", help="spec files, see specs/")
+    parser.add_argument("--setup-cache", default="setup_cache", help="set up problem cache directory, '' to disable")
+    parser.add_argument("--out-dir", default="output_data", help="report directory")
+    args = parser.parse_args()
+
+    completed = run_batch([load_spec(path) for path in args.specs], setup_cache=args.setup_cache or None,
+                          store=os.path.join(args.out_dir, "results_store"), out_dir=args.out_dir)
+    print()
+    for name, ok in completed.items():
+        print(f"{name:<20} {'ok' if ok else 'failed'}")
@@ -1,96 +1,111 @@
+import numpy as np
+
 import openmdao.api as om
-import pycycle.api as pyc
+
+from pycycle.constants import g_c
+
+
+# keeps the efficiencies finite when the fuel or jet flows are zero
+EPS = 1.0E-12
+
+# lower heating value of Jet-A, Btu/lbm
+H_FUEL = 18400.0
+
+# ft*lbf per Btu
+BTU_FT_LBF = 778.169
+
+
+def efficiency_terms(Wfuel, Fn, V_aircraft, V_jet_core, V_jet_bypass, W_core, W_bypass, h_fuel=H_FUEL):
+    """
+    Thermal, propulsive and overall efficiency, with the intermediate terms their partials use:
+    (fuel power, jet kinetic energy gain, eta_thermal, eta_propulsive, eta_overall). Inputs are
+    scalars or arrays in the units of the Efficiency inputs; the powers are in ft*lbf/s.
+
+    eta_thermal is the kinetic energy the nozzle flows gain over the air taken in, per unit of
+    fuel power; eta_overall the thrust power Fn*V_aircraft per unit of fuel power, and
+    eta_propulsive = eta_overall / eta_thermal the thrust power per unit of jet kinetic energy.
+    """
+    heat_in = h_fuel * BTU_FT_LBF * Wfuel + EPS
+
+    # the nozzle flows hold the fuel, the air taken in at the flight velocity does not
+    W_air = W_core + W_bypass - Wfuel
+    dKE = (W_core * V_jet_core**2 + W_bypass * V_jet_bypass**2 - W_air * V_aircraft**2) / (2.0 * g_c) + EPS
+
+    eta_th = dKE / heat_in
+    eta_overall = Fn * V_aircraft / heat_in
+    eta_prop = Fn * V_aircraft / dKE
+    return heat_in, dKE, eta_th, eta_prop, eta_overall
 
 
 class Efficiency(om.ExplicitComponent):
-    """Component to calculate thermal, propulsive, and overall efficiencies"""
+    """Component to calculate thermal, propulsive, and overall efficiencies of num_nodes points"""
 
     def initialize(self):
-        self.options.declare('thermo_data', default=pyc.species_data.janaf,
-                            desc='Thermodynamic data to use for heat transfer calc')
+        self.options.declare("num_nodes", default=1, types=int, desc="Number of points evaluated at once")
+        self.options.declare("h_fuel", default=H_FUEL, desc="Fuel lower heating value in Btu/lbm, Jet-A by default")
 
     def setup(self):
+        nn = self.options["num_nodes"]
+        # read once here rather than on every compute and compute_partials
+        self._h_fuel = float(self.options["h_fuel"])
+
         # Inputs
-        self.add_input("Wfuel", val=0.0, units="lbm/s", desc="Mass flow rate of fuel")
-        self.add_input("Fn", val=10000.0, units="lbf", desc="Net thrust of the engine")
-        self.add_input("T4", val=1500.0, units="degK", desc="Combustor exit temperature")
-        self.add_input("T3", val=800.0, units="degK", desc="Compressor exit temperature")
-        self.add_input("V_aircraft", val=0.0, units="ft/s", desc="Aircraft velocity")
-        self.add_input("V_jet_core", val=0.0, units="ft/s", desc="Core nozzle exit velocity")
-        self.add_input("V_jet_bypass", val=0.0, units="ft/s", desc="Bypass nozzle exit velocity")
-        self.add_input("W_core", val=0.0, units="lbm/s", desc="Mass flow rate in the core")
-        self.add_input("W_bypass", val=0.0, units="lbm/s", desc="Mass flow rate in the bypass")
-        self.add_input('cp', val=1.0, units='Btu/(lbm*degR)', desc='Specific heat at constant pressure')
+        self.add_input("Wfuel", val=np.zeros(nn), units="lbm/s", desc="Mass flow rate of fuel")
+        self.add_input("Fn", val=np.full(nn, 10000.0), units="lbf", desc="Net thrust of the engine")
+        self.add_input("V_aircraft", val=np.zeros(nn), units="ft/s", desc="Aircraft velocity")
+        self.add_input("V_jet_core", val=np.zeros(nn), units="ft/s", desc="Core nozzle exit velocity")
+        self.add_input("V_jet_bypass", val=np.zeros(nn), units="ft/s", desc="Bypass nozzle exit velocity")
+        self.add_input("W_core", val=np.zeros(nn), units="lbm/s", desc="Mass flow rate of the core nozzle")
+        self.add_input("W_bypass", val=np.zeros(nn), units="lbm/s", desc="Mass flow rate of the bypass nozzle")
 
         # Outputs
-        self.add_output("eta_thermal", val=0.0, units=None, desc="Thermal Efficiency")
-        self.add_output("eta_propulsive", val=0.0, units=None, desc="Propulsive Efficiency")
-        self.add_output("eta_overall", val=0.0, units=None, desc="Overall Efficiency")
+        self.add_output("eta_thermal", val=np.zeros(nn), units=None, desc="Thermal Efficiency")
+        self.add_output("eta_propulsive", val=np.zeros(nn), units=None, desc="Propulsive Efficiency")
+        self.add_output("eta_overall", val=np.zeros(nn), units=None, desc="Overall Efficiency")
 
-        self.declare_partials('*', '*')
+        # every point only depends on its own inputs, and each efficiency only on its own group of them
+        jet = ["Wfuel", "V_aircraft", "V_jet_core", "V_jet_bypass", "W_core", "W_bypass"]
+        ar = np.arange(nn)
+        self.declare_partials("eta_thermal", jet, rows=ar, cols=ar)
+        self.declare_partials("eta_propulsive", ["Fn"] + jet, rows=ar, cols=ar)
+        self.declare_partials("eta_overall", ["Fn", "V_aircraft", "Wfuel"], rows=ar, cols=ar)
+
+    def _efficiencies(self, inputs):
+        return efficiency_terms(inputs["Wfuel"], inputs["Fn"], inputs["V_aircraft"], inputs["V_jet_core"],
+                                inputs["V_jet_bypass"], inputs["W_core"], inputs["W_bypass"], self._h_fuel)
 
     def compute(self, inputs, outputs):
-        # Retrieve from options
-        thermo_data = self.options["thermo_data"]
+        _, _, eta_th, eta_prop, eta_overall = self._efficiencies(inputs)
+
+        outputs["eta_thermal"] = eta_th
+        outputs["eta_propulsive"] = eta_prop
+        outputs["eta_overall"] = eta_overall
 
-        # Calculate Thermal Efficiency
-        h_fuel = thermo_data.get("h", T=298.15, units="Btu/lbm")  # Enthalpy of fuel
-        outputs["eta_thermal"] =  inputs["cp"] * (inputs["T4"] - inputs["T3"]) / (h_fuel * inputs["Wfuel"] + 1.0E-12)
+    def compute_partials(self, inputs, J):
+        heat_in, dKE, eta_th, eta_prop, eta_overall = self._efficiencies(inputs)
+        Fn = inputs["Fn"]
+        V0 = inputs["V_aircraft"]
+        dheat_dWfuel = self._h_fuel * BTU_FT_LBF
 
-        # Calculate Effective Jet Velocity
-        V_jet = (inputs["V_jet_core"] * inputs["W_core"] + inputs["V_jet_bypass"] * inputs["W_bypass"]) / (
-            inputs["W_core"] + inputs["W_bypass"] + 1.0E-12)
+        # jet kinetic energy gain partials
+        d_KE = {
+            "Wfuel": V0**2 / (2.0 * g_c),
+            "V_aircraft": -(inputs["W_core"] + inputs["W_bypass"] - inputs["Wfuel"]) * V0 / g_c,
+            "V_jet_core": inputs["W_core"] * inputs["V_jet_core"] / g_c,
+            "V_jet_bypass": inputs["W_bypass"] * inputs["V_jet_bypass"] / g_c,
+            "W_core": (inputs["V_jet_core"]**2 - V0**2) / (2.0 * g_c),
+            "W_bypass": (inputs["V_jet_bypass"]**2 - V0**2) / (2.0 * g_c),
+        }
 
-        # Calculate Propulsive Efficiency
-        outputs["eta_propulsive"] = (
-            (2.0 * inputs["V_aircraft"]) / (V_jet + inputs["V_aircraft"] + 1.0E-12)
-        )
+        # eta_thermal = dKE / heat_in, eta_propulsive = Fn * V0 / dKE
+        for name, val in d_KE.items():
+            J["eta_thermal", name] = val / heat_in
+            J["eta_propulsive", name] = -eta_prop * val / dKE
+        J["eta_thermal", "Wfuel"] -= eta_th * dheat_dWfuel / heat_in
+        J["eta_propulsive", "Fn"] = V0 / dKE
+        J["eta_propulsive", "V_aircraft"] += Fn / dKE
 
-        # Calculate Overall Efficiency
-        outputs["eta_overall"] = outputs["eta_thermal"] * outputs["eta_propulsive"]
-    
-    def compute_partials(self, inputs, J):
-        # constants
-        thermo_data = self.options["thermo_data"]
-        h_fuel = thermo_data.get("h", T=298.15, units="Btu/lbm")  # Enthalpy of fuel
-
-        # inputs
-        w_fuel = inputs['Wfuel']
-        t_4 = inputs['T4']
-        t_3 = inputs['T3']
-        v_air = inputs['V_aircraft']
-        v_jet_core = inputs['V_jet_core']
-        v_jet_bypass = inputs['V_jet_bypass']
-        w_core = inputs['W_core']
-        w_bypass = inputs['W_bypass']
-        cp = inputs['cp']
-        
-        # outputs
-        eta_th = (cp * (t_4 - t_3)) / (h_fuel * w_fuel + 1.0E-12)
-        v_jet = (v_jet_core * w_core + v_jet_bypass * w_bypass) / (w_core + w_bypass + 1.0E-12)
-        eta_prop = (2.0 * v_air) / (v_jet + v_air + 1.0E-12)
-
-        # thermal efficiency partials
-        J['eta_thermal', 'T4'] = cp / (h_fuel * w_fuel + 1.0E-12)
-        J['eta_thermal', 'T3'] = -cp / (h_fuel * w_fuel + 1.0E-12)
-        J['eta_thermal', 'Wfuel'] = -(cp * (t_4 - t_3)) / (h_fuel * w_fuel**2 + 1.0E-12) * h_fuel
-        J['eta_thermal', 'cp'] = (t_4 - t_3) / (h_fuel * w_fuel + 1.0E-12)
-
-        # propulsive efficiency partials
-        J['eta_propulsive', 'V_aircraft'] = 2.0 / (v_jet + v_air + 1.0E-12) - (2.0 * v_air) / (v_jet + v_air + 1.0E-12) ** 2
-        J['eta_propulsive', 'V_jet_core'] = - (2.0 * v_air) / (v_jet + v_air + 1.0E-12) ** 2 * (w_core / (w_core + w_bypass + 1.0E-12))
-        J['eta_propulsive', 'V_jet_bypass'] = - (2.0 * v_air) / (v_jet + v_air + 1.0E-12) ** 2 * (w_bypass / (w_core + w_bypass + 1.0E-12))
-        J['eta_propulsive', 'W_core'] = - (2.0 * v_air) / (v_jet + v_air + 1.0E-12) ** 2 * (v_jet_core - v_jet) / (w_core + w_bypass + 1.0E-12)
-        J['eta_propulsive', 'W_bypass'] = - (2.0 * v_air) / (v_jet + v_air + 1.0E-12) ** 2 * (v_jet_bypass - v_jet) / (w_core + w_bypass + 1.0E-12)
-        
-
-        # overall efficiency partials
-        J['eta_overall', 'T4'] = eta_prop * cp / (h_fuel * w_fuel + 1.0E-12)
-        J['eta_overall', 'T3'] = eta_prop * -cp / (h_fuel * w_fuel + 1.0E-12)
-        J['eta_overall', 'Wfuel'] = eta_prop * -(cp * (t_4 - t_3)) / (h_fuel * w_fuel**2 + 1.0E-12) * h_fuel
-        J['eta_overall', 'V_aircraft'] = eta_th * (2.0 / (v_jet + v_air + 1.0E-12) - (2.0 * v_air) / (v_jet + v_air + 1.0E-12) ** 2)
-        J['eta_overall', 'V_jet_core'] = eta_th * - (2.0 * v_air) / (v_jet + v_air + 1.0E-12) ** 2 * (w_core / (w_core + w_bypass + 1.0E-12))
-        J['eta_overall', 'V_jet_bypass'] = eta_th * - (2.0 * v_air) / (v_jet + v_air + 1.0E-12) ** 2 * (w_bypass / (w_core + w_bypass + 1.0E-12))
-        J['eta_overall', 'W_core'] = eta_th * - (2.0 * v_air) / (v_jet + v_air + 1.0E-12) ** 2 * (v_jet_core - v_jet) / (w_core + w_bypass + 1.0E-12)
-        J['eta_overall', 'W_bypass'] = eta_th * - (2.0 * v_air) / (v_jet + v_air + 1.0E-12) ** 2 * (v_jet_bypass - v_jet) / (w_core + w_bypass + 1.0E-12)
-        J['eta_overall', 'cp'] = eta_prop * (t_4 - t_3) / (h_fuel * w_fuel + 1.0E-12)
+        # eta_overall = Fn * V0 / heat_in
+        J["eta_overall", "Fn"] = V0 / heat_in
+        J["eta_overall", "V_aircraft"] = Fn / heat_in
+        J["eta_overall", "Wfuel"] = -eta_overall * dheat_dWfuel / heat_in
@@ -0,0 +1,187 @@
+import numpy as np
+from scipy.interpolate import RegularGridInterpolator
+from scipy.ndimage import binary_dilation, distance_transform_edt
+
+from sweep import DEFAULT_OUTPUTS, make_grid, run_sweep
+
+
+# flow stations written to the deck, with the total conditions and mass flow of each
+DECK_STATIONS = [
+    "inlet.Fl_O",
+    "fan.Fl_O",
+    "lpc.Fl_O",
+    "hpc.Fl_O",
+    "burner.Fl_O",
+    "hpt.Fl_O",
+    "lpt.Fl_O",
+    "core_nozz.Fl_O",
+    "byp_nozz.Fl_O",
+]
+
+DECK_OUTPUTS = DEFAULT_OUTPUTS + [
+    f"{fs}:{var}" for fs in DECK_STATIONS for var in ("tot:T", "tot:P", "stat:W")
+]
+
+
+def write_deck(path, axes, results, outputs=DECK_OUTPUTS):
+    """
+    Write sweep results over the full grid of `axes` (an ordered dict of grid column -> values,
+    in the order make_grid builds the product) to a columnar .npz deck. Every output is stored
+    as an array with one dimension per axis; points that did not converge are NaN.
+    """
+    shape = tuple(len(vals) for vals in axes.values())
+
+    data = {"axes": np.array(list(axes))}
+    for key, vals in axes.items():
+        data[f"axis:{key}"] = np.asarray(vals, dtype=float)
+    for name in outputs:
+        data[name] = np.asarray(results[name], dtype=float).reshape(shape)
+    data["converged"] = np.asarray(results["converged"]).reshape(shape)
+
+    np.savez(path, **data)
+
+
+def generate_deck(cycle_class, pt, path, MNs, alts, dTs=(0.0,), throttles=(1.0,), throttle_name="PC",
+                  setup_fn=None, outputs=DECK_OUTPUTS, num_procs=None, setup_cache=None):
+    """
+    Sweep point `pt` of `cycle_class` over the MN x alt x dTs x throttle grid (see run_sweep)
+    and write the result to `path` as an engine deck. `setup_cache` is passed to run_sweep.
+    """
+    axes = {"MN": MNs, "alt": alts, "dTs": dTs, throttle_name: throttles}
+    grid = make_grid(MNs, alts, dTs, throttles, throttle_name)
+
+    results = run_sweep(cycle_class, pt, grid, setup_fn=setup_fn, outputs=outputs, num_procs=num_procs,
+                        setup_cache=setup_cache)
+    write_deck(path, axes, results, outputs)
+
+    return results
+
+
+class EngineDeck:
+    """
+    Fast reader for decks written by write_deck. Queries are vectorised: every condition may be
+    a scalar or an array, and they are broadcast together. Axes with a single value are ignored
+    when interpolating.
+
+    method is any RegularGridInterpolator method: 'linear' (multilinear, the default),
+    'pchip' (monotone cubic, close to the Akima interpolation pyCycle uses for maps) or 'cubic'.
+    The cubic methods need at least 4 values on every swept axis. Axes swept in descending
+    order are reversed on reading.
+
+    Points that did not converge are NaN in the deck. With nan_policy 'mask' they are filled
+    from the nearest converged point before interpolating, so they do not spread along the
+    whole axis with the cubic methods, and queries that depend on one of them return NaN: in
+    a grid cell next to it, or for the cubic methods, whose slopes use the neighbouring points,
+    a cell further. With 'raise' a column with NaNs raises a ValueError when it is first used.
+    """
+
+    def __init__(self, path, method="linear", extrapolate=False, nan_policy="mask"):
+        if nan_policy not in ("mask", "raise"):
+            raise ValueError(f"nan_policy must be 'mask' or 'raise', not {nan_policy!r}")
+
+        with np.load(path) as data:
+            self.axis_names = [str(name) for name in data["axes"]]
+            self.axes = {name: data[f"axis:{name}"] for name in self.axis_names}
+            self.columns = {name: data[name] for name in data.files
+                            if name != "axes" and not name.startswith("axis:")}
+
+        # RegularGridInterpolator needs ascending axes
+        for i, name in enumerate(self.axis_names):
+            if len(self.axes[name]) > 1 and self.axes[name][0] > self.axes[name][-1]:
+                self.axes[name] = self.axes[name][::-1]
+                self.columns = {col: np.flip(vals, axis=i) for col, vals in self.columns.items()}
+
+        self.method = method
+        self.extrapolate = extrapolate
+        self.nan_policy = nan_policy
+
+        self._active = [i for i, name in enumerate(self.axis_names) if len(self.axes[name]) > 1]
+        self._interps = {}
+
+    def _interp(self, name):
+        """
+        Interpolator of column `name`, and one that is positive in the grid cells next to a
+        NaN point (None when there are none)
+        """
+        if name not in self._interps:
+            values = self.columns[name]
+            # collapse single valued axes
+            values = values.reshape([values.shape[i] for i in self._active])
+            grid = tuple(self.axes[self.axis_names[i]] for i in self._active)
+
+            failed = np.isnan(values)
+            mask = None
+            if failed.any():
+                if self.nan_policy == "raise" or failed.all():
+                    raise ValueError(f"Deck column {name} has {failed.sum()} of {failed.size} points that "
+                                     f"did not converge")
+                nearest = distance_transform_edt(failed, return_distances=False, return_indices=True)
+                values = values[tuple(nearest)]
+                if self.method not in ("linear", "slinear", "nearest"):
+                    failed = binary_dilation(failed)
+                mask = RegularGridInterpolator(grid, failed.astype(float), method="linear",
+                                               bounds_error=not self.extrapolate, fill_value=None)
+
+            interp = RegularGridInterpolator(
+                grid, values, method=self.method, bounds_error=not self.extrapolate,
+                fill_value=None,
+            )
+            self._interps[name] = (interp, mask)
+        return self._interps[name]
+
+    def _lookup(self, name, points, shape):
+        interp, mask = self._interp(name)
+        vals = interp(points)
+        if mask is not None:
+            vals[mask(points) > 0.0] = np.nan
+        return vals.reshape(shape)
+
+    def _points(self, conditions):
+        missing = [self.axis_names[i] for i in self._active if self.axis_names[i] not in conditions]
+        if missing:
+            raise ValueError(f"Deck query is missing conditions for {missing}")
+
+        vals = np.broadcast_arrays(*[np.asarray(conditions[self.axis_names[i]], dtype=float)
+                                     for i in self._active])
+        return np.stack([v.ravel() for v in vals], axis=-1), vals[0].shape
+
+    def get(self, name, **conditions):
+        """
+        Interpolate one deck column, e.g. deck.get("perf.Fn", MN=0.8, alt=35000.0, PC=[1.0, 0.9])
+        """
+        points, shape = self._points(conditions)
+        return self._lookup(name, points, shape)
+
+    def get_many(self, names, **conditions):
+        """
+        Interpolate several columns at the same conditions, returned as a dict
+        """
+        points, shape = self._points(conditions)
+        return {name: self._lookup(name, points, shape) for name in names}
+
+
+if __name__ == "__main__":
+
+    import time
+
+    from optim_hbtf import MPhbtf
+    from sweep import _hbtf_setup
+
+    generate_deck(
+        MPhbtf, "OD_TOfail", "hbtf_deck.npz",
+        MNs=[0.001, 0.2, 0.4, 0.6],
+        alts=[0.0, 5000.0, 10000.0],
+        throttles=[1650.0, 1750.0, 1850.0],
+        throttle_name="T4_MAX",
+        setup_fn=_hbtf_setup,
+    )
+
+    deck = EngineDeck("hbtf_deck.npz")
+
+    MN = np.random.uniform(0.001, 0.6, 100000)
+    alt = np.random.uniform(0.0, 10000.0, 100000)
+
+    st = time.time()
+    vals = deck.get_many(["perf.Fn", "burner.Wfuel"], MN=MN, alt=alt, T4_MAX=1800.0)
+    dt = time.time() - st
+    print(f"{len(MN)} deck queries in {dt:.3f} s ({dt / len(MN) * 1e6:.2f} us per query)")
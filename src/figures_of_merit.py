@@ -0,0 +1,70 @@
+import numpy as np
+
+from efficiency import H_FUEL, efficiency_terms
+from helper_functions import convert_tsfc_to_kgNs
+
+
+# figures_of_merit argument -> output of the point in sweep/deck results, in the model's units
+SWEEP_COLUMNS = {
+    "Wfuel": "burner.Wfuel",
+    "Fn": "perf.Fn",
+    "V_aircraft": "fc.Fl_O:stat:V",
+    "V_jet_core": "core_nozz.Fl_O:stat:V",
+    "V_jet_bypass": "byp_nozz.Fl_O:stat:V",
+    "W_core": "core_nozz.Fl_O:stat:W",
+    "W_bypass": "byp_nozz.Fl_O:stat:W",
+    "W_inlet": "inlet.Fl_O:stat:W",
+}
+
+# outputs to request from run_sweep / generate_deck so their results can be post-processed
+FOM_OUTPUTS = list(SWEEP_COLUMNS.values())
+
+
+def figures_of_merit(Wfuel, Fn, V_aircraft, V_jet_core, V_jet_bypass, W_core, W_bypass, W_inlet=None,
+                     h_fuel=H_FUEL):
+    """
+    Efficiencies and figures of merit of any number of operating points at once. Every argument
+    is a scalar or an array (broadcast together) in the units of the Efficiency inputs: lbm/s,
+    lbf and ft/s, with h_fuel in Btu/lbm. `W_inlet` defaults to W_core + W_bypass - Wfuel.
+
+    Returns a dict of arrays: eta_thermal, eta_propulsive and eta_overall (see
+    efficiency.efficiency_terms), specific thrust Fn/W_inlet in lbf/(lbm/s), TSFC in lbm/hr/lbf
+    and kg/s/N, and the core to bypass exhaust velocity ratio. Rows with NaN inputs (points that
+    did not converge) are NaN.
+    """
+    Wfuel, Fn, V_jet_core, V_jet_bypass = (np.asarray(val, dtype=float) for val in (Wfuel, Fn, V_jet_core, V_jet_bypass))
+    if W_inlet is None:
+        W_inlet = np.asarray(W_core, dtype=float) + W_bypass - Wfuel
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        _, _, eta_th, eta_prop, eta_overall = efficiency_terms(Wfuel, Fn, V_aircraft, V_jet_core, V_jet_bypass,
+                                                               W_core, W_bypass, h_fuel)
+        TSFC = 3600.0 * Wfuel / Fn
+
+        return {
+            "eta_thermal": eta_th,
+            "eta_propulsive": eta_prop,
+            "eta_overall": eta_overall,
+            "specific_thrust": Fn / W_inlet,
+            "TSFC": TSFC,
+            "TSFC_SI": convert_tsfc_to_kgNs(TSFC),
+            "velocity_ratio": V_jet_core / V_jet_bypass,
+        }
+
+
+def from_columns(columns, pt=None, h_fuel=H_FUEL):
+    """
+    figures_of_merit of a table of results: a mapping of SWEEP_COLUMNS outputs to arrays, such as
+    run_sweep results, an engine deck opened with np.load or a ResultsStore.query. Store columns
+    carry the point name, given as `pt` (e.g. 'DESIGN'). Missing inlet flows fall back to the
+    nozzle flows less the fuel.
+    """
+    prefix = f"{pt}." if pt else ""
+    args = {arg: np.asarray(columns[prefix + name], dtype=float)
+            for arg, name in SWEEP_COLUMNS.items() if prefix + name in columns}
+
+    missing = [prefix + name for arg, name in SWEEP_COLUMNS.items() if arg not in args and arg != "W_inlet"]
+    if missing:
+        raise KeyError(f"Columns needed for the figures of merit are missing: {missing}")
+
+    return figures_of_merit(**args, h_fuel=h_fuel)
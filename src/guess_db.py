@@ -0,0 +1,174 @@
+import os
+import pickle
+
+import numpy as np
+
+from sweep import OD_STATES
+
+
+# inputs that define the engine design; missing ones are skipped for a given model
+DESIGN_INPUTS = [
+    "fan:PRdes",
+    "lpc:PRdes",
+    "DESIGN.balance.rhs:hpc_PR",
+    "DESIGN.splitter.BPR",
+    "bal.rhs:DESIGN_BPR",
+    "DESIGN.Fn_DES",
+    "DESIGN.T4_MAX",
+]
+
+# inputs that define the operating condition of a point, relative to the point
+FLIGHT_INPUTS = ["fc.MN", "fc.alt", "fc.dTs", "T4_MAX", "PC"]
+
+# solver states stored per point, on top of the off-design ones used by the sweeps
+STATES = OD_STATES + [
+    "balance.lpt_PR",
+    "balance.hpt_PR",
+    "balance.hpc_PR",
+    "fc.balance.Pt",
+    "fc.balance.Tt",
+]
+
+
+def _existing(prob, names):
+    found = []
+    for name in names:
+        try:
+            prob.get_val(name)
+        except KeyError:
+            continue
+        found.append(name)
+    return found
+
+
+def _state_sources(prob, pt):
+    # the states as the outputs that actually hold them (e.g. DESIGN.hpt.PR is fed by
+    # DESIGN.balance.hpt_PR), dropping plain model inputs and duplicates
+    sources = []
+    for name in _existing(prob, [f"{pt}.{n}" for n in STATES]):
+        src = prob.model.get_source(name)
+        if not src.startswith("_auto_ivc") and src not in sources:
+            sources.append(src)
+    return [src[len(pt) + 1:] for src in sources]
+
+
+def residual_norm(prob, pt):
+    """
+    Norm of the residuals of point `pt` at its current state
+    """
+    point = prob.model._get_subsystem(pt)
+    point.run_apply_nonlinear()
+    _, _, residuals = point.get_nonlinear_vectors()
+    return residuals.get_norm()
+
+
+def is_converged(prob, pt, norm0=None):
+    """
+    True if point `pt` passes the convergence test of its Newton solver: the residual norm is
+    within atol, or within rtol of `norm0`, the norm the solve started from, when it is known
+    """
+    options = prob.model._get_subsystem(pt).nonlinear_solver.options
+    norm = residual_norm(prob, pt)
+    if not np.isfinite(norm):
+        return False
+    return norm <= options["atol"] or (norm0 is not None and norm <= options["rtol"] * norm0)
+
+
+class GuessDB:
+    """
+    Persistent store of converged solver states, used to produce initial guesses for new
+    points. Records are grouped by cycle type and by which inputs/states the point has, and
+    a guess is the inverse-distance weighted average of the k nearest records in the space
+    of design and flight inputs, each normalised by its spread over the stored records.
+    A point recorded again replaces its old record, and each table keeps the `max_records`
+    latest ones.
+    """
+
+    def __init__(self, path="guess_db.pkl", k=4, max_records=1000):
+        self.path = path
+        self.k = k
+        self.max_records = max_records
+        self.tables = {}
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                self.tables = pickle.load(f)
+
+    def _signature(self, prob, pt):
+        inputs = _existing(prob, DESIGN_INPUTS + [f"{pt}.{n}" for n in FLIGHT_INPUTS])
+        inputs = list(dict.fromkeys(inputs))
+        states = _state_sources(prob, pt)
+        # point names are stripped so OD_TOfail and OD_SLS of the same cycle share a table
+        input_keys = tuple(n[len(pt) + 1:] if n.startswith(pt + ".") else n for n in inputs)
+        return inputs, states, input_keys
+
+    def record(self, prob, pt, cycle_type, norm0=None):
+        """
+        Store the current state of point `pt`. Unconverged points are not stored and
+        False is returned; `norm0` is passed on to is_converged.
+        """
+        if not is_converged(prob, pt, norm0):
+            return False
+
+        inputs, states, input_keys = self._signature(prob, pt)
+        table = self.tables.setdefault((cycle_type, input_keys, tuple(states)), {"X": [], "Y": []})
+
+        x = np.array([prob.get_val(n)[0] for n in inputs])
+        y = np.array([prob.get_val(f"{pt}.{n}")[0] for n in states])
+
+        if table["X"]:
+            same = np.flatnonzero(np.all(np.isclose(table["X"], x, rtol=1e-10, atol=0.0), axis=1))
+            if same.size:
+                table["Y"][same[0]] = y
+                return True
+
+        table["X"].append(x)
+        table["Y"].append(y)
+        if len(table["X"]) > self.max_records:
+            del table["X"][0]
+            del table["Y"][0]
+        return True
+
+    def guess(self, prob, pt, cycle_type):
+        """
+        Interpolated state guess for point `pt`, as a dict of state name -> value.
+        Returns None if nothing was recorded for this kind of point yet.
+        """
+        inputs, states, input_keys = self._signature(prob, pt)
+        table = self.tables.get((cycle_type, input_keys, tuple(states)))
+        if not table or not table["X"]:
+            return None
+
+        X = np.array(table["X"])
+        Y = np.array(table["Y"])
+        x = np.array([prob.get_val(n)[0] for n in inputs])
+
+        span = X.max(axis=0) - X.min(axis=0)
+        span[span == 0.0] = 1.0
+        dist = np.linalg.norm((X - x) / span, axis=1)
+
+        nearest = np.argsort(dist)[:self.k]
+        if dist[nearest[0]] < 1e-12:
+            y = Y[nearest[0]]
+        else:
+            w = 1.0 / dist[nearest]
+            y = w.dot(Y[nearest]) / w.sum()
+
+        return dict(zip(states, y))
+
+    def apply(self, prob, pt, cycle_type):
+        """
+        Set the interpolated guess on point `pt`. Returns False, leaving the model
+        untouched, when there is no stored data to interpolate from.
+        """
+        guess = self.guess(prob, pt, cycle_type)
+        if guess is None:
+            return False
+        for name, val in guess.items():
+            prob[f"{pt}.{name}"] = val
+        return True
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self.tables, f)
+        os.replace(tmp, self.path)
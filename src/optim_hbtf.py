@@ -7,6 +7,15 @@ import openmdao.api as om
 import pycycle.api as pyc
 
 from plotting import plot_turbine_maps
+from guess_db import GuessDB
+from cea_cache import enable_cea_cache, cache_summary
+from recording import add_recording_profile
+from report import write_report
+from results_store import ResultsStore
+from setup_cache import cached_setup
+from telemetry import enable_solver_trace
+# example_cycles/N+3ref, on the path of the scripts with src, and of the tests through conftest.py
+from cycle_comps import FanDiameter, SimpleOPR, ExtractionRatio
 from N3_HPT_map import HPTMap
 from N3_LPT_map import LPTMap
 
@@ -18,6 +27,10 @@ class HBTF(pyc.Cycle):
         self.options.declare(
             "throttle_mode", default="T4", values=["T4", "percent_thrust"]
         )
+        self.options.declare(
+            "balance_options", default={}, types=dict,
+            desc="balance name -> add_balance arguments that replace the defaults below, e.g. {'W': {'lower': 300.0}}",
+        )
 
         super().initialize()
 
@@ -101,28 +114,11 @@ class HBTF(pyc.Cycle):
         self.add_subsystem("perf", pyc.Performance(num_nozzles=2, num_burners=1))
 
         # FAN AREA
-        self.add_subsystem(
-            "fan_dia",
-            om.ExecComp(
-                "FanDia = 2.0*(area/(pi*(1.0-hub_tip**2.0)))**0.5",
-                area={"val": 7000.0, "units": "inch**2"},
-                hub_tip={"val": 0.3125, "units": None},
-                FanDia={"val": 100.0, "units": "inch"},
-            ),
-        )
+        self.add_subsystem("fan_dia", FanDiameter())
         # Now use the explicit connect method to make connections -- connect(<from>, <to>)
         self.connect("inlet.Fl_O:stat:area", "fan_dia.area")
 
-        self.add_subsystem(
-            "opr_calc",
-            om.ExecComp(
-                "OPR_simple = FPR*LPCPR*HPCPR",
-                FPR={"val": 1.3, "units": None},
-                LPCPR={"val": 3.0, "units": None},
-                HPCPR={"val": 14.0, "units": None},
-                OPR_simple={"val": 55.0, "units": None},
-            ),
-        )
+        self.add_subsystem("opr_calc", SimpleOPR())
 
         # Connect the inputs to perf group
         self.connect("inlet.Fl_O:tot:P", "perf.Pt2")
@@ -143,12 +139,7 @@ class HBTF(pyc.Cycle):
         self.connect("fc.Fl_O:stat:P", "core_nozz.Ps_exhaust")
         self.connect("fc.Fl_O:stat:P", "byp_nozz.Ps_exhaust")
 
-        self.add_subsystem('ext_ratio', om.ExecComp('ER = core_V_ideal * core_Cv / ( byp_V_ideal *  byp_Cv )',
-                core_V_ideal={'val':1000.0, 'units':'ft/s'},
-                core_Cv={'val':0.98, 'units':None},
-                byp_V_ideal={'val':1000.0, 'units':'ft/s'},
-                byp_Cv={'val':0.98, 'units':None},
-                ER={'val':1.4, 'units':None}))
+        self.add_subsystem('ext_ratio', ExtractionRatio())
 
         self.connect('core_nozz.ideal_flow.V', 'ext_ratio.core_V_ideal')
         self.connect('byp_nozz.ideal_flow.V', 'ext_ratio.byp_V_ideal')
@@ -170,8 +161,13 @@ class HBTF(pyc.Cycle):
         # http://openmdao.org/twodocs/versions/latest/features/building_blocks/components/balance_comp.html
 
         balance = self.add_subsystem("balance", om.BalanceComp())
+        balance_options = self.options["balance_options"]
+
+        def add_balance(name, **kwargs):
+            balance.add_balance(name, **{**kwargs, **balance_options.get(name, {})})
+
         if design:
-            balance.add_balance("W", units="lbm/s", eq_units="lbf")
+            add_balance("W", units="lbm/s", eq_units="lbf")
             # Here balance.W is implicit state variable that is the OUTPUT of balance object
             self.connect(
                 "balance.W", "fc.W"
@@ -181,13 +177,13 @@ class HBTF(pyc.Cycle):
             )  # This statement makes perf.Fn the LHS of the balance eqn.
             self.promotes("balance", inputs=[("rhs:W", "Fn_DES")])
 
-            balance.add_balance("FAR", eq_units="degR", lower=1e-4, val=0.017)
+            add_balance("FAR", eq_units="degR", lower=1e-4, val=0.017)
             self.connect("balance.FAR", "burner.Fl_I:FAR")
             self.connect("burner.Fl_O:tot:T", "balance.lhs:FAR")
             self.promotes("balance", inputs=[("rhs:FAR", "T4_MAX")])
 
             # Note that for the following two balances the mult val is set to -1 so that the NET torque is zero
-            balance.add_balance(
+            add_balance(
                 "lpt_PR",
                 val=1.5,
                 lower=1.001,
@@ -200,7 +196,7 @@ class HBTF(pyc.Cycle):
             self.connect("lp_shaft.pwr_in_real", "balance.lhs:lpt_PR")
             self.connect("lp_shaft.pwr_out_real", "balance.rhs:lpt_PR")
 
-            balance.add_balance(
+            add_balance(
                 "hpt_PR",
                 val=1.5,
                 lower=1.001,
@@ -217,7 +213,7 @@ class HBTF(pyc.Cycle):
             # self.connect('balance.BPR', 'splitter.BPR')
             # self.connect('byp_nozz.Throat:stat:area', 'balance.lhs:BPR')
 
-            balance.add_balance('hpc_PR', val=14.0, units=None, eq_units=None)
+            add_balance('hpc_PR', val=14.0, units=None, eq_units=None)
             self.connect('balance.hpc_PR', ['hpc.PR', 'opr_calc.HPCPR'])
             # self.connect('perf.OPR', 'balance.lhs:hpc_PR')
             self.connect('opr_calc.OPR_simple', 'balance.lhs:hpc_PR')
@@ -239,22 +235,22 @@ class HBTF(pyc.Cycle):
             #           (hp_Nmech)   HP spool speed to balance shaft power on the high spool
 
             if self.options["throttle_mode"] == "T4":
-                balance.add_balance("FAR", val=0.017, lower=1e-4, eq_units="degR")
+                add_balance("FAR", val=0.017, lower=1e-4, eq_units="degR")
                 self.connect("balance.FAR", "burner.Fl_I:FAR")
                 self.connect("burner.Fl_O:tot:T", "balance.lhs:FAR")
                 self.promotes("balance", inputs=[("rhs:FAR", "T4_MAX")])
             elif self.options['throttle_mode'] == 'percent_thrust':
-                balance.add_balance('FAR', val=0.017, lower=1e-4, eq_units='lbf', use_mult=True)
+                add_balance('FAR', val=0.017, lower=1e-4, eq_units='lbf', use_mult=True)
                 self.connect('balance.FAR', 'burner.Fl_I:FAR')
                 self.connect('perf.Fn', 'balance.lhs:FAR')
 
-            balance.add_balance(
+            add_balance(
                 "W", units="lbm/s", lower=10.0, upper=2000.0, eq_units="inch**2"
             )
             self.connect("balance.W", "fc.W")
             self.connect("core_nozz.Throat:stat:area", "balance.lhs:W")
 
-            balance.add_balance("BPR", lower=2.0, upper=10.0, eq_units="inch**2")
+            add_balance("BPR", lower=2.0, upper=10.0, eq_units="inch**2")
             self.connect("balance.BPR", "splitter.BPR")
             self.connect("byp_nozz.Throat:stat:area", "balance.lhs:BPR")
 
@@ -263,7 +259,7 @@ class HBTF(pyc.Cycle):
             # self.connect('fan.map.RlineMap', 'balance.lhs:BPR')
 
             # Again for the following two balances the mult val is set to -1 so that the NET torque is zero
-            balance.add_balance(
+            add_balance(
                 "lp_Nmech",
                 val=1.5,
                 units="rpm",
@@ -276,7 +272,7 @@ class HBTF(pyc.Cycle):
             self.connect("lp_shaft.pwr_in_real", "balance.lhs:lp_Nmech")
             self.connect("lp_shaft.pwr_out_real", "balance.rhs:lp_Nmech")
 
-            balance.add_balance(
+            add_balance(
                 "hp_Nmech",
                 val=1.5,
                 units="rpm",
@@ -345,103 +341,7 @@ def viewer(prob, pt, file=sys.stdout):
     """
     print a report of all the relevant cycle properties
     """
-
-    if pt == "DESIGN":
-        MN = prob["DESIGN.fc.Fl_O:stat:MN"]
-        LPT_PR = prob["DESIGN.balance.lpt_PR"]
-        HPT_PR = prob["DESIGN.balance.hpt_PR"]
-        FAR = prob["DESIGN.balance.FAR"]
-    else:
-        MN = prob[pt + ".fc.Fl_O:stat:MN"]
-        LPT_PR = prob[pt + ".lpt.PR"]
-        HPT_PR = prob[pt + ".hpt.PR"]
-        FAR = prob[pt + ".balance.FAR"]
-
-    summary_data = (
-        MN,
-        prob[pt + ".fc.alt"],
-        prob[pt + ".inlet.Fl_O:stat:W"],
-        prob[pt + ".perf.Fn"],
-        prob[pt + ".perf.Fg"],
-        prob[pt + ".inlet.F_ram"],
-        prob[pt + ".perf.OPR"],
-        prob[pt + ".perf.TSFC"],
-        prob[pt + ".splitter.BPR"],
-    )
-    # TO SOLVE DEPRECIATION WARNING
-    summary_data = tuple(x.item() for x in summary_data)
-
-    print(file=file, flush=True)
-    print(file=file, flush=True)
-    print(file=file, flush=True)
-    print(
-        "----------------------------------------------------------------------------",
-        file=file,
-        flush=True,
-    )
-    print("                              POINT:", pt, file=file, flush=True)
-    print(
-        "----------------------------------------------------------------------------",
-        file=file,
-        flush=True,
-    )
-    print("                       PERFORMANCE CHARACTERISTICS", file=file, flush=True)
-    print(
-        "    Mach      Alt       W      Fn      Fg    Fram     OPR     TSFC      BPR ",
-        file=file,
-        flush=True,
-    )
-    print(
-        " %7.5f  %7.1f %7.3f %7.1f %7.1f %7.1f %7.3f  %7.5f  %7.3f" % summary_data,
-        file=file,
-        flush=True,
-    )
-
-    fs_names = [
-        "fc.Fl_O",
-        "inlet.Fl_O",
-        "fan.Fl_O",
-        "splitter.Fl_O1",
-        "splitter.Fl_O2",
-        "duct4.Fl_O",
-        "lpc.Fl_O",
-        "duct6.Fl_O",
-        "hpc.Fl_O",
-        "bld3.Fl_O",
-        "burner.Fl_O",
-        "hpt.Fl_O",
-        "duct11.Fl_O",
-        "lpt.Fl_O",
-        "duct13.Fl_O",
-        "core_nozz.Fl_O",
-        "byp_bld.Fl_O",
-        "duct15.Fl_O",
-        "byp_nozz.Fl_O",
-    ]
-    fs_full_names = [f"{pt}.{fs}" for fs in fs_names]
-    pyc.print_flow_station(prob, fs_full_names, file=file)
-
-    comp_names = ["fan", "lpc", "hpc"]
-    comp_full_names = [f"{pt}.{c}" for c in comp_names]
-    pyc.print_compressor(prob, comp_full_names, file=file)
-
-    pyc.print_burner(prob, [f"{pt}.burner"], file=file)
-
-    turb_names = ["hpt", "lpt"]
-    turb_full_names = [f"{pt}.{t}" for t in turb_names]
-    pyc.print_turbine(prob, turb_full_names, file=file)
-
-    noz_names = ["core_nozz", "byp_nozz"]
-    noz_full_names = [f"{pt}.{n}" for n in noz_names]
-    pyc.print_nozzle(prob, noz_full_names, file=file)
-
-    shaft_names = ["hp_shaft", "lp_shaft"]
-    shaft_full_names = [f"{pt}.{s}" for s in shaft_names]
-    pyc.print_shaft(prob, shaft_full_names, file=file)
-
-    bleed_names = ["hpc", "bld3", "byp_bld"]
-    bleed_full_names = [f"{pt}.{b}" for b in bleed_names]
-    pyc.print_bleed(prob, bleed_full_names, file=file)
+    write_report(prob, [pt], file=file)
 
 
 def map_plots(prob, pt):
@@ -454,38 +354,84 @@ def map_plots(prob, pt):
     plot_turbine_maps(prob, turb_full_names)
 
 
+# default values of the inputs promoted to the model, value or (value, units). The design fan and
+# LPC pressure ratios feed both the compressor and the OPR calculation, so they need one
+INPUT_DEFAULTS = {
+    "fan:PRdes": 1.75,
+    "lpc:PRdes": 1.2,
+}
+
+# default values of the DESIGN point inputs, value or (value, units)
+DESIGN_DEFAULTS = {
+    "fc.alt": (28000.0, "ft"),
+    "T4_MAX": (1600.0, "degK"),
+    "fc.MN": 0.74,
+    "inlet.MN": 0.70,
+    "fan.MN": 0.45,
+    "splitter.MN1": 0.32,
+    "splitter.MN2": 0.47,
+    "duct4.MN": 0.33,
+    "lpc.MN": 0.30,
+    "duct6.MN": 0.35,
+    "hpc.MN": 0.22,
+    "bld3.MN": 0.29,
+    "burner.MN": 0.1,
+    "hpt.MN": 0.35,
+    "duct11.MN": 0.3063,
+    "lpt.MN": 0.39,
+    "duct13.MN": 0.42,
+    "byp_bld.MN": 0.47,
+    "duct15.MN": 0.49,
+    "LP_Nmech": (4000, "rpm"),
+    "HP_Nmech": (13000, "rpm"),
+}
+
+# off-design points: throttle mode and input defaults
+OD_POINTS = {
+    # Single-engine failure during takeoff
+    "OD_TOfail": {
+        "throttle_mode": "T4",
+        "defaults": {
+            "fc.MN": 0.18,
+            "fc.alt": (0.0, "ft"),
+            "fc.dTs": (0.0, "degR"),  # Standard day
+            "T4_MAX": (1850.0, "degK"),
+        },
+    },
+    # Takeoff (all engines operating): MN 0.18, alt 0 ft, T4_MAX 1850 degK
+    # Top-of-climb: MN 0.7, alt 30000 ft, T4_MAX 1700 degK
+    # Landing: MN 0.2, alt 0 ft, T4_MAX 1600 degK
+}
+
+
 class MPhbtf(pyc.MPCycle):
 
+    def initialize(self):
+        self.options.declare("input_defaults", default=INPUT_DEFAULTS, types=dict,
+                             desc="promoted input -> default value, or (value, units)")
+        self.options.declare("design_defaults", default=DESIGN_DEFAULTS, types=dict,
+                             desc="DESIGN input -> default value, or (value, units)")
+        self.options.declare("od_points", default=OD_POINTS, types=dict,
+                             desc="off-design point -> {'throttle_mode': ..., 'defaults': {input: value}}")
+        self.options.declare("balance_options", default={}, types=dict,
+                             desc="'design' and 'off_design' -> balance_options of their HBTF points")
+
+        super().initialize()
+
     def setup(self):
+        balance_options = self.options["balance_options"]
 
         self.pyc_add_pnt(
-            "DESIGN", HBTF(thermo_method="CEA"), promotes_inputs=[('fan.PR', 'fan:PRdes'), ('lpc.PR', 'lpc:PRdes'),
+            "DESIGN", HBTF(thermo_method="CEA", balance_options=balance_options.get("design", {})), promotes_inputs=[('fan.PR', 'fan:PRdes'), ('lpc.PR', 'lpc:PRdes'),
                                                                   ('opr_calc.FPR', 'fan:PRdes'), ('opr_calc.LPCPR', 'lpc:PRdes')])
 
-        self.set_input_defaults("DESIGN.fc.alt", 28000.0, units="ft")
-        self.set_input_defaults("DESIGN.T4_MAX", 1600.0, units="degK")
-
-        # self.set_input_defaults("DESIGN.inlet.MN", 0.70)
-        # self.set_input_defaults("DESIGN.fan.MN", 0.45)
-        self.set_input_defaults("DESIGN.fc.MN", 0.74)
-        self.set_input_defaults("DESIGN.inlet.MN", 0.70)
-        self.set_input_defaults("DESIGN.fan.MN", 0.45)
-        self.set_input_defaults("DESIGN.splitter.MN1", 0.32)
-        self.set_input_defaults("DESIGN.splitter.MN2", 0.47)
-        self.set_input_defaults("DESIGN.duct4.MN", 0.33)
-        self.set_input_defaults("DESIGN.lpc.MN", 0.30)
-        self.set_input_defaults("DESIGN.duct6.MN", 0.35)
-        self.set_input_defaults("DESIGN.hpc.MN", 0.22)
-        self.set_input_defaults("DESIGN.bld3.MN", 0.29)
-        self.set_input_defaults("DESIGN.burner.MN", 0.1)
-        self.set_input_defaults("DESIGN.hpt.MN", 0.35)
-        self.set_input_defaults("DESIGN.duct11.MN", 0.3063)
-        self.set_input_defaults("DESIGN.lpt.MN", 0.39)
-        self.set_input_defaults("DESIGN.duct13.MN", 0.42)
-        self.set_input_defaults("DESIGN.byp_bld.MN", 0.47)
-        self.set_input_defaults("DESIGN.duct15.MN", 0.49)
-        self.set_input_defaults("DESIGN.LP_Nmech", 4000, units="rpm")
-        self.set_input_defaults("DESIGN.HP_Nmech", 13000, units="rpm")
+        for name, val in self.options["input_defaults"].items():
+            val, units = val if isinstance(val, (list, tuple)) else (val, None)
+            self.set_input_defaults(name, val, units=units)
+
+        for name, val in self.options["design_defaults"].items():
+            val, units = val if isinstance(val, (list, tuple)) else (val, None)
+            self.set_input_defaults(f"DESIGN.{name}", val, units=units)
 
         # --- Set up bleed values -----
 
@@ -516,39 +462,14 @@ class MPhbtf(pyc.MPCycle):
         self.pyc_add_cycle_param("lpt.cool2:frac_P", 0.0)
         self.pyc_add_cycle_param("hp_shaft.HPX", 250.0, units="hp")
 
-        self.od_pts = ["OD_TOfail"]  # , 'OD_TO', 'OD_TOC', 'OD_LDG']
+        self.od_pts = list(self.options["od_points"])
 
-        self.pyc_add_pnt(
-            "OD_TOfail", HBTF(design=False, thermo_method="CEA", throttle_mode="T4")
-        )
-        # self.pyc_add_pnt('OD_TO', HBTF(design=False, thermo_method='CEA', throttle_mode='T4'))
-        # self.pyc_add_pnt('OD_TOC', HBTF(design=False, thermo_method='CEA', throttle_mode='T4'))
-        # self.pyc_add_pnt('OD_LDG', HBTF(design=False, thermo_method='CEA', throttle_mode='T4'))
-
-        # Single-engine failure during takeoff
-        self.set_input_defaults("OD_TOfail.fc.MN", 0.18)
-        self.set_input_defaults("OD_TOfail.fc.alt", 0.0, units="ft")
-        self.set_input_defaults("OD_TOfail.fc.dTs", 0.0, units="degR")  # Standard day
-        self.set_input_defaults("OD_TOfail.T4_MAX", 1850.0, units="degK")
-
-        # # Takeoff (all engines operating)
-        # self.set_input_defaults('OD_TO.fc.MN', 0.18)
-        # self.set_input_defaults('OD_TO.fc.alt', 0., units='ft')
-        # self.set_input_defaults('OD_TO.fc.dTs', 0., units='degR')
-        # self.set_input_defaults('OD_TO.T4_MAX', 1850., units='degK')
-
-        # Top-of-climb
-        # self.set_input_defaults('OD_TOC.fc.MN', 0.7)
-        # self.set_input_defaults('OD_TOC.fc.alt', 30000., units='ft') # Example climb altitude
-        # self.set_input_defaults('OD_TOC.fc.dTs', 0., units='degR')
-        # self.set_input_defaults('OD_TOC.T4_MAX', 1700., units='degK') # Reduce TET slightly from takeoff
-
-        # # Landing
-        # self.set_input_defaults('OD_LDG.fc.MN', 0.2)
-        # self.set_input_defaults('OD_LDG.fc.alt', 0., units='ft')
-        # self.set_input_defaults('OD_LDG.fc.dTs', 0., units='degR')
-        # self.set_input_defaults('OD_LDG.T4_MAX', 1600., units='degK') # Lower TET for landing
-        # # self.set_input_defaults('OD_LDG.Fn_DES', 5000.0, units='lbf')
+        for pt, od_point in self.options["od_points"].items():
+            self.pyc_add_pnt(pt, HBTF(design=False, thermo_method="CEA", throttle_mode=od_point["throttle_mode"],
+                                      balance_options=balance_options.get("off_design", {})))
+            for name, val in od_point.get("defaults", {}).items():
+                val, units = val if isinstance(val, (list, tuple)) else (val, None)
+                self.set_input_defaults(f"{pt}.{name}", val, units=units)
 
         self.pyc_use_default_des_od_conns()
 
@@ -561,71 +482,78 @@ class MPhbtf(pyc.MPCycle):
 
 if __name__ == "__main__":
 
+    import os
     import time
 
-    prob = om.Problem()
-    prob.model = mp_hbtf = MPhbtf()
+    def build_problem():
+        prob = om.Problem()
+        prob.model = MPhbtf()
 
-    prob.model.pyc_add_cycle_param('ext_ratio.core_Cv', 0.9999)
-    prob.model.pyc_add_cycle_param('ext_ratio.byp_Cv', 0.9975)
+        prob.model.pyc_add_cycle_param('ext_ratio.core_Cv', 0.9999)
+        prob.model.pyc_add_cycle_param('ext_ratio.byp_Cv', 0.9975)
 
-    bal = prob.model.add_subsystem('bal', om.BalanceComp())
+        bal = prob.model.add_subsystem('bal', om.BalanceComp())
 
-    bal.add_balance('DESIGN_BPR', val=23.7281, units=None, eq_units=None)
-    prob.model.connect('bal.DESIGN_BPR', 'DESIGN.splitter.BPR')
-    prob.model.connect('DESIGN.ext_ratio.ER', 'bal.lhs:DESIGN_BPR')
+        bal.add_balance('DESIGN_BPR', val=23.7281, units=None, eq_units=None)
+        prob.model.connect('bal.DESIGN_BPR', 'DESIGN.splitter.BPR')
+        prob.model.connect('DESIGN.ext_ratio.ER', 'bal.lhs:DESIGN_BPR')
     
-    # bal.add_balance('CRZ_Fn_target', val=5514.4, units='lbf', eq_units='lbf', use_mult=True, mult_val=0.9, ref0=5000.0, ref=7000.0)
-    # prob.model.connect('bal.CRZ_Fn_target', 'CRZ.balance.rhs:FAR')
-    # prob.model.connect('TOC.perf.Fn', 'bal.lhs:CRZ_Fn_target')
-    # prob.model.connect('CRZ.perf.Fn','bal.rhs:CRZ_Fn_target')
-
-    # bal.add_balance('SLS_Fn_target', val=28620.8, units='lbf', eq_units='lbf', use_mult=True, mult_val=1.2553, ref0=28000.0, ref=30000.0)
-    # prob.model.connect('bal.SLS_Fn_target', 'SLS.balance.rhs:FAR')
-    # prob.model.connect('RTO.perf.Fn', 'bal.lhs:SLS_Fn_target')
-    # prob.model.connect('SLS.perf.Fn','bal.rhs:SLS_Fn_target')
-
-    # 1) Set up an optimizer driver
-    prob.driver = om.ScipyOptimizeDriver()
-    prob.driver.options["optimizer"] = "SLSQP"
-    prob.driver.options["maxiter"] = 30
-    prob.driver.options["debug_print"] = ["desvars", "nl_cons", "objs"]
-    # Optionally prob.driver.opt_settings = { ... } for advanced control
-
-    # for component in ['DESIGN.core_nozz.ideal_flow', 'DESIGN.core_nozz.staticPs', 'DESIGN.lpt.out_stat', 'DESIGN.byp_bld.out_stat', 'DESIGN.duct13.out_stat', 'DESIGN.byp_nozz.ideal_flow']:
-    #     prob.model.set_input_defaults(f'{component}.nonlinear_solver.linesearch.options["print_bound_enforce"]', True)
-
-    # 2) Add design variables
-    # Example: HPC PR, fan PR, and T4 at design
-    # HPC PR is often the product lpc.PR * hpc.PR, or you can do them individually.
-    # We'll assume HPC has a single PR.  If your code is separated, adapt accordingly.
-    prob.model.add_design_var('fan:PRdes', lower=1.20, upper=1.75)
-    prob.model.add_design_var('lpc:PRdes', lower=1.2, upper=4.0)
-    prob.model.add_design_var('DESIGN.balance.rhs:hpc_PR', lower=29.0, upper=35.0, ref0=29.0, ref=35.0)
-    prob.model.add_design_var('bal.rhs:DESIGN_BPR', lower=1.30, upper=1.6, ref0=1.30, ref=1.45)
-    # prob.model.add_design_var("DESIGN.splitter.BPR", lower=4.0, upper=7.0, ref=5.9)  # Bypass ratio    # prob.model.add_design_var("CRZ.T4_MAX", lower=2700.0, upper=3400.0)
-
-    prob.model.add_objective("DESIGN.perf.TSFC", ref0=0.4, ref=0.6)
-
-    # constraints
-    prob.model.add_constraint(
-        "OD_TOfail.perf.Fn", lower=40000.0, units="lbf", ref=45000
-    )
-    # prob.model.add_constraint("DESIGN.perf.Fn", lower=5000., units='lbf', ref=5000)
-    prob.model.add_constraint("DESIGN.balance.FAR", lower=0.015, upper=0.03, ref=0.025)
-    prob.model.add_constraint("DESIGN.fan_dia.FanDia", lower=70.0, upper=86, ref0=70.0, ref=85.0)
-
-    recorder = om.SqliteRecorder("N3_opt.sql")
-    prob.model.add_recorder(recorder)
-    prob.model.recording_options["record_inputs"] = True
-    prob.model.recording_options["record_outputs"] = True
-    prob.model.recording_options["includes"] = [
-        "*",  # Record all available variables
-        "*.s_Wc", "*.s_PR", "*.s_eff", "*.s_Nc",  # Explicitly store these variables
-        "*.Wc", "*.map.scalars.PR", "*.map.scalars.eff", "*.Wp"
-    ]
-
-    prob.setup()
+        # bal.add_balance('CRZ_Fn_target', val=5514.4, units='lbf', eq_units='lbf', use_mult=True, mult_val=0.9, ref0=5000.0, ref=7000.0)
+        # prob.model.connect('bal.CRZ_Fn_target', 'CRZ.balance.rhs:FAR')
+        # prob.model.connect('TOC.perf.Fn', 'bal.lhs:CRZ_Fn_target')
+        # prob.model.connect('CRZ.perf.Fn','bal.rhs:CRZ_Fn_target')
+
+        # bal.add_balance('SLS_Fn_target', val=28620.8, units='lbf', eq_units='lbf', use_mult=True, mult_val=1.2553, ref0=28000.0, ref=30000.0)
+        # prob.model.connect('bal.SLS_Fn_target', 'SLS.balance.rhs:FAR')
+        # prob.model.connect('RTO.perf.Fn', 'bal.lhs:SLS_Fn_target')
+        # prob.model.connect('SLS.perf.Fn','bal.rhs:SLS_Fn_target')
+
+        # 1) Set up an optimizer driver
+        prob.driver = om.ScipyOptimizeDriver()
+        prob.driver.options["optimizer"] = "SLSQP"
+        prob.driver.options["maxiter"] = 30
+        prob.driver.options["debug_print"] = ["desvars", "nl_cons", "objs"]
+        # Optionally prob.driver.opt_settings = { ... } for advanced control
+
+        # for component in ['DESIGN.core_nozz.ideal_flow', 'DESIGN.core_nozz.staticPs', 'DESIGN.lpt.out_stat', 'DESIGN.byp_bld.out_stat', 'DESIGN.duct13.out_stat', 'DESIGN.byp_nozz.ideal_flow']:
+        #     prob.model.set_input_defaults(f'{component}.nonlinear_solver.linesearch.options["print_bound_enforce"]', True)
+
+        # 2) Add design variables
+        # Example: HPC PR, fan PR, and T4 at design
+        # HPC PR is often the product lpc.PR * hpc.PR, or you can do them individually.
+        # We'll assume HPC has a single PR.  If your code is separated, adapt accordingly.
+        prob.model.add_design_var('fan:PRdes', lower=1.20, upper=1.75)
+        prob.model.add_design_var('lpc:PRdes', lower=1.2, upper=4.0)
+        prob.model.add_design_var('DESIGN.balance.rhs:hpc_PR', lower=29.0, upper=35.0, ref0=29.0, ref=35.0)
+        prob.model.add_design_var('bal.rhs:DESIGN_BPR', lower=1.30, upper=1.6, ref0=1.30, ref=1.45)
+        # prob.model.add_design_var("DESIGN.splitter.BPR", lower=4.0, upper=7.0, ref=5.9)  # Bypass ratio    # prob.model.add_design_var("CRZ.T4_MAX", lower=2700.0, upper=3400.0)
+
+        prob.model.add_objective("DESIGN.perf.TSFC", ref0=0.4, ref=0.6)
+
+        # constraints
+        prob.model.add_constraint(
+            "OD_TOfail.perf.Fn", lower=40000.0, units="lbf", ref=45000
+        )
+        # prob.model.add_constraint("DESIGN.perf.Fn", lower=5000., units='lbf', ref=5000)
+        prob.model.add_constraint("DESIGN.balance.FAR", lower=0.015, upper=0.03, ref=0.025)
+        prob.model.add_constraint("DESIGN.fan_dia.FanDia", lower=70.0, upper=86, ref0=70.0, ref=85.0)
+
+        # map data for plotting.py and the optimisation history; use "full-debug" to record every variable
+        add_recording_profile(prob, "map-plotting", "N3_opt.sql")
+        add_recording_profile(prob, "optimisation-history", "N3_hist.sql")
+
+        return prob
+
+    # the set up problem is restored from setup_cache/ while the cycle definition is unchanged
+    prob = cached_setup(build_problem)
+
+    # reuse converged chemical equilibrium states across Newton and optimizer iterations
+    cea_caches = enable_cea_cache(prob)
+
+    # Newton iterations, line searches, factorisations and element times of every point solve,
+    # off by default as tracing slows every solve: HBTF_SOLVER_TRACE=solver_trace.jsonl
+    trace_file = os.environ.get("HBTF_SOLVER_TRACE")
+    solver_trace = enable_solver_trace(prob, trace_file) if trace_file else None
 
     prob.set_val("DESIGN.fc.alt", 28000.0, units="ft")
     prob.set_val("DESIGN.fc.MN", 0.74)
@@ -689,6 +617,11 @@ if __name__ == "__main__":
         prob[pt+'.lpc.map.RlineMap'] = lpc_Rline_guess[i]
         prob[pt+'.hpc.map.RlineMap'] = hpc_Rline_guess[i]
 
+    # converged states from earlier runs replace the hand-set guesses above once they exist
+    guess_db = GuessDB("hbtf_guesses.pkl")
+    for pt in ["DESIGN"] + prob.model.od_pts:
+        guess_db.apply(prob, pt, "hbtf")
+
     # for pt in ["OD_TOfail"]:  # , 'OD_TO']: #, 'OD_TOC', 'OD_LDG']:
     #     # initial guesses
     #     prob[pt + ".balance.FAR"] = 0.03
@@ -710,17 +643,24 @@ if __name__ == "__main__":
     prob.run_model()
     # prob.run_driver()
 
+    for pt in ["DESIGN"] + prob.model.od_pts:
+        guess_db.record(prob, pt, "hbtf")
+    guess_db.save()
+
+    # queryable history of every run, e.g. store.query([("OD_TOfail.perf.Fn", ">", 40000.0)])
+    with ResultsStore("output_data/results_store") as store:
+        store.append(prob, ["DESIGN"] + prob.model.od_pts, cycle="optim_hbtf")
+
     # file
     date_time = time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime())
     # create file:
-    import os
-
     os.makedirs("output_data", exist_ok=True)
-    viewer_file = open(f"output_data/hbtf2_{date_time}.out", "w")
-    for pt in ["DESIGN"] + prob.model.od_pts:
-        viewer(prob, pt, file=viewer_file)
+    write_report(prob, ["DESIGN"] + prob.model.od_pts, f"output_data/hbtf2_{date_time}.out")
 
     # map_plots(prob, 'DESIGN')
 
     print()
+    print(cache_summary(cea_caches))
+    if solver_trace is not None:
+        solver_trace.write_summary()
     print("Run time", time.time() - st)
@@ -0,0 +1,201 @@
+import atexit
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import openmdao.api as om
+from openmdao.recorders.recording_iteration_stack import Recording
+
+from sweep import worker_env
+
+
+# per-process state, filled once by _init_worker
+_worker = {}
+
+
+def _init_worker(build_fn, build_args):
+    prob = build_fn(*build_args)
+    prob.final_setup()
+    prob.set_solver_print(level=-1)
+    _worker["prob"] = prob
+
+
+def _solve_point(pt, inputs, outputs):
+    """
+    Converge point `pt` of the worker's problem from the given input and output vectors of
+    the point, and return them converged
+    """
+    point = _worker["prob"].model._get_subsystem(pt)
+    if point._inputs.asarray().size != inputs.size or point._outputs.asarray().size != outputs.size:
+        raise RuntimeError(f"Point '{pt}' of the worker problem does not match the main problem, "
+                           "build_fn must build the same model")
+
+    # the vectors are exchanged scaled, as they are while the main problem solves, so they are
+    # set and read here in the scaled context run_solve_nonlinear() works in. The point's own
+    # solver only transfers within the point, so the values set here for the inputs connected
+    # from the design point and the cycle parameters stay as they are
+    with point._scaled_context_all():
+        point._inputs.set_val(inputs)
+        point._outputs.set_val(outputs)
+    error = None
+    try:
+        point.run_solve_nonlinear()
+    except om.AnalysisError as err:
+        error = str(err)
+
+    with point._scaled_context_all():
+        return pt, point._inputs.asarray(copy=True), point._outputs.asarray(copy=True), error
+
+
+class ParallelPointsRunOnce(om.NonlinearRunOnce):
+    """
+    Nonlinear solver for an MPCycle that runs its subsystems once, in order, like
+    NonlinearRunOnce, except that consecutive subsystems listed in `points` (by default the
+    od_pts of the cycle) are solved concurrently in a process pool. The off-design points only
+    depend on the design point and the cycle parameters, so once the design point is converged
+    each is sent to a worker with its input and output vectors, converged there from the
+    current solution, and copied back. The vectors are exchanged as the solver finds them, in
+    the scaled state the model solves in, and the loop over the subsystems transfers their
+    inputs like NonlinearRunOnce does; OpenMDAO has no public API for either inside a solver.
+
+    Each converged point is then evaluated here, which leaves its outputs as they are but
+    fills the state its components keep from their last evaluations and use in linearize(),
+    such as the residual weights and trace species of the CEA ChemEq. Without it the
+    derivatives for the optimiser, computed as usual in this process, would be those of the
+    guesses the point started from.
+
+    Every worker holds its own copy of the problem, made by `build_fn(*build_args)`, which
+    must set up the same model as the one this solver is attached to and be importable at
+    module level.
+    """
+
+    SOLVER = "NL: PARPOINTS"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._pool = None
+        self._subsys_sources = None
+        atexit.register(self.close)
+
+    def _setup_solvers(self, system, depth):
+        super()._setup_solvers(system, depth)
+        self._subsys_sources = None
+
+    def _declare_options(self):
+        super()._declare_options()
+        self.options.declare("build_fn", default=None, allow_none=True,
+                             desc="function returning a set up Problem with the same model, for the workers")
+        self.options.declare("build_args", default=(), types=tuple, desc="arguments of build_fn")
+        self.options.declare("points", default=None, allow_none=True, types=list,
+                             desc="subsystems solved in parallel, default the od_pts of the cycle")
+        self.options.declare("num_procs", default=None, allow_none=True, types=int,
+                             desc="number of worker processes, default one per point up to the CPU count")
+
+    def _get_pool(self, num_points):
+        if self._pool is None:
+            if self.options["build_fn"] is None:
+                raise RuntimeError(f"{self.msginfo}: option 'build_fn' must be set to solve points in parallel")
+            num_procs = self.options["num_procs"] or min(num_points, os.cpu_count())
+            ctx = multiprocessing.get_context("spawn")
+            self._pool = ProcessPoolExecutor(max_workers=num_procs, mp_context=ctx, initializer=_init_worker,
+                                             initargs=(self.options["build_fn"], self.options["build_args"]))
+        return self._pool
+
+    def _solve_batch(self, batch):
+        pool = self._get_pool(len(batch))
+        # the pool starts its workers as points are submitted, so all of them inherit the worker env
+        with worker_env():
+            futures = [pool.submit(_solve_point, point.name, point._inputs.asarray(copy=True),
+                                   point._outputs.asarray(copy=True))
+                       for point in batch]
+
+        points = {point.name: point for point in batch}
+        errors = []
+        for future in futures:
+            pt, inputs, outputs, error = future.result()
+            points[pt]._inputs.set_val(inputs)
+            points[pt]._outputs.set_val(outputs)
+            if error is not None:
+                errors.append(error)
+            else:
+                # the state linearize() relies on, see the class docstring. Twice, as ChemEq
+                # drops the trace species depending on the residual of its previous evaluation
+                points[pt]._apply_nonlinear()
+                points[pt]._apply_nonlinear()
+
+        if errors:
+            raise om.AnalysisError("\n".join(errors))
+
+    def _sources(self, system, parallel):
+        # point -> names of the sibling subsystems it takes inputs from
+        if self._subsys_sources is None:
+            self._subsys_sources = {}
+            prefix = f"{system.pathname}." if system.pathname else ""
+            for subsys in system.system_iter(recurse=False):
+                if subsys.name not in parallel:
+                    continue
+                inputs = subsys.list_inputs(val=False, out_stream=None, return_format="dict")
+                self._subsys_sources[subsys.name] = {
+                    system.get_source(f"{subsys.pathname}.{name}")[len(prefix):].split(".")[0] for name in inputs
+                }
+        return self._subsys_sources
+
+    def solve(self):
+        system = self._system()
+        parallel = self.options["points"]
+        if parallel is None:
+            parallel = getattr(system, "od_pts", [])
+        sources = self._sources(system, parallel)
+
+        with Recording("ParallelPointsRunOnce", 0, self) as rec:
+            batch = []
+            for subsys in system.system_iter(recurse=False):
+                if subsys.name in parallel:
+                    # a point using results of a point of the batch (e.g. cooling flows of the
+                    # RTO point in MPN3) starts the next batch
+                    if sources[subsys.name] & {point.name for point in batch}:
+                        self._solve_batch(batch)
+                        batch = []
+                    system._transfer("nonlinear", "fwd", subsys.name)
+                    batch.append(subsys)
+                    continue
+
+                # anything after a block of points may depend on them
+                if batch:
+                    self._solve_batch(batch)
+                    batch = []
+                system._transfer("nonlinear", "fwd", subsys.name)
+                subsys._solve_nonlinear()
+
+            if batch:
+                self._solve_batch(batch)
+
+            rec.abs = 0.0
+            rec.rel = 0.0
+
+    def close(self):
+        """
+        Shut down the worker processes
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def enable_parallel_points(prob, build_fn, build_args=(), points=None, num_procs=None):
+    """
+    Solve the off-design points of the MPCycle model of `prob` concurrently once its design
+    point is converged, see ParallelPointsRunOnce. Call after prob.setup(). Only a model run
+    once is supported: a cycle whose setup() gives it a solver of its own, like the Newton
+    of MPN3 that couples its TOC and RTO points, raises a ValueError. Returns the solver.
+    """
+    if type(prob.model.nonlinear_solver) is not om.NonlinearRunOnce:
+        raise ValueError(f"{prob.model.msginfo}: points can only be solved in parallel when the model is "
+                         f"run once, not with a {type(prob.model.nonlinear_solver).__name__}")
+
+    solver = ParallelPointsRunOnce(build_fn=build_fn, build_args=tuple(build_args), points=points,
+                                   num_procs=num_procs)
+    prob.model.nonlinear_solver = solver
+    # the solvers may already be set up by final_setup()
+    solver._setup_solvers(prob.model, 0)
+    return solver
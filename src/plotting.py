@@ -1,10 +1,21 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import matplotlib.pyplot as plt
 import numpy as np
 import openmdao.api as om
 import pycycle.api as pyc
 
+from case_index import IndexedCaseReader
+
+
+COMPRESSORS = ["fan", "lpc", "hpc"]
+TURBINES = ["hpt", "lpt"]
 
-def plot_turbine_maps(case, element_names, eff_vals=np.linspace(0, 1, 11)):
+
+def plot_turbine_maps(case, element_names, eff_vals=np.linspace(0, 1, 11), out_dir=".", tag=""):
 
     for e_name in element_names:
         try:
@@ -45,13 +56,14 @@ def plot_turbine_maps(case, element_names, eff_vals=np.linspace(0, 1, 11)):
             plt.ylabel("PR")
             plt.title(e_name)
 
-            plt.savefig(f"{e_name}.png")  
+            plt.savefig(os.path.join(out_dir, f"{e_name}{tag}.png"))
+            plt.close()
 
         except KeyError as e:
             print(f"Error: Missing key in case data for {e_name} - {e}")
 
 
-def plot_compressor_maps(case, element_names, eff_vals=np.linspace(0, 1, 11), alphas=[0]):
+def plot_compressor_maps(case, element_names, eff_vals=np.linspace(0, 1, 11), alphas=[0], out_dir=".", tag=""):
     for e_name in element_names:
         try:
             # Extract stored variables from the case
@@ -94,25 +106,135 @@ def plot_compressor_maps(case, element_names, eff_vals=np.linspace(0, 1, 11), al
                 plt.title(e_name)
 
                 # SAVE AS PDF FOR FINAL
-                plt.savefig(f"{e_name}.png")  
+                plt.savefig(os.path.join(out_dir, f"{e_name}{tag}.png"))
+                plt.close()
 
         except KeyError as e:
             print(f"Error: Missing key in case data for {e_name} - {e}")
 
 
-def post_map_plots(case, pt):
+def post_map_plots(case, pt, out_dir=".", tag=""):
     """
     Plots compressor and turbine maps using a recorded OpenMDAO Case object.
+    `tag` is appended to the file names, e.g. the iteration, so plots of several cases don't overwrite each other.
+    """
+    comp_full_names = [f'{pt}.{c}' for c in COMPRESSORS]
+
+    plot_compressor_maps(case, comp_full_names, out_dir=out_dir, tag=tag)
+
+    turb_full_names = [f'{pt}.{t}' for t in TURBINES]
+
+    plot_turbine_maps(case, turb_full_names, out_dir=out_dir, tag=tag)
+
+
+def _map_data(e_name):
+    # same choice of map as the single case plots
+    if "hpt" in e_name:
+        return pyc.HPTMap
+    if "lpt" in e_name:
+        return pyc.LPTMap
+    if "hpc" in e_name:
+        return pyc.HPCMap
+    if "lpc" in e_name:
+        return pyc.LPCMap
+    return pyc.FanMap
+
+
+def _draw_map_background(ax, e_name, eff_vals, alpha=0):
     """
-    comp_names = ["fan", "lpc", "hpc"]
-    comp_full_names = [f'{pt}.{c}' for c in comp_names]
+    Unscaled map of the element: speed lines, R lines for compressors and efficiency contours
+    """
+    map_data = _map_data(e_name)
+
+    if e_name.rpartition(".")[2] in TURBINES:
+        PRmap, NpMap = np.meshgrid(map_data.PRmap, map_data.NpMap, indexing='ij')
+        Wp = map_data.WpMap[alpha].T
+        Np = ax.contour(Wp, PRmap, NpMap, colors='k', levels=map_data.NpMap)
+        eff = ax.contourf(Wp, PRmap, map_data.effMap[alpha].T, levels=eff_vals, cmap='viridis')
+        ax.clabel(Np, fontsize=9, inline=False)
+        ax.set_xlabel("WpMap")
+    else:
+        RlineMap, NcMap = np.meshgrid(map_data.RlineMap, map_data.NcMap, sparse=False)
+        Wc = map_data.WcMap[alpha]
+        PR = map_data.PRmap[alpha]
+        Nc = ax.contour(Wc, PR, NcMap, colors='k', levels=map_data.NcMap)
+        R = ax.contour(Wc, PR, RlineMap, colors='k', levels=map_data.RlineMap)
+        eff = ax.contourf(Wc, PR, map_data.effMap[alpha], levels=eff_vals)
+        ax.clabel(Nc, fontsize=9, inline=False)
+        ax.clabel(R, fontsize=9, inline=False)
+        ax.set_xlabel("WcMap")
+
+    ax.figure.colorbar(eff, ax=ax)
+    ax.set_ylabel("PRmap")
+
+
+def _init_render():
+    plt.switch_backend("Agg")
+
+
+def _render_map_frames(e_name, flow, PR, counters, frames, out_dir, eff_vals):
+    """
+    Draw the map of `e_name` once, then save one image per frame with the operating line up to
+    and including that case
+    """
+    fig, ax = plt.subplots(figsize=(11, 8))
+    _draw_map_background(ax, e_name, eff_vals)
+    trail, = ax.plot([], [], '-', color='0.5', lw=1)
+    point, = ax.plot([], [], 'ko')
+
+    files = []
+    for i in frames:
+        trail.set_data(flow[:i + 1], PR[:i + 1])
+        point.set_data([flow[i]], [PR[i]])
+        ax.set_title(f"{e_name}, case {counters[i]}")
+        files.append(os.path.join(out_dir, f"{e_name}_{counters[i]:04d}.png"))
+        fig.savefig(files[-1])
+
+    plt.close(fig)
+    return files
+
+
+def render_map_history(filename, pt, out_dir="map_frames", cases=None, num_procs=None,
+                       eff_vals=np.linspace(0, 1, 11)):
+    """
+    Render the operating point of every compressor and turbine of point `pt` over the recorded
+    cases of `filename` (default all), one image per element and case named
+    <element>_<counter>.png, e.g. as frames of an operating line movie.
+
+    The points are shown in unscaled map coordinates (map.WcMap or map.WpMap and map.PRmap),
+    so each map background stays the same through an optimisation where the map scalars
+    change. Only those variables are read from the recorder file, and the frames are drawn in
+    a process pool with the Agg backend, the background once per element and worker.
+    """
+    reader = IndexedCaseReader(filename)
+    cases = list(range(len(reader))) if cases is None else list(cases)
+    counters = [reader.list_cases()[pos][1] for pos in cases]
+
+    elements = [f"{pt}.{e}" for e in COMPRESSORS + TURBINES]
+    history = {}
+    for e_name in elements:
+        flow = "map.WpMap" if e_name.rpartition(".")[2] in TURBINES else "map.WcMap"
+        vals = reader.history([f"{e_name}.{flow}", f"{e_name}.map.PRmap"], cases)
+        history[e_name] = (vals[f"{e_name}.{flow}"][:, 0], vals[f"{e_name}.map.PRmap"][:, 0])
+
+    os.makedirs(out_dir, exist_ok=True)
+    num_procs = num_procs or os.cpu_count()
 
-    plot_compressor_maps(case, comp_full_names)
+    # split each element's frames so every worker gets a share
+    pieces = max(1, math.ceil(num_procs / len(elements)))
+    tasks = []
+    for e_name in elements:
+        for frames in np.array_split(np.arange(len(cases)), pieces):
+            if len(frames):
+                tasks.append((e_name, *history[e_name], counters, list(frames), out_dir, eff_vals))
 
-    turb_names = ["hpt", "lpt"]
-    turb_full_names = [f'{pt}.{t}' for t in turb_names]
+    ctx = multiprocessing.get_context("spawn")
+    files = {e_name: [] for e_name in elements}
+    with ProcessPoolExecutor(max_workers=num_procs, mp_context=ctx, initializer=_init_render) as pool:
+        for task, result in zip(tasks, pool.map(_render_map_frames, *zip(*tasks))):
+            files[task[0]].extend(result)
 
-    plot_turbine_maps(case, turb_full_names)
+    return files
 
 
 if __name__ == "__main__":
@@ -120,7 +242,8 @@ if __name__ == "__main__":
     # case = cr.get_case(-1)  # Retrieve the last saved iteration
     # post_map_plots(case, "TOC")  # Plot the compressor and turbine maps
 
-    cr = om.CaseReader("optim_hbtf_out/N3_opt.sql")  # Load the saved file
+    # indexed on first use, later opens and map lookups only read the variables they need
+    cr = IndexedCaseReader("optim_hbtf_out/N3_opt.sql")
     case = cr.get_case(-1)  # Retrieve the last saved iteration
     post_map_plots(case, "DESIGN")  # Plot the compressor and turbine maps
     
@@ -0,0 +1,218 @@
+import atexit
+import copy
+import queue
+import sqlite3
+import threading
+
+import openmdao.api as om
+from openmdao.core.driver import Driver
+from openmdao.core.problem import Problem
+from openmdao.core.system import System
+
+
+# what each consumer of the recorder files needs
+PROFILES = {
+    # design variables, objective and constraints of every driver iteration, plus the
+    # performance of every point
+    "optimisation-history": {
+        "target": "driver",
+        "options": {
+            "record_desvars": True,
+            "record_objectives": True,
+            "record_constraints": True,
+            "record_inputs": False,
+            "record_outputs": True,
+            "record_residuals": False,
+            "includes": ["*.perf.*"],
+        },
+        "record_viewer_data": False,
+    },
+    # the map scalars and operating points read by plotting.post_map_plots
+    "map-plotting": {
+        "target": "model",
+        "options": {
+            "record_inputs": True,
+            "record_outputs": True,
+            "record_residuals": False,
+            "includes": [
+                "*.s_Wc", "*.s_Wp", "*.s_PR", "*.s_eff", "*.s_Nc", "*.s_Np",
+                "*.map.scalars.*", "*.Wc", "*.Wp", "*.map.RlineMap", "*.Nmech",
+                "*.map.WcMap", "*.map.WpMap", "*.map.PRmap",
+            ],
+        },
+        "record_viewer_data": False,
+    },
+    # every variable of the model, as recorded before the profiles existed
+    "full-debug": {
+        "target": "model",
+        "options": {
+            "record_inputs": True,
+            "record_outputs": True,
+            "record_residuals": True,
+            "includes": ["*"],
+        },
+        "record_viewer_data": True,
+    },
+}
+
+
+class _BatchConnection:
+    # hands out the real connection but does not commit on exit, so every insert made while
+    # writing a batch ends up in one transaction
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __enter__(self):
+        return self._connection
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class BatchedSqliteRecorder(om.SqliteRecorder):
+    """
+    SqliteRecorder that hands the cases to a background writer thread. The caller only copies
+    the recorded values onto a queue; the thread serialises them and commits up to
+    `batch_size` cases per transaction. At most `max_queued` cases wait in memory, beyond that
+    recording blocks until the writer catches up. Pending cases are written by flush(),
+    shutdown() and at interpreter exit.
+    """
+
+    def __init__(self, filepath, batch_size=50, max_queued=1000, **kwargs):
+        super().__init__(filepath, **kwargs)
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._error = None
+        self._next_counter = 0
+        atexit.register(self.flush)
+
+    def _initialize_database(self, comm):
+        super()._initialize_database(comm)
+        # reopen the file so the writer thread may use the connection
+        if self.connection is not None:
+            path = self.connection.execute("PRAGMA database_list").fetchone()[2]
+            shared = self.metadata_connection is self.connection
+            self.connection.close()
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            if shared:
+                self.metadata_connection = self.connection
+
+    def startup(self, recording_requester, comm=None):
+        with self._lock:
+            super().startup(recording_requester, comm)
+        self._next_counter = self._counter
+
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._write, daemon=True)
+            self._thread.start()
+
+    def record_iteration(self, recording_requester, data, metadata, **kwargs):
+        if self._error is not None:
+            raise self._error
+        if self._parallel and not self._record_on_proc:
+            return
+
+        self._next_counter += 1
+        coord = recording_requester._recording_iter.get_formatted_iteration_coordinate()
+        self._queue.put(("iteration", recording_requester, copy.deepcopy(data), dict(metadata),
+                         self._next_counter, coord))
+
+    def record_derivatives_driver(self, recording_requester, data, metadata):
+        self._queue.put(("derivatives", recording_requester, copy.deepcopy(data), dict(metadata),
+                         self._next_counter,
+                         recording_requester._recording_iter.get_formatted_iteration_coordinate()))
+
+    def record_metadata_system(self, system, run_number=None):
+        with self._lock:
+            super().record_metadata_system(system, run_number)
+
+    def record_metadata_solver(self, solver, run_number=None):
+        with self._lock:
+            super().record_metadata_solver(solver, run_number)
+
+    def record_viewer_data(self, model_viewer_data, key="Driver"):
+        with self._lock:
+            super().record_viewer_data(model_viewer_data, key)
+
+    def _write_case(self, kind, requester, data, metadata, counter, coord):
+        self._counter = counter
+        self._iteration_coordinate = coord
+
+        if kind == "derivatives":
+            super().record_derivatives_driver(requester, data, metadata)
+        elif isinstance(requester, Driver):
+            self.record_iteration_driver(requester, data, metadata)
+        elif isinstance(requester, System):
+            self.record_iteration_system(requester, data, metadata)
+        elif isinstance(requester, Problem):
+            self.record_iteration_problem(requester, data, metadata)
+        else:
+            self.record_iteration_solver(requester, data, metadata)
+
+    def _write(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            cases = [case for case in batch if case is not None]
+            if cases and self._error is None:
+                with self._lock:
+                    connection = self.connection
+                    self.connection = _BatchConnection(connection)
+                    try:
+                        for case in cases:
+                            self._write_case(*case)
+                        connection.commit()
+                    except Exception as err:
+                        connection.rollback()
+                        self._error = err
+                    finally:
+                        self.connection = connection
+
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self):
+        """
+        Block until every queued case is in the database
+        """
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._queue.join()
+        if self._error is not None:
+            raise self._error
+
+    def shutdown(self):
+        self.flush()
+        with self._lock:
+            super().shutdown()
+
+
+def add_recording_profile(prob, profile, filepath, batch_size=50):
+    """
+    Attach a BatchedSqliteRecorder writing `filepath` to the driver or model of `prob`, with the
+    recording options of the named profile: 'optimisation-history', 'map-plotting' or
+    'full-debug'. Call before prob.setup(). Returns the recorder.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown recording profile '{profile}', must be one of {list(PROFILES)}")
+
+    settings = PROFILES[profile]
+    target = prob.driver if settings["target"] == "driver" else prob.model
+
+    recorder = BatchedSqliteRecorder(filepath, batch_size=batch_size,
+                                     record_viewer_data=settings["record_viewer_data"])
+    target.add_recorder(recorder)
+    for name, val in settings["options"].items():
+        target.recording_options[name] = val
+
+    return recorder
@@ -0,0 +1,325 @@
+import csv
+import io
+import json
+import sys
+import weakref
+
+import numpy as np
+
+
+FS_VARS = ["tot:P", "tot:T", "tot:h", "tot:S", "stat:P", "stat:W", "stat:MN", "stat:V", "stat:area"]
+
+# elements of the HBTF cycles in optim_hbtf*.py, relative to the point
+HBTF_LAYOUT = {
+    "flow_stations": [
+        "fc.Fl_O",
+        "inlet.Fl_O",
+        "fan.Fl_O",
+        "splitter.Fl_O1",
+        "splitter.Fl_O2",
+        "duct4.Fl_O",
+        "lpc.Fl_O",
+        "duct6.Fl_O",
+        "hpc.Fl_O",
+        "bld3.Fl_O",
+        "burner.Fl_O",
+        "hpt.Fl_O",
+        "duct11.Fl_O",
+        "lpt.Fl_O",
+        "duct13.Fl_O",
+        "core_nozz.Fl_O",
+        "byp_bld.Fl_O",
+        "duct15.Fl_O",
+        "byp_nozz.Fl_O",
+    ],
+    "compressors": ["fan", "lpc", "hpc"],
+    "burners": ["burner"],
+    "turbines": ["hpt", "lpt"],
+    "nozzles": ["core_nozz", "byp_nozz"],
+    "shafts": ["hp_shaft", "lp_shaft"],
+    "bleeds": ["hpc", "bld3", "byp_bld"],
+}
+
+SUMMARY = [
+    ("Mach", "fc.Fl_O:stat:MN"),
+    ("Alt", "fc.alt"),
+    ("W", "inlet.Fl_O:stat:W"),
+    ("Fn", "perf.Fn"),
+    ("Fg", "perf.Fg"),
+    ("Fram", "inlet.F_ram"),
+    ("OPR", "perf.OPR"),
+    ("TSFC", "perf.TSFC"),
+    ("BPR", "splitter.BPR"),
+]
+
+# section -> layout of its pyc.print_* table: title line, row label, label width (None: fitted to the
+# row names, as print_bleed does), column width, precision of each column or one for all, length of
+# the rules when it is not label width + 3 + column width * columns, and whether the table repeats
+# the rule before its header, rules off the header and the rows, and truncates long row names
+TEXT_FORMATS = {
+    "flow_stations": ("                            FLOW STATIONS", "Flow Station", 23, 13, 3, 27 + 13 * 9,
+                      True, True, True),
+    "compressors": ("                          COMPRESSOR PROPERTIES", "Compressor", 14, 11, 3, 17 + 14 * 13,
+                    False, True, False),
+    "burners": ("                            BURNER PROPERTIES", "Burner", 20, 13, [4, 2, 4, 5], None,
+                False, False, False),
+    "turbines": ("                            TURBINE PROPERTIES", "Turbine", 14, 13, 3, None, False, False, False),
+    "nozzles": ("                            NOZZLE PROPERTIES", "Nozzle", 14, 13, 3, None, False, False, False),
+    "shafts": ("                            SHAFT PROPERTIES", "Shaft", 20, 20, 3, None, False, False, False),
+    "bleeds": ("                            BLEED PROPERTIES", "Bleed", None, 13, 3, None, False, False, False),
+}
+
+# print_nozzle fills the loss coefficient the nozzle does not use with this
+NOT_APPLICABLE = "        N/A  "
+
+
+def _element_columns(prob, pt, section, element):
+    """
+    (row name, [(column, variable or constant)]) rows of one element, the same values
+    the pyc.print_* helpers report
+    """
+    path = f"{pt}.{element}"
+
+    if section == "compressors":
+        design = prob.model._get_subsystem(path).options["design"]
+        return [(path, [
+            ("Wc", "Wc"),
+            ("Pr", "map.scalars.PR" if design else "PR"),
+            ("eta_a", "map.scalars.eff" if design else "eff"),
+            ("eta_p", "eff_poly"),
+            ("Nc", "Nc"),
+            ("pwr", "power"),
+            ("RlineMap", "map.RlineMap"),
+            ("NcMap", "map.NcMap"),
+            ("PRmap", "map.PRmap"),
+            ("WcMap", "map.WcMap"),
+            ("alphaMap", "map.map.alphaMap"),
+            ("SMN", "SMN"),
+            ("SMW", "SMW"),
+            ("effMap", "map.effMap"),
+        ])]
+
+    if section == "burners":
+        # FAR is derived from these two once the values are read
+        return [(path, [("dPqP", "dPqP"), ("TtOut", "Fl_O:tot:T"), ("Wfuel", "Wfuel"),
+                        ("FAR", "Fl_O:stat:W")])]
+
+    if section == "turbines":
+        design = prob.model._get_subsystem(path).options["design"]
+        return [(path, [
+            ("Wp", "Wp"),
+            ("PR", "map.scalars.PR" if design else "PR"),
+            ("eff_a", "map.scalars.eff" if design else "eff"),
+            ("eff_p", "eff_poly"),
+            ("Np", "Np"),
+            ("pwr", "power"),
+            ("NpMap", "map.NpMap"),
+            ("PRmap", "map.PRmap"),
+            ("alphaMap", "map.alphaMap"),
+        ])]
+
+    if section == "nozzles":
+        cv = prob.model._get_subsystem(path).options["lossCoef"] == "Cv"
+        return [(path, [
+            ("PR", "PR"),
+            ("Cv", "Cv" if cv else None),
+            ("Cfg", None if cv else "Cfg"),
+            ("Ath", "Throat:stat:area"),
+            ("MNth", "Throat:stat:MN"),
+            ("MNout", "Fl_O:stat:MN"),
+            ("V", "Fl_O:stat:V"),
+            ("Fg", "Fg"),
+        ])]
+
+    if section == "shafts":
+        return [(path, [("Nmech", "Nmech"), ("trqin", "trq_in"), ("trqout", "trq_out"),
+                        ("pwrin", "pwr_in"), ("pwrout", "pwr_out")])]
+
+    if section == "bleeds":
+        rows = []
+        for bn in prob.model._get_subsystem(path).options["bleed_names"]:
+            # interstage compressor bleeds carry their pressure and work fractions,
+            # stand alone bleeds only the flow fraction
+            if _has_var(prob, f"{path}.blds_pwr.{bn}:frac_W"):
+                fracs = [(f"blds_pwr.{bn}:frac_{f}") for f in ("W", "P", "work")]
+            else:
+                fracs = [f"bld_calcs.{bn}:frac_W", 1.0, 1.0]
+            rows.append((f"{path}.{bn}", [
+                ("Wb/Win", fracs[0]),
+                ("Pfrac", fracs[1]),
+                ("Workfrac", fracs[2]),
+                ("W", f"{bn}:stat:W"),
+                ("Tt", f"{bn}:tot:T"),
+                ("ht", f"{bn}:tot:h"),
+                ("Pt", f"{bn}:tot:P"),
+            ]))
+        return rows
+
+    raise ValueError(f"Unknown report section '{section}'")
+
+
+def _has_var(prob, name):
+    return name in _var_units(prob)
+
+
+_units_cache = weakref.WeakKeyDictionary()
+
+
+def _var_units(prob):
+    # promoted and absolute name -> units of every variable in the model, read once per Problem
+    if prob not in _units_cache:
+        meta = prob.model.get_io_metadata(metadata_keys=["units"])
+        units = {m["prom_name"]: m["units"] for m in meta.values()}
+        units.update((name, m["units"]) for name, m in meta.items())
+        _units_cache[prob] = units
+    return _units_cache[prob]
+
+
+class PointReport:
+    """
+    Report of one point of a cycle. The variable of every value (promoted name, or the cycle
+    parameter it falls back to) is resolved once on creation, so snapshot() only reads values.
+    """
+
+    def __init__(self, prob, pt, layout=HBTF_LAYOUT):
+        self.prob = prob
+        self.pt = pt
+        self.layout = layout
+
+        units = _var_units(prob)
+
+        self.sections = {"summary": [(pt, list(SUMMARY))]}
+        self.sections["flow_stations"] = [(f"{pt}.{fs}", [(var, f"{fs}:{var}") for var in FS_VARS])
+                                          for fs in layout["flow_stations"]]
+        for section in ("compressors", "burners", "turbines", "nozzles", "shafts", "bleeds"):
+            self.sections[section] = []
+            for element in layout.get(section, []):
+                for row, cols in _element_columns(prob, pt, section, element):
+                    # element variables are relative to the element
+                    cols = [(col, f"{element}.{var}" if isinstance(var, str) else var) for col, var in cols]
+                    self.sections[section].append((row, cols))
+
+        self._names = {}
+        for section, rows in self.sections.items():
+            for row, cols in rows:
+                for col, var in cols:
+                    if isinstance(var, str):
+                        # cycle parameters are promoted to the top of the MPCycle
+                        self._names[section, row, col] = f"{pt}.{var}" if f"{pt}.{var}" in units else var
+
+    def snapshot(self):
+        """
+        Current values of the report as a nested dict: section -> row -> column -> value
+        """
+        snap = {"point": self.pt}
+        for section, rows in self.sections.items():
+            snap[section] = {}
+            for row, cols in rows:
+                snap[section][row] = {
+                    col: float(self.prob.get_val(self._names[section, row, col])[0]) if isinstance(var, str) else var
+                    for col, var in cols
+                }
+
+        for burner in snap["burners"].values():
+            Wfuel, W = np.float64(burner["Wfuel"]), burner["FAR"]
+            burner["FAR"] = float(Wfuel / (W - Wfuel))
+
+        return snap
+
+
+def _render_text(snap, out):
+    dashes = "-" * 76
+    summary = snap["summary"][snap["point"]]
+    out.write("\n\n\n")
+    out.write(f"{dashes}\n                              POINT: {snap['point']}\n{dashes}\n")
+    out.write("                       PERFORMANCE CHARACTERISTICS\n")
+    out.write("    Mach      Alt       W      Fn      Fg    Fram     OPR     TSFC      BPR \n")
+    out.write(" %7.5f  %7.1f %7.3f %7.1f %7.1f %7.1f %7.3f  %7.5f  %7.3f\n"
+              % tuple(summary[col] for col, _ in SUMMARY))
+
+    for section, fmt in TEXT_FORMATS.items():
+        title, label, width, col_width, precision, rule, repeat_rule, rules, truncate = fmt
+        rows = snap.get(section)
+        if not rows:
+            continue
+        columns = list(next(iter(rows.values())))
+        if not isinstance(precision, list):
+            precision = [precision] * len(columns)
+        if width is None:
+            # print_bleed measures the element and bleed names without the '.' between them
+            width = max(len(row) - 1 for row in rows) + 2
+        row_tmpl = f"{{:<{width}.{width}}}|  " if truncate else f"{{:<{width}}}|  "
+
+        line = "-" * (rule or width + 3 + col_width * len(columns))
+        out.write(f"{line}\n{title}\n{line}\n")
+        if repeat_rule:
+            out.write(f"{line}\n")
+        out.write(f"{label:<{width}}|  " + "".join(f"{col:>{col_width}}" for col in columns) + "\n")
+        if rules:
+            out.write(f"{line}\n")
+        for row, vals in rows.items():
+            out.write(row_tmpl.format(row))
+            for col, prec in zip(columns, precision):
+                val = vals[col]
+                out.write(NOT_APPLICABLE if val is None else f"{val:{col_width}.{prec}f}")
+            out.write("\n")
+        if rules:
+            out.write(f"{line}\n")
+
+
+def render(snapshots, fmt="text"):
+    """
+    Render point snapshots as one string, fmt is 'text' (the tables of the pyc.print_* helpers),
+    'csv' (one row per value) or 'json'
+    """
+    out = io.StringIO()
+
+    if fmt == "text":
+        for snap in snapshots:
+            _render_text(snap, out)
+    elif fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(["point", "section", "element", "variable", "value"])
+        for snap in snapshots:
+            for section, rows in snap.items():
+                if section == "point":
+                    continue
+                for row, vals in rows.items():
+                    for col, val in vals.items():
+                        writer.writerow([snap["point"], section, row, col, "" if val is None else repr(val)])
+    elif fmt == "json":
+        json.dump(snapshots, out, indent=1)
+    else:
+        raise ValueError(f"Unknown report format '{fmt}', must be 'text', 'csv' or 'json'")
+
+    return out.getvalue()
+
+
+_reports = weakref.WeakKeyDictionary()
+
+
+def point_report(prob, pt, layout=HBTF_LAYOUT):
+    """
+    The PointReport of `pt` in `prob`, built on the first call and reused afterwards
+    """
+    reports = _reports.setdefault(prob, {})
+    key = (pt, id(layout))
+    if key not in reports:
+        reports[key] = PointReport(prob, pt, layout)
+    return reports[key]
+
+
+def write_report(prob, pts, file=sys.stdout, fmt="text", layout=HBTF_LAYOUT):
+    """
+    Report the points `pts` of `prob` to `file` (an open file or a path) with a single write.
+    The lookups of each point are built on the first call and reused afterwards.
+    """
+    snapshots = [point_report(prob, pt, layout).snapshot() for pt in pts]
+
+    text = render(snapshots, fmt)
+    if isinstance(file, str):
+        with open(file, "w") as f:
+            f.write(text)
+    else:
+        file.write(text)
+        file.flush()
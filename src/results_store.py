@@ -0,0 +1,221 @@
+import glob
+import operator
+import os
+import time
+import uuid
+
+import numpy as np
+
+from guess_db import is_converged
+from report import HBTF_LAYOUT, point_report
+
+
+MAP_SCALARS = {
+    "compressors": ["s_Wc", "s_PR", "s_eff", "s_Nc"],
+    "turbines": ["s_Wp", "s_PR", "s_eff", "s_Np"],
+}
+
+OPS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+def run_record(prob, points, layout=HBTF_LAYOUT):
+    """
+    Flat dict of the current state of a run, keyed by variable name: the design variables,
+    objective and constraints, every station and element value of the report of each point
+    and the map scalars. Points that are not converged are NaN with '<pt>.converged' False.
+    """
+    record = {}
+    for name in list(prob.model.get_design_vars(use_prom_ivc=True)) + \
+            list(prob.model.get_responses(use_prom_ivc=True)):
+        record[name] = float(prob.get_val(name)[0])
+
+    for pt in points:
+        converged = is_converged(prob, pt)
+        record[f"{pt}.converged"] = converged
+
+        names = []
+        for section, rows in point_report(prob, pt, layout).sections.items():
+            for row, cols in rows:
+                names.extend(f"{pt}.{var}" for col, var in cols if isinstance(var, str))
+        for section, scalars in MAP_SCALARS.items():
+            names.extend(f"{pt}.{element}.{s}" for element in layout.get(section, []) for s in scalars)
+
+        for name in dict.fromkeys(names):
+            record[name] = float(prob.get_val(name)[0]) if converged else np.nan
+
+    return record
+
+
+def _fill(dtype, n):
+    if dtype.kind == "f":
+        return np.full(n, np.nan)
+    if dtype.kind == "b":
+        return np.zeros(n, dtype=bool)
+    if dtype.kind in "iu":
+        return np.full(n, -1, dtype=dtype)
+    return np.full(n, "", dtype=dtype)
+
+
+class ResultsStore:
+    """
+    Append-only columnar store of run results. Rows are buffered in memory and written in
+    chunks, each chunk an .npz file with one array per column, so a query only loads the
+    columns it filters on or returns. Columns missing from a chunk (e.g. rows of a cycle with
+    other elements) read as NaN.
+    """
+
+    def __init__(self, path="results_store", chunk_size=100):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._pending = []
+        self._columns = {}
+        os.makedirs(path, exist_ok=True)
+
+    def _chunks(self):
+        # an empty chunk is a number reserved by a writer that has not finished writing it
+        return sorted(chunk for chunk in glob.glob(os.path.join(self.path, "chunk_*.npz"))
+                      if os.path.getsize(chunk) > 0)
+
+    def _tmp_file(self):
+        # unique, so writers sharing the store never write to the same file
+        return os.path.join(self.path, f"tmp_{os.getpid()}_{uuid.uuid4().hex}.npz")
+
+    def _reserve_chunk(self):
+        # the first free chunk number, created exclusively so no other writer can take it
+        names = glob.glob(os.path.join(self.path, "chunk_*.npz"))
+        number = max(int(os.path.basename(name)[6:12]) for name in names) + 1 if names else 0
+        while True:
+            chunk = os.path.join(self.path, "chunk_%06d.npz" % number)
+            try:
+                os.close(os.open(chunk, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return chunk
+            except FileExistsError:
+                number += 1
+
+    def _chunk_columns(self, chunk):
+        # keyed on the file as well as its name, as a compaction by another writer replaces the first chunk
+        stat = os.stat(chunk)
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if chunk not in self._columns or self._columns[chunk][0] != stamp:
+            with np.load(chunk) as data:
+                self._columns[chunk] = (stamp, len(data[data.files[0]]), set(data.files))
+        return self._columns[chunk][1:]
+
+    def append(self, prob, points, run_id=None, layout=HBTF_LAYOUT, **fields):
+        """
+        Add the current state of `prob` as one row; extra keyword fields are stored as columns
+        """
+        record = {"run_id": run_id or time.strftime("%Y-%m-%d_%H-%M-%S"), "timestamp": time.time()}
+        record.update(fields)
+        record.update(run_record(prob, points, layout))
+        self.append_record(record)
+
+    def append_record(self, record):
+        self._pending.append(record)
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered rows as a new chunk
+        """
+        if not self._pending:
+            return
+
+        names = list(dict.fromkeys(name for record in self._pending for name in record))
+        data = {}
+        for name in names:
+            vals = [record.get(name) for record in self._pending]
+            # the dtype of all the values, so no string is truncated to the width of the first
+            dtype = np.asarray([val for val in vals if val is not None]).dtype
+            col = _fill(dtype, len(vals))
+            for i, val in enumerate(vals):
+                if val is not None:
+                    col[i] = val
+            data[name] = col
+
+        tmp = self._tmp_file()
+        np.savez(tmp, **data)
+        os.replace(tmp, self._reserve_chunk())
+
+        self._pending = []
+
+    def columns(self):
+        names = set()
+        for chunk in self._chunks():
+            names |= self._chunk_columns(chunk)[1]
+        return sorted(names)
+
+    def __len__(self):
+        return sum(self._chunk_columns(chunk)[0] for chunk in self._chunks())
+
+    def _load(self, names):
+        # one listing, as other writers may add chunks meanwhile; returns the columns and their length
+        chunks = self._chunks()
+        parts = {name: [] for name in names}
+        for chunk in chunks:
+            files = self._chunk_columns(chunk)[1]
+            with np.load(chunk) as data:
+                for name in names:
+                    parts[name].append(data[name] if name in files else None)
+
+        sizes = [self._chunk_columns(chunk)[0] for chunk in chunks]
+        columns = {}
+        for name, chunk_parts in parts.items():
+            present = [part for part in chunk_parts if part is not None]
+            if not present:
+                raise KeyError(f"No column '{name}' in results store {self.path}")
+            dtype = np.result_type(*present)
+            columns[name] = np.concatenate([
+                part if part is not None else _fill(dtype, size)
+                for part, size in zip(chunk_parts, sizes)
+            ])
+        return columns, sum(sizes)
+
+    def query(self, where=(), columns=None):
+        """
+        Rows matching every (column, op, value) condition of `where`, e.g.
+        store.query([("OD_TOfail.perf.Fn", ">", 40000.0)], ["run_id", "DESIGN.perf.TSFC"]).
+        Returns the requested columns (all columns if None) of the matching rows.
+        """
+        if columns is None:
+            columns = self.columns()
+        where = list(where)
+
+        data, num_rows = self._load(list(dict.fromkeys([cond[0] for cond in where] + list(columns))))
+
+        mask = np.ones(num_rows, dtype=bool)
+        for name, op, value in where:
+            mask &= OPS[op](data[name], value)
+
+        return {name: data[name][mask] for name in columns}
+
+    def compact(self):
+        """
+        Merge all chunks into one
+        """
+        self.flush()
+        chunks = self._chunks()
+        if len(chunks) < 2:
+            return
+
+        data, _ = self._load(self.columns())
+        tmp = self._tmp_file()
+        np.savez(tmp, **data)
+        os.replace(tmp, chunks[0])
+        for chunk in chunks[1:]:
+            os.remove(chunk)
+        self._columns = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
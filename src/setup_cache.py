@@ -0,0 +1,253 @@
+import copyreg
+import gc
+import hashlib
+import importlib
+import os
+import pathlib
+import pickle
+import sys
+import sysconfig
+import types
+import warnings
+import weakref
+
+import numpy as np
+import openmdao
+import pycycle
+from openmdao.recorders.recording_manager import RecordingManager, _get_all_requesters
+from openmdao.utils.options_dictionary import OptionsDictionary
+
+
+# bump when the snapshot format changes
+SETUP_CACHE_VERSION = 1
+
+# installed packages are identified by their version, not by their source
+_LIBRARY_PATHS = tuple({sysconfig.get_paths()[key] for key in ("stdlib", "platstdlib", "purelib", "platlib")})
+
+# packages whose module level objects (sentinels such as _UNDEFINED, shared tables) are pickled
+# by reference, so code comparing against them with `is` still works after a restore
+_SHARED_PACKAGES = ("openmdao", "pycycle", "numpy")
+
+_IMMUTABLE = (type, types.ModuleType, types.FunctionType, int, float, complex, str, bytes, bool, type(None))
+
+# builtin types that have no name in builtins (function, method, ...) -> their name in types
+_BUILTIN_TYPES = {val: name for name, val in vars(types).items()
+                  if isinstance(val, type) and val.__module__ == "builtins"}
+
+
+def _view(root, dtype, shape, offset, strides, writeable):
+    view = np.ndarray(shape, dtype, buffer=root, offset=offset, strides=strides)
+    view.flags.writeable = writeable
+    return view
+
+
+def _ref(obj):
+    return weakref.ref(obj)
+
+
+def _dead_ref():
+    return weakref.ref(set())
+
+
+def _set_state(obj, state):
+    slots = None
+    if isinstance(state, tuple):
+        state, slots = state
+    if state:
+        obj.__dict__.update(state)
+    for name, val in (slots or {}).items():
+        setattr(obj, name, val)
+
+
+def _shared_globals():
+    shared = {}
+    for name, module in list(sys.modules.items()):
+        if module is None or name.split(".")[0] not in _SHARED_PACKAGES:
+            continue
+        for attr, val in list(vars(module).items()):
+            if not isinstance(val, _IMMUTABLE):
+                shared.setdefault(id(val), (name, attr, val))
+    return shared
+
+
+class _SetupPickler(pickle.Pickler):
+    """
+    Pickler for a set up Problem. Plain pickling loses what the model relies on: the vectors
+    and pyCycle's thermo tables are numpy views of one array (pickled as views of their base
+    here), solvers hold weak references to their systems, and OpenMDAO compares options and
+    metadata against module level sentinels.
+    """
+
+    def __init__(self, file):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._shared = _shared_globals()
+        self._by_state = {}
+
+    def reducer_override(self, obj):
+        cls = type(obj)
+        if cls is np.ndarray:
+            root = obj.base
+            if not isinstance(root, np.ndarray) or obj.dtype.hasobject:
+                return NotImplemented
+            while isinstance(root.base, np.ndarray):
+                root = root.base
+            if not root.flags.c_contiguous:
+                return NotImplemented
+            offset = obj.__array_interface__["data"][0] - root.__array_interface__["data"][0]
+            return _view, (root, obj.dtype, obj.shape, offset, obj.strides, obj.flags.writeable)
+
+        shared = self._shared.get(id(obj))
+        if shared is not None and shared[2] is obj:
+            return getattr, (importlib.import_module(shared[0]), shared[1])
+
+        if cls is weakref.ReferenceType:
+            target = obj()
+            return (_ref, (target,)) if target is not None else (_dead_ref, ())
+        if cls is types.ModuleType:
+            return importlib.import_module, (obj.__name__,)
+        if isinstance(obj, type):
+            return (getattr, (types, _BUILTIN_TYPES[obj])) if obj in _BUILTIN_TYPES else NotImplemented
+        if cls is OptionsDictionary:
+            # its __getstate__ drops the options declared recordable=False, such as 'thermo'
+            return copyreg.__newobj__, (cls,), dict(obj.__dict__), None, None, _set_state
+
+        # a class with __getattr__ but no __setstate__ answers None when the unpickler asks for
+        # __setstate__, so its state is set explicitly
+        if cls not in self._by_state:
+            self._by_state[cls] = (any("__getattr__" in vars(c) for c in cls.__mro__)
+                                   and not any("__setstate__" in vars(c) for c in cls.__mro__))
+        if self._by_state[cls] and hasattr(obj, "__dict__"):
+            rv = obj.__reduce_ex__(pickle.HIGHEST_PROTOCOL)
+            if isinstance(rv, tuple) and len(rv) > 2 and rv[2] is not None:
+                return rv[:5] + (None,) * (5 - len(rv)) + (_set_state,)
+
+        return NotImplemented
+
+
+def _source_modules(roots):
+    # the project modules the roots are built from: those not installed as packages, followed
+    # through the modules, classes and functions they import
+    found = {}
+    todo = list(roots)
+    while todo:
+        name = todo.pop()
+        module = sys.modules.get(name)
+        path = getattr(module, "__file__", None)
+        if name in found or path is None or os.path.abspath(path).startswith(_LIBRARY_PATHS):
+            continue
+        found[name] = path
+        for val in list(vars(module).values()):
+            if isinstance(val, types.ModuleType):
+                todo.append(val.__name__)
+            elif isinstance(val, (type, types.FunctionType)) and isinstance(val.__module__, str):
+                todo.append(val.__module__)
+    return found
+
+
+def cycle_hash(prob, build_fn, args=(), kwargs=None):
+    """
+    Hash of everything that defines the set up Problem built by `build_fn(*args, **kwargs)`:
+    the source of the project modules the model and build_fn come from (and the project
+    modules they import), the arguments and the Python, numpy, OpenMDAO and pyCycle versions
+    """
+    roots = [build_fn.__module__] + [cls.__module__ for cls in type(prob.model).__mro__]
+    h = hashlib.sha256()
+    h.update(repr((SETUP_CACHE_VERSION, sys.version, np.__version__, openmdao.__version__,
+                   pycycle.__version__)).encode())
+    h.update(repr((build_fn.__module__, build_fn.__qualname__, args, sorted((kwargs or {}).items()))).encode())
+    for name, path in sorted(_source_modules(roots).items()):
+        h.update(name.encode())
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def save_setup(prob, path):
+    """
+    Snapshot a set up Problem to `path`, without its recorders. Returns False, leaving no
+    file, if something in it cannot be pickled (e.g. solvers wrapped by telemetry).
+    """
+    # recorders hold open database connections, and a restored problem writes its own files
+    requesters = list(_get_all_requesters(prob))
+    rec_mgrs = [requester._rec_mgr for requester in requesters]
+    for requester in requesters:
+        requester._rec_mgr = RecordingManager()
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            _SetupPickler(f).dump(prob)
+    except Exception as err:
+        os.remove(tmp)
+        warnings.warn(f"Could not snapshot the set up problem to {path}: {err}")
+        return False
+    finally:
+        for requester, rec_mgr in zip(requesters, rec_mgrs):
+            requester._rec_mgr = rec_mgr
+    os.replace(tmp, path)
+    return True
+
+
+def load_setup(path):
+    """
+    Restore a Problem saved by save_setup. The file is unpickled, which can run arbitrary
+    code, so it must come from a trusted source.
+    """
+    # the collector would otherwise walk the half built object graph over and over
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _move_work_dir(source, target):
+    # recorders and reports write under the work directory, which is the one the problem was
+    # first set up in, not the current one, unless it is replaced
+    for name in ("work_dir", "coloring_dir"):
+        target.options[name] = source.options[name]
+    target._metadata["work_dir"] = pathlib.Path(source.options["work_dir"])
+
+
+def _move_recorders(source, target):
+    # the recorders added by build_fn, which can only be on the problem, driver and model
+    for src, tgt in ((source, target), (source.driver, target.driver), (source.model, target.model)):
+        for recorder in src._rec_mgr:
+            tgt.add_recorder(recorder)
+    # problem and driver recording starts in every final_setup, the model's only in the first
+    target.model._setup_recording()
+
+
+def cached_setup(build_fn, *args, cache_dir="setup_cache", **kwargs):
+    """
+    Return the Problem built by `build_fn(*args, **kwargs)` (model, driver, responses and
+    recorders, not set up) after setup() and final_setup(). The set up Problem is saved in
+    `cache_dir` under its cycle_hash and restored from there, skipping the setup, while the
+    hash is unchanged. Solver telemetry and caches that wrap the model are added after this
+    call, as they would be after setup().
+
+    The snapshots are pickles, and loading one can run arbitrary code: `cache_dir` must only
+    be writable by users trusted to run code in this process, never a shared or downloaded
+    directory.
+    """
+    prob = build_fn(*args, **kwargs)
+    path = os.path.join(cache_dir, f"{type(prob.model).__name__}_{cycle_hash(prob, build_fn, args, kwargs)[:16]}.pkl")
+
+    if os.path.exists(path):
+        try:
+            restored = load_setup(path)
+        except Exception as err:
+            warnings.warn(f"Could not restore the set up problem from {path}, setting it up again: {err}")
+        else:
+            _move_work_dir(prob, restored)
+            _move_recorders(prob, restored)
+            return restored
+
+    prob.setup()
+    prob.final_setup()
+    os.makedirs(cache_dir, exist_ok=True)
+    save_setup(prob, path)
+    return prob
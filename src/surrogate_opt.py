@@ -0,0 +1,256 @@
+import os
+
+import numpy as np
+import openmdao.api as om
+
+from scipy.stats import qmc
+
+from cycle_spec import apply_spec, load_spec, merge_spec, setup_problem
+from guess_db import is_converged
+from sweep import restore_point, snapshot_point
+
+
+# the optimisation of optim_hbtf.py, whose design variables, objective and constraints are used
+DEFAULT_SPEC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "specs", "optim_hbtf.json")
+
+
+def _mm_name(name):
+    # metamodel variable names cannot hold the '.' and ':' of the cycle paths
+    return name.replace(".", "__").replace(":", "_")
+
+
+def _bounds(design_vars):
+    lower = np.array([meta["lower"] for meta in design_vars.values()])
+    upper = np.array([meta["upper"] for meta in design_vars.values()])
+    return lower, upper
+
+
+def _scale(meta):
+    ref0 = meta.get("ref0", 0.0)
+    return max(abs(meta.get("ref", 1.0) - ref0), 1e-12)
+
+
+def _mm_meta(meta):
+    # the samples are taken in the response units, the metamodel outputs have none
+    return {key: val for key, val in meta.items() if key != "units"}
+
+
+def spec_optimisation(spec):
+    """
+    Design variables, objective (name, options) and constraints of a cycle spec (see cycle_spec)
+    """
+    objective = next(iter(spec["objective"].items()))
+    return spec["design_vars"], objective, spec["constraints"]
+
+
+def build_hbtf_problem(spec, setup_cache=None):
+    """
+    Set up the model of a cycle spec (e.g. specs/optim_hbtf.json) for full cycle solves: the
+    cycle and its balances without the spec's driver and recorders, with its inputs and guesses
+    """
+    spec = merge_spec(spec, {"driver": None, "recording": None})
+    prob = setup_problem(spec, setup_cache)
+
+    apply_spec(prob, spec)
+    prob.final_setup()
+
+    for pt in ["DESIGN"] + prob.model.od_pts:
+        prob.model._get_subsystem(pt).nonlinear_solver.options["err_on_non_converge"] = True
+    prob.set_solver_print(level=-1)
+
+    return prob
+
+
+class CycleEvaluator:
+    """
+    Full cycle solves of a set up Problem at given design variable values. Every converged
+    solve is kept as a training sample; a failed solve restores the last converged state so
+    the next one does not start from a diverged model.
+    """
+
+    def __init__(self, prob, design_vars, responses):
+        self.prob = prob
+        self.design_vars = list(design_vars)
+        # response -> the units it is sampled in
+        self.responses = dict(responses)
+        self.points = ["DESIGN"] + prob.model.od_pts
+
+        self.X = []
+        self.Y = []
+        self.failed = []
+        self._outputs = list(prob.model.list_outputs(val=False, out_stream=None, return_format="dict"))
+        self._last_good = snapshot_point(prob, self._outputs)
+
+    def __call__(self, x):
+        prob = self.prob
+        for name, val in zip(self.design_vars, x):
+            prob.set_val(name, val)
+
+        try:
+            prob.run_model()
+            converged = all(is_converged(prob, pt) for pt in self.points)
+        except om.AnalysisError:
+            converged = False
+
+        if not converged:
+            restore_point(prob, self._last_good)
+            self.failed.append(np.array(x))
+            return None
+
+        self._last_good = snapshot_point(prob, self._outputs)
+        y = np.array([prob.get_val(name, units=units)[0] for name, units in self.responses.items()])
+        self.X.append(np.array(x))
+        self.Y.append(y)
+        return y
+
+
+def build_surrogate_problem(X, Y, design_vars, objective, constraints, surrogate="kriging"):
+    """
+    Problem that optimises the metamodel of the responses trained on the samples X, Y, with the
+    same design variables, objective and constraints as the full cycle optimisation.
+    surrogate is 'kriging' or 'rbf'.
+    """
+    if surrogate == "kriging":
+        default_surrogate = om.KrigingSurrogate()
+    elif surrogate == "rbf":
+        default_surrogate = om.NearestNeighbor(interpolant_type="rbf")
+    else:
+        raise ValueError(f"Unknown surrogate '{surrogate}', must be 'kriging' or 'rbf'")
+
+    prob = om.Problem(reports=False)
+    mm = prob.model.add_subsystem(
+        "mm", om.MetaModelUnStructuredComp(default_surrogate=default_surrogate), promotes=["*"]
+    )
+
+    for i, name in enumerate(design_vars):
+        mm.add_input(_mm_name(name), val=X[0, i], training_data=X[:, i])
+    responses = [objective[0]] + list(constraints)
+    for j, name in enumerate(responses):
+        mm.add_output(_mm_name(name), val=Y[0, j], training_data=Y[:, j])
+
+    for name, meta in design_vars.items():
+        prob.model.add_design_var(_mm_name(name), **_mm_meta(meta))
+    prob.model.add_objective(_mm_name(objective[0]), **_mm_meta(objective[1]))
+    for name, meta in constraints.items():
+        prob.model.add_constraint(_mm_name(name), **_mm_meta(meta))
+
+    prob.driver = om.ScipyOptimizeDriver(optimizer="SLSQP", maxiter=100, disp=False)
+    prob.setup()
+
+    return prob
+
+
+def _feasible(y, constraints):
+    for val, meta in zip(y[1:], constraints.values()):
+        tol = 1e-6 * _scale(meta)
+        if "lower" in meta and val < meta["lower"] - tol:
+            return False
+        if "upper" in meta and val > meta["upper"] + tol:
+            return False
+    return True
+
+
+def _best_sample(X, Y, constraints):
+    feasible = [i for i in range(len(Y)) if _feasible(Y[i], constraints)]
+    candidates = feasible if feasible else range(len(Y))
+    best = min(candidates, key=lambda i: Y[i][0])
+    return best, bool(feasible)
+
+
+def surrogate_optimize(prob, design_vars, objective, constraints, n_init=None, max_infill=15, rtol=1e-3,
+                       xtol=1e-3, surrogate="kriging", seed=0):
+    """
+    Surrogate assisted optimisation of a set up cycle Problem (e.g. from build_hbtf_problem),
+    with the design variables, objective and constraints of spec_optimisation.
+
+    The responses (objective and constraints) are sampled with full cycle solves on a Latin
+    hypercube of n_init points (default 2 * number of design vars + 2). Each infill iteration
+    then optimises the metamodel with SLSQP and verifies the optimum with one full cycle solve,
+    which is added to the training data. Iteration stops when the metamodel predicts every
+    response at its optimum to within `rtol` (relative to each response's ref - ref0) or when
+    the optimum lands on an already sampled point (normalised distance below `xtol`).
+
+    Returns a dict with the best verified design, its responses, whether it is feasible, the
+    number of full cycle solves and the infill history.
+    """
+    responses = [objective[0]] + list(constraints)
+    scales = np.array([_scale(objective[1])] + [_scale(meta) for meta in constraints.values()])
+    lower, upper = _bounds(design_vars)
+    span = upper - lower
+
+    evaluate = CycleEvaluator(prob, design_vars, {name: meta.get("units") for name, meta in
+                                                  [objective] + list(constraints.items())})
+
+    n_init = n_init or 2 * len(design_vars) + 2
+    sampler = qmc.LatinHypercube(d=len(design_vars), seed=seed)
+    for x in qmc.scale(sampler.random(n_init), lower, upper):
+        evaluate(x)
+
+    if len(evaluate.X) < 2:
+        raise om.AnalysisError(f"Only {len(evaluate.X)} of {n_init} initial cycle solves converged, "
+                               "too few to train a surrogate")
+
+    history = []
+    for it in range(max_infill):
+        X = np.array(evaluate.X)
+        Y = np.array(evaluate.Y)
+
+        sprob = build_surrogate_problem(X, Y, design_vars, objective, constraints, surrogate)
+        best, _ = _best_sample(X, Y, constraints)
+        for i, name in enumerate(design_vars):
+            sprob.set_val(_mm_name(name), X[best, i])
+        sprob.run_driver()
+
+        x = np.array([sprob.get_val(_mm_name(name))[0] for name in design_vars])
+        y_pred = np.array([sprob.get_val(_mm_name(name))[0] for name in responses])
+
+        sampled = np.array(evaluate.X + evaluate.failed)
+        dist = np.min(np.linalg.norm((sampled - x) / span, axis=1))
+        if dist < xtol:
+            history.append({"iteration": it, "x": x, "predicted": y_pred, "verified": None, "error": None})
+            break
+
+        y = evaluate(x)
+        error = None if y is None else np.abs(y - y_pred) / scales
+        history.append({"iteration": it, "x": x, "predicted": y_pred, "verified": y,
+                        "error": None if error is None else float(error.max())})
+
+        if error is not None and error.max() < rtol:
+            break
+
+    X = np.array(evaluate.X)
+    Y = np.array(evaluate.Y)
+    best, feasible = _best_sample(X, Y, constraints)
+
+    return {
+        "x": dict(zip(design_vars, X[best])),
+        "responses": dict(zip(responses, Y[best])),
+        "feasible": feasible,
+        "num_cycle_solves": len(evaluate.X) + len(evaluate.failed),
+        "history": history,
+    }
+
+
+if __name__ == "__main__":
+
+    import sys
+    import time
+
+    st = time.time()
+
+    # python surrogate_opt.py [spec], the optimisation of optim_hbtf.py by default
+    spec = load_spec(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SPEC)
+    prob = build_hbtf_problem(spec)
+    result = surrogate_optimize(prob, *spec_optimisation(spec))
+
+    for it in result["history"]:
+        print("infill %d: predicted TSFC %.5f, max relative error %s"
+              % (it["iteration"], it["predicted"][0], it["error"]))
+    print()
+    print("%d full cycle solves, feasible: %s" % (result["num_cycle_solves"], result["feasible"]))
+    for name, val in result["x"].items():
+        print("%30s %10.4f" % (name, val))
+    for name, val in result["responses"].items():
+        print("%30s %10.4f" % (name, val))
+    print()
+    print("Run time", time.time() - st)
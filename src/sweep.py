@@ -0,0 +1,431 @@
+import contextlib
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import openmdao.api as om
+
+from setup_cache import cached_setup
+
+
+# grid column -> (variable relative to the swept point, units used to set it)
+SWEEP_INPUTS = {
+    "MN": ("fc.MN", None),
+    "alt": ("fc.alt", "ft"),
+    "dTs": ("fc.dTs", "degR"),
+    "PC": ("PC", None),
+    "T4_MAX": ("T4_MAX", "degK"),
+}
+
+DEFAULT_OUTPUTS = [
+    "perf.Fn",
+    "perf.Fg",
+    "perf.TSFC",
+    "perf.OPR",
+    "burner.Wfuel",
+    "inlet.Fl_O:stat:W",
+    "splitter.BPR",
+    "burner.Fl_O:tot:T",
+    "LP_Nmech",
+    "HP_Nmech",
+]
+
+# off-design solver states seeded from a neighbouring converged point
+OD_STATES = [
+    "balance.FAR",
+    "balance.W",
+    "balance.BPR",
+    "balance.lp_Nmech",
+    "balance.hp_Nmech",
+    "hpt.PR",
+    "lpt.PR",
+    "fan.map.RlineMap",
+    "lpc.map.RlineMap",
+    "hpc.map.RlineMap",
+]
+
+# per-process state, filled once by _init_worker
+_worker = {}
+
+# one BLAS thread per worker, otherwise the DirectSolvers fight over the cores
+WORKER_ENV = {"OMP_NUM_THREADS": "1", "OPENBLAS_NUM_THREADS": "1", "MKL_NUM_THREADS": "1"}
+
+
+def make_grid(MNs, alts, dTs=(0.0,), throttles=(1.0,), throttle_name="PC"):
+    """
+    Build a list of sweep points from the product of MN, alt, dTs and throttle values.
+    The throttle is either the part power fraction 'PC' or the 'T4_MAX' target.
+    """
+    return [
+        {"MN": MN, "alt": alt, "dTs": dT, throttle_name: thr}
+        for MN, alt, dT, thr in itertools.product(MNs, alts, dTs, throttles)
+    ]
+
+
+def set_point(prob, pt, point):
+    """
+    Set the flight condition and throttle of a single sweep point on point `pt`
+    """
+    for key, val in point.items():
+        name, units = SWEEP_INPUTS[key]
+        prob.set_val(f"{pt}.{name}", val, units=units)
+
+
+def _new_problem(cycle_class, cycle_kwargs):
+    prob = om.Problem(reports=False)
+    prob.model = cycle_class(**(cycle_kwargs or {}))
+    return prob
+
+
+def build_problem(cycle_class, pt, setup_fn=None, cycle_kwargs=None, setup_cache=None):
+    """
+    Create and set up a Problem for `cycle_class` (an MPCycle subclass). `setup_fn(prob)` is
+    called after setup to fix the design inputs and the initial balance guesses. With a
+    `setup_cache` directory the set up Problem is restored from there, see cached_setup.
+    """
+    if setup_cache is not None:
+        prob = cached_setup(_new_problem, cycle_class, cycle_kwargs, cache_dir=setup_cache)
+    else:
+        prob = _new_problem(cycle_class, cycle_kwargs)
+        prob.setup()
+
+    if setup_fn is not None:
+        setup_fn(prob)
+
+    # solve the design point once, the sweep then only solves `pt`. `pt` need not converge at
+    # its initial condition, so it starts the sweep from the initial guesses again
+    solver = prob.model._get_subsystem(pt).nonlinear_solver
+    solver.options["err_on_non_converge"] = False
+    guesses = snapshot_point(prob, point_outputs(prob, pt))
+    prob.run_model()
+    restore_point(prob, guesses)
+
+    # a point that does not converge must not be recorded as a result
+    solver.options["err_on_non_converge"] = True
+    prob.set_solver_print(level=-1)
+
+    return prob
+
+
+def _init_worker(cycle_class, pt, setup_fn, cycle_kwargs, setup_cache):
+    _worker["prob"] = build_problem(cycle_class, pt, setup_fn, cycle_kwargs, setup_cache)
+    _worker["pt"] = pt
+
+
+@contextlib.contextmanager
+def worker_env(env=WORKER_ENV):
+    """
+    Set the environment variables `env` that are not set already while worker processes are
+    started, then restore the environment. The BLAS thread pools are sized when the workers
+    import numpy, before any initializer runs, so the variables have to be inherited.
+    """
+    added = {key: val for key, val in env.items() if key not in os.environ}
+    os.environ.update(added)
+    try:
+        yield
+    finally:
+        for key in added:
+            os.environ.pop(key, None)
+
+
+def solve_point(prob, pt):
+    """
+    Solve point `pt` only. The swept inputs belong to `pt` alone, so DESIGN and the other
+    points keep their solution; the new input values are transferred to `pt` first.
+    """
+    prob.model.run_apply_nonlinear()
+    prob.model._get_subsystem(pt).run_solve_nonlinear()
+
+
+def point_outputs(prob, pt):
+    """
+    Names of every output of point `pt`, the state snapshot_point saves
+    """
+    outputs = prob.model._get_subsystem(pt).list_outputs(val=False, out_stream=None, return_format="dict")
+    return [f"{pt}.{name}" for name in outputs]
+
+
+def snapshot_point(prob, names):
+    return {name: prob.get_val(name, copy=True) for name in names}
+
+
+def restore_point(prob, snapshot):
+    for name, val in snapshot.items():
+        prob.set_val(name, val)
+
+
+def run_points(prob, pt, points, outputs=DEFAULT_OUTPUTS):
+    """
+    Run `points` in order on an already set up problem, each point starting from the
+    solution of the previous one. A failed point leaves NaNs in its row and the model
+    is rolled back to the last converged state before moving on.
+    """
+    values = np.full((len(points), len(outputs)), np.nan)
+    converged = np.zeros(len(points), dtype=bool)
+
+    state_names = point_outputs(prob, pt)
+    last_good = snapshot_point(prob, state_names)
+    for i, point in enumerate(points):
+        set_point(prob, pt, point)
+        try:
+            solve_point(prob, pt)
+        except om.AnalysisError:
+            restore_point(prob, last_good)
+            continue
+
+        converged[i] = True
+        last_good = snapshot_point(prob, state_names)
+        for j, name in enumerate(outputs):
+            values[i, j] = prob.get_val(f"{pt}.{name}")[0]
+
+    return values, converged
+
+
+def od_state_names(prob, pt):
+    """
+    Names of the off-design solver states (OD_STATES) that exist on point `pt`
+    """
+    names = []
+    for name in OD_STATES:
+        try:
+            prob.get_val(f"{pt}.{name}")
+        except KeyError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_states(prob, pt, names):
+    return {name: prob.get_val(f"{pt}.{name}").copy() for name in names}
+
+
+def set_states(prob, pt, states):
+    for name, val in states.items():
+        prob.set_val(f"{pt}.{name}", val)
+
+
+def _point_coords(points, keys, scales):
+    return np.array([[p[k] / scales[k] for k in keys] for p in points])
+
+
+def _grid_scales(points, keys):
+    # normalise each grid column by its span so MN and alt weigh the same in the distance
+    scales = {}
+    for k in keys:
+        vals = np.array([p[k] for p in points], dtype=float)
+        span = vals.max() - vals.min()
+        scales[k] = span if span > 0.0 else 1.0
+    return scales
+
+
+def nearest_neighbour_order(points, start=0, scales=None):
+    """
+    Reorder `points` into a greedy nearest-neighbour path through the normalised grid,
+    starting from points[start]. Returns the list of indices into `points`.
+    """
+    if not points:
+        return []
+    keys = sorted(points[0])
+    scales = scales or _grid_scales(points, keys)
+    coords = _point_coords(points, keys, scales)
+
+    order = [start]
+    unvisited = np.ones(len(points), dtype=bool)
+    unvisited[start] = False
+    for _ in range(len(points) - 1):
+        dist = np.linalg.norm(coords - coords[order[-1]], axis=1)
+        dist[~unvisited] = np.inf
+        nxt = int(np.argmin(dist))
+        order.append(nxt)
+        unvisited[nxt] = False
+
+    return order
+
+
+def _solve_from(prob, pt, start_point, start_states, target, max_depth):
+    """
+    Converge `target` starting from the solution `start_states` found at `start_point`.
+    When Newton fails, the step is halved and the midpoint solved first, up to `max_depth`
+    times, so big jumps in the envelope are walked in smaller steps.
+    """
+    set_states(prob, pt, start_states)
+    set_point(prob, pt, target)
+    try:
+        solve_point(prob, pt)
+        return True
+    except om.AnalysisError:
+        if start_point is None or max_depth == 0:
+            return False
+
+    mid = {k: 0.5 * (start_point[k] + target[k]) for k in target}
+    if not _solve_from(prob, pt, start_point, start_states, mid, max_depth - 1):
+        return False
+
+    mid_states = get_states(prob, pt, list(start_states))
+    return _solve_from(prob, pt, mid, mid_states, target, max_depth - 1)
+
+
+def run_continuation(prob, pt, points, outputs=DEFAULT_OUTPUTS, max_depth=3, scales=None):
+    """
+    Run `points` in the given order, seeding the OD_STATES of every point from the closest
+    already converged point instead of simply the previous one, and bisecting the step when
+    Newton fails (see _solve_from). The first point starts from whatever guesses are set on
+    the model. Returns values and converged mask in the order of `points`.
+    """
+    values = np.full((len(points), len(outputs)), np.nan)
+    converged = np.zeros(len(points), dtype=bool)
+    if not points:
+        return values, converged
+
+    keys = sorted(points[0])
+    scales = scales or _grid_scales(points, keys)
+    coords = _point_coords(points, keys, scales)
+    names = od_state_names(prob, pt)
+
+    solved = []  # indices of converged points
+    solved_states = []
+    state_names = point_outputs(prob, pt)
+    last_good = snapshot_point(prob, state_names)
+    for i, point in enumerate(points):
+        if solved:
+            dist = np.linalg.norm(coords[solved] - coords[i], axis=1)
+            k = int(np.argmin(dist))
+            start_point, start_states = points[solved[k]], solved_states[k]
+        else:
+            start_point, start_states = None, get_states(prob, pt, names)
+
+        if not _solve_from(prob, pt, start_point, start_states, point, max_depth):
+            # the states that are not seeded (flight condition, chemistry) are reset too
+            restore_point(prob, last_good)
+            continue
+
+        converged[i] = True
+        last_good = snapshot_point(prob, state_names)
+        solved.append(i)
+        solved_states.append(get_states(prob, pt, names))
+        for j, name in enumerate(outputs):
+            values[i, j] = prob.get_val(f"{pt}.{name}")[0]
+
+    return values, converged
+
+
+def _run_chunk(indices, points, outputs, continuation, scales):
+    if continuation:
+        values, converged = run_continuation(_worker["prob"], _worker["pt"], points, outputs,
+                                             scales=scales)
+    else:
+        values, converged = run_points(_worker["prob"], _worker["pt"], points, outputs)
+    return indices, values, converged
+
+
+def run_sweep(cycle_class, pt, points, setup_fn=None, outputs=DEFAULT_OUTPUTS,
+              num_procs=None, cycle_kwargs=None, continuation=True, setup_cache=None):
+    """
+    Run every point of `points` (see make_grid) on point `pt` of `cycle_class`, split across
+    a process pool. Each worker sets up one Problem and solves a contiguous block of the grid,
+    so consecutive points stay warm-started. With `continuation` the grid is first reordered
+    into a nearest-neighbour path and every block is solved with run_continuation.
+    `setup_fn` and `cycle_class` must be importable at module level so they can be sent to
+    the workers. With a `setup_cache` directory the workers restore the set up Problem from
+    there instead of each running setup, see cached_setup.
+
+    Returns a dict of arrays in grid order: one per grid column, one per output and a boolean
+    'converged' mask.
+    """
+    points = list(points)
+    num_procs = num_procs or os.cpu_count()
+    num_procs = max(1, min(num_procs, len(points)))
+
+    # distances are normalised over the whole grid, not per worker block
+    scales = _grid_scales(points, sorted(points[0]))
+    order = nearest_neighbour_order(points, scales=scales) if continuation else list(range(len(points)))
+    chunk_size = -(-len(points) // num_procs)
+    chunks = [order[start:start + chunk_size] for start in range(0, len(order), chunk_size)]
+
+    values = np.full((len(points), len(outputs)), np.nan)
+    converged = np.zeros(len(points), dtype=bool)
+
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=num_procs, mp_context=ctx, initializer=_init_worker,
+                             initargs=(cycle_class, pt, setup_fn, cycle_kwargs, setup_cache)) as pool:
+        # the pool starts a worker per submitted chunk, so all of them inherit the worker env
+        with worker_env():
+            futures = [pool.submit(_run_chunk, idx, [points[i] for i in idx], outputs, continuation,
+                                   scales) for idx in chunks]
+        for future in futures:
+            idx, chunk_values, chunk_converged = future.result()
+            values[idx] = chunk_values
+            converged[idx] = chunk_converged
+
+    results = {key: np.array([p.get(key, np.nan) for p in points]) for key in SWEEP_INPUTS
+               if any(key in p for p in points)}
+    for j, name in enumerate(outputs):
+        results[name] = values[:, j]
+    results["converged"] = converged
+
+    return results
+
+
+def _hbtf_setup(prob):
+    # design point and initial guesses from optim_hbtf.py
+    prob.set_val("DESIGN.fc.alt", 28000.0, units="ft")
+    prob.set_val("DESIGN.fc.MN", 0.74)
+    prob.set_val("fan:PRdes", 1.75)
+    prob.set_val("lpc:PRdes", 1.2)
+    prob.set_val("DESIGN.balance.rhs:hpc_PR", 34.48)
+    prob.set_val("DESIGN.splitter.BPR", 5.9)
+    prob.set_val("DESIGN.fan.eff", 0.9)
+    prob.set_val("DESIGN.lpc.eff", 0.9243)
+    prob.set_val("DESIGN.hpc.eff", 0.907)
+    prob.set_val("DESIGN.hpt.eff", 0.9)
+    prob.set_val("DESIGN.lpt.eff", 0.9)
+    prob.set_val("DESIGN.T4_MAX", 1600, units="degK")
+    prob.set_val("DESIGN.Fn_DES", 12000.0, units="lbf")
+
+    prob["DESIGN.balance.FAR"] = 0.02424
+    prob["DESIGN.balance.W"] = 701.165
+    prob["DESIGN.balance.lpt_PR"] = 5.088
+    prob["DESIGN.balance.hpt_PR"] = 4.43
+    prob["DESIGN.fc.balance.Pt"] = 6.873
+    prob["DESIGN.fc.balance.Tt"] = 464.798
+
+    pt = "OD_TOfail"
+    prob[pt + ".balance.FAR"] = 0.03081
+    prob[pt + ".balance.W"] = 1503.771
+    prob[pt + ".balance.BPR"] = 5.431
+    prob[pt + ".balance.lp_Nmech"] = 5977.580
+    prob[pt + ".balance.hp_Nmech"] = 14217
+    prob[pt + ".hpt.PR"] = 4.256
+    prob[pt + ".lpt.PR"] = 5.051
+    prob[pt + ".fan.map.RlineMap"] = 2.606
+    prob[pt + ".lpc.map.RlineMap"] = 2.0052
+    prob[pt + ".hpc.map.RlineMap"] = 2.116
+
+
+if __name__ == "__main__":
+
+    import time
+
+    from optim_hbtf import MPhbtf
+
+    grid = make_grid(
+        MNs=[0.001, 0.2, 0.4, 0.6],
+        alts=[0.0, 1000.0, 10000.0],
+        throttles=[1850.0, 1750.0, 1650.0],
+        throttle_name="T4_MAX",
+    )
+
+    st = time.time()
+    results = run_sweep(MPhbtf, "OD_TOfail", grid, setup_fn=_hbtf_setup, setup_cache="setup_cache")
+
+    print(f"{results['converged'].sum()}/{len(grid)} points converged")
+    for i in range(len(grid)):
+        print(
+            "MN %5.3f  alt %7.1f  T4 %6.1f  Fn %8.1f  TSFC %7.5f"
+            % (results["MN"][i], results["alt"][i], results["T4_MAX"][i],
+               results["perf.Fn"][i], results["perf.TSFC"][i])
+        )
+    print()
+    print("Run time", time.time() - st)
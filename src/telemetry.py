@@ -0,0 +1,272 @@
+import atexit
+import json
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+import openmdao.api as om
+
+
+class SolverTrace:
+    """
+    Instrumentation of the solvers of a set up Problem, see enable_solver_trace.
+
+    Newton solvers of systems at most `depth` levels down (by default the model and the cycle
+    points) are traced one by one: every iteration (residual norm and the norm of each balance
+    residual), line search backtrack, DirectSolver factorisation and finished solve is written
+    as one JSON line to `filepath`, if given, and counted for summary(). The time spent in
+    components and the solves of the deeper solvers (e.g. the CEA equilibrium Newtons) are
+    totalled by element, the system `depth` + 1 levels down such as DESIGN.fan. Timings are
+    wall times from time.perf_counter. With `elements=False` the components are left alone,
+    which saves their timing overhead when only the solvers are of interest.
+    """
+
+    def __init__(self, filepath=None, depth=1, elements=True):
+        self.filepath = filepath
+        self.depth = depth
+        self.with_elements = elements
+        self._file = None
+        self._t0 = time.perf_counter()
+
+        # traced Newton solver path -> counters
+        self.newton = defaultdict(lambda: {"solves": 0, "iterations": 0, "max_iterations": 0, "failures": 0,
+                                           "backtracks": 0, "time": 0.0, "last_balances": {}})
+        # traced DirectSolver path -> [factorisations, factorisation time, solves, solve time]
+        self.direct = defaultdict(lambda: [0, 0.0, 0, 0.0])
+        # element path -> counters of everything below it
+        self.elements = defaultdict(lambda: {"computes": 0, "compute_time": 0.0, "linearizes": 0,
+                                             "linearize_time": 0.0, "newton_solves": 0, "newton_iterations": 0,
+                                             "factorisations": 0, "factorisation_time": 0.0})
+        atexit.register(self.close)
+
+    def _emit(self, event, **data):
+        if self.filepath is None:
+            return
+        if self._file is None:
+            self._file = open(self.filepath, "w")
+        data = {"event": event, "t": round(time.perf_counter() - self._t0, 6), **data}
+        self._file.write(json.dumps(data) + "\n")
+
+    def close(self):
+        """
+        Flush and close the trace file
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _element(self, path):
+        return ".".join(path.split(".")[:self.depth + 1])
+
+    def _traced(self, path):
+        return len(path.split(".")) <= self.depth if path else True
+
+    def _wrap_newton(self, solver, resids, balances):
+        path = solver._system().pathname
+        stats = self.newton[path]
+        solve = solver._solve
+        iter_get_norm = solver._iter_get_norm
+
+        def traced_solve():
+            stats["solves"] += 1
+            start = time.perf_counter()
+            failed = True
+            try:
+                solve()
+                failed = False
+            finally:
+                # a solve that raised (err_on_non_converge) or left the tolerances unmet failed
+                options = solver.options
+                norm = traced_iter_get_norm.last
+                if not failed:
+                    failed = not (norm <= options["atol"] or norm / solver._norm0 <= options["rtol"])
+                elapsed = time.perf_counter() - start
+                stats["iterations"] += solver._iter_count
+                stats["max_iterations"] = max(stats["max_iterations"], solver._iter_count)
+                stats["failures"] += failed
+                stats["time"] += elapsed
+                self._emit("newton_solve", solver=path, solve=stats["solves"], iterations=solver._iter_count,
+                           norm=norm, converged=not failed, time=elapsed)
+
+        def traced_iter_get_norm():
+            norm = iter_get_norm()
+            vals = resids.asarray()
+            stats["last_balances"] = {name: float(np.linalg.norm(vals[start:end]))
+                                      for name, (start, end) in balances.items()}
+            traced_iter_get_norm.last = norm
+            self._emit("newton_iter", solver=path, solve=stats["solves"], iter=solver._iter_count, norm=norm,
+                       balances=stats["last_balances"])
+            return norm
+
+        traced_iter_get_norm.last = np.nan
+        solver._solve = traced_solve
+        solver._iter_get_norm = traced_iter_get_norm
+
+        linesearch = solver.linesearch
+        if linesearch is not None:
+            ls_solve = linesearch._solve
+
+            def traced_ls_solve():
+                ls_solve()
+                # ArmijoGoldsteinLS counts one iteration per backtrack, BoundsEnforceLS none
+                stats["backtracks"] += linesearch._iter_count
+                if linesearch._iter_count:
+                    self._emit("linesearch", solver=path, solve=stats["solves"], iter=solver._iter_count,
+                               backtracks=linesearch._iter_count)
+
+            linesearch._solve = traced_ls_solve
+
+    def _wrap_nested_newton(self, solver, element):
+        stats = self.elements[element]
+        solve = solver._solve
+
+        def counted_solve():
+            try:
+                solve()
+            finally:
+                stats["newton_solves"] += 1
+                stats["newton_iterations"] += solver._iter_count
+
+        solver._solve = counted_solve
+
+    def _wrap_direct(self, solver):
+        path = solver._system().pathname
+        stats = self.direct[path]
+        linearize = solver._linearize
+        solve = solver.solve
+
+        def traced_linearize():
+            start = time.perf_counter()
+            linearize()
+            elapsed = time.perf_counter() - start
+            stats[0] += 1
+            stats[1] += elapsed
+            self._emit("factorise", solver=path, time=elapsed)
+
+        def traced_solve(mode, rel_systems=None):
+            start = time.perf_counter()
+            solve(mode, rel_systems)
+            stats[2] += 1
+            stats[3] += time.perf_counter() - start
+
+        solver._linearize = traced_linearize
+        solver.solve = traced_solve
+
+    def _wrap_nested_direct(self, solver, element):
+        stats = self.elements[element]
+        linearize = solver._linearize
+
+        def counted_linearize():
+            start = time.perf_counter()
+            linearize()
+            stats["factorisations"] += 1
+            stats["factorisation_time"] += time.perf_counter() - start
+
+        solver._linearize = counted_linearize
+
+    def _wrap_component(self, comp, element):
+        stats = self.elements[element]
+        apply_nonlinear = comp._apply_nonlinear
+        solve_nonlinear = comp._solve_nonlinear
+        linearize = comp._linearize
+
+        def traced_apply_nonlinear():
+            start = time.perf_counter()
+            apply_nonlinear()
+            stats["computes"] += 1
+            stats["compute_time"] += time.perf_counter() - start
+
+        def traced_solve_nonlinear():
+            start = time.perf_counter()
+            solve_nonlinear()
+            stats["computes"] += 1
+            stats["compute_time"] += time.perf_counter() - start
+
+        def traced_linearize(sub_do_ln=False):
+            start = time.perf_counter()
+            linearize(sub_do_ln)
+            stats["linearizes"] += 1
+            stats["linearize_time"] += time.perf_counter() - start
+
+        comp._apply_nonlinear = traced_apply_nonlinear
+        comp._solve_nonlinear = traced_solve_nonlinear
+        comp._linearize = traced_linearize
+
+    def attach(self, model):
+        resids = model._residuals
+        for system in model.system_iter(include_self=True, recurse=True):
+            path = system.pathname
+            traced = self._traced(path)
+
+            if isinstance(system.nonlinear_solver, om.NewtonSolver):
+                if traced:
+                    # the balances solved by this Newton, as ranges of the model residual vector
+                    prefix = f"{path}." if path else ""
+                    balances = {abs_name[len(prefix):]: resids.get_range(abs_name)
+                                for comp in system.system_iter(recurse=True, typ=om.BalanceComp)
+                                for abs_name in comp._var_abs2meta["output"]}
+                    self._wrap_newton(system.nonlinear_solver, resids, balances)
+                else:
+                    self._wrap_nested_newton(system.nonlinear_solver, self._element(path))
+
+            if isinstance(system.linear_solver, om.DirectSolver):
+                if traced:
+                    self._wrap_direct(system.linear_solver)
+                else:
+                    self._wrap_nested_direct(system.linear_solver, self._element(path))
+
+            if self.with_elements and isinstance(system, (om.ExplicitComponent, om.ImplicitComponent)):
+                self._wrap_component(system, self._element(path))
+
+    def summary(self, top=10, balances=5):
+        """
+        Text tables of the traced Newton solves by system, the `top` most costly elements and
+        the largest `balances` balance residuals left by the last iteration of each solver
+        """
+        line = "-" * 104
+        lines = [line, f"{'NEWTON SOLVES':^104}", line,
+                 f"{'System':<24}{'solves':>8}{'failed':>8}{'iters':>8}{'max it':>8}{'backtr':>8}"
+                 f"{'time, s':>10}{'factor':>8}{'fact, s':>10}{'lin sol':>8}{'sol, s':>10}"]
+        for path, stats in self.newton.items():
+            direct = self.direct.get(path, [0, 0.0, 0, 0.0])
+            lines.append(f"{path or '<model>':<24.24}{stats['solves']:>8}{stats['failures']:>8}"
+                         f"{stats['iterations']:>8}{stats['max_iterations']:>8}{stats['backtracks']:>8}"
+                         f"{stats['time']:>10.3f}{direct[0]:>8}{direct[1]:>10.3f}{direct[2]:>8}{direct[3]:>10.3f}")
+
+        lines += [line, f"{'ELEMENTS':^104}", line,
+                  f"{'Element':<28}{'computes':>10}{'comp, s':>10}{'lineariz':>10}{'lin, s':>10}"
+                  f"{'NL solves':>10}{'NL iters':>10}{'factor':>8}{'fact, s':>8}"]
+        ranked = sorted(self.elements.items(), reverse=True,
+                        key=lambda item: item[1]["compute_time"] + item[1]["linearize_time"])
+        for element, stats in ranked[:top]:
+            lines.append(f"{element:<28.28}{stats['computes']:>10}{stats['compute_time']:>10.3f}"
+                         f"{stats['linearizes']:>10}{stats['linearize_time']:>10.3f}{stats['newton_solves']:>10}"
+                         f"{stats['newton_iterations']:>10}{stats['factorisations']:>8}"
+                         f"{stats['factorisation_time']:>8.3f}")
+
+        lines += [line, f"{'LARGEST BALANCE RESIDUALS':^104}", line]
+        for path, stats in self.newton.items():
+            worst = sorted(stats["last_balances"].items(), key=lambda item: item[1], reverse=True)
+            for name, val in worst[:balances]:
+                lines.append(f"{path or '<model>':<24.24}{name:<60.60}{val:>12.3e}")
+        lines.append(line)
+
+        return "\n".join(lines) + "\n"
+
+    def write_summary(self, file=sys.stdout, top=10, balances=5):
+        file.write(self.summary(top, balances))
+        file.flush()
+
+
+def enable_solver_trace(prob, filepath=None, depth=1):
+    """
+    Trace the Newton solvers, line searches, DirectSolvers and components of a set up Problem,
+    see SolverTrace, writing one JSON line per event to `filepath` if given. Call after
+    prob.setup(); the components are wrapped once their vectors exist, so final_setup() is
+    run here. Returns the SolverTrace, e.g. to print its summary().
+    """
+    prob.final_setup()
+    trace = SolverTrace(filepath, depth)
+    trace.attach(prob.model)
+    return trace
@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from campaign import run_campaign
+from results_store import ResultsStore
+
+
+def _toy_job(conn, spec, setup_cache, job_dir, guess_db):
+    # stands in for _run_job; spec["do"] is what the job does on each attempt, the last one repeating.
+    # Timeouts in the tests allow for the worker start, which imports the cycle modules
+    os.makedirs(job_dir, exist_ok=True)
+    runs_file = os.path.join(job_dir, "runs")
+    runs = os.path.getsize(runs_file) if os.path.exists(runs_file) else 0
+    with open(runs_file, "a") as f:
+        f.write("x")
+
+    action = spec["do"][min(runs, len(spec["do"]) - 1)]
+    if action == "crash":
+        os._exit(3)
+    if action == "hang":
+        time.sleep(60)
+    if action == "fail":
+        conn.send(("failed", "AnalysisError"))
+    else:
+        conn.send(("ok", {"DESIGN.perf.Fn": spec.get("Fn", 1.0)}))
+    conn.close()
+
+
+class CampaignTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.out_dir = os.path.join(self.dir, "out")
+        self.store = os.path.join(self.dir, "store")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _run(self, specs, **kwargs):
+        kwargs.setdefault("timeout", 30.0)
+        return run_campaign(specs, "toy", num_procs=2, setup_cache=None, out_dir=self.out_dir,
+                            store=self.store, target=_toy_job, **kwargs)
+
+    def _runs(self, job):
+        return os.path.getsize(os.path.join(self.out_dir, "toy", job, "runs"))
+
+    def _journal(self):
+        with open(os.path.join(self.out_dir, "toy", "journal.jsonl")) as f:
+            return [json.loads(line) for line in f]
+
+    def test_timeout_and_crash(self):
+        statuses = self._run([{"name": "hang", "do": ["hang"]}, {"name": "crash", "do": ["crash"]},
+                              {"name": "ok", "do": ["ok"]}], timeout=15.0, retries=0)
+        self.assertEqual(statuses, {"hang": "timeout", "crash": "crashed", "ok": "ok"})
+
+    def test_retries(self):
+        # crashes and timeouts are retried, a failed job is not
+        statuses = self._run([{"name": "crash_once", "do": ["crash", "ok"]},
+                              {"name": "fail_once", "do": ["fail", "ok"]}], retries=1)
+        self.assertEqual(statuses, {"crash_once": "ok", "fail_once": "failed"})
+        self.assertEqual(self._runs("crash_once"), 2)
+        self.assertEqual(self._runs("fail_once"), 1)
+
+        statuses = self._run([{"name": "fail_twice", "do": ["fail", "ok"]}], retries=1,
+                             retry_on=("crashed", "timeout", "failed"))
+        self.assertEqual(statuses, {"fail_twice": "ok"})
+
+    def test_resume(self):
+        specs = [{"name": "a", "do": ["ok"], "Fn": 1.0}, {"name": "b", "do": ["crash"]}]
+        self.assertEqual(self._run(specs, retries=0), {"a": "ok", "b": "crashed"})
+
+        # the finished job is skipped, the crashed one run again, and an edited one run again
+        specs = [{"name": "a", "do": ["ok"], "Fn": 1.0}, {"name": "b", "do": ["ok"]},
+                 {"name": "c", "do": ["ok"]}]
+        self.assertEqual(self._run(specs), {"a": "ok", "b": "ok", "c": "ok"})
+        self.assertEqual([self._runs(job) for job in "abc"], [1, 2, 1])
+
+        specs[0]["Fn"] = 2.0
+        self._run(specs)
+        self.assertEqual(self._runs("a"), 2)
+
+        run_ids = ResultsStore(self.store).query(columns=["run_id"])["run_id"]
+        self.assertEqual(sorted(run_ids), ["toy/a", "toy/a", "toy/b", "toy/c"])
+
+    def test_stored_but_not_journalled(self):
+        # a campaign killed after storing a job but before journalling it
+        specs = [{"name": "a", "do": ["ok"]}]
+        self._run(specs)
+        os.remove(os.path.join(self.out_dir, "toy", "journal.jsonl"))
+
+        self.assertEqual(self._run(specs), {"a": "ok"})
+        self.assertEqual(self._runs("a"), 1)
+        self.assertEqual(len(ResultsStore(self.store)), 1)
+        self.assertTrue(self._journal()[0]["recovered"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import openmdao.api as om
+
+from case_index import IndexedCaseReader
+
+
+def _record(filename, xs):
+    prob = om.Problem(reports=False)
+    prob.model.add_subsystem("comp", om.ExecComp("obj = x**2"), promotes=["*"])
+    prob.model.add_recorder(om.SqliteRecorder(filename))
+    prob.setup()
+    for x in xs:
+        prob.set_val("x", x)
+        prob.run_model()
+    prob.cleanup()
+
+
+class IndexedCaseReaderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, "cases.sql")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_history(self):
+        _record(self.filename, [1.0, 2.0, 3.0])
+        reader = IndexedCaseReader(self.filename)
+
+        self.assertEqual(len(reader), 3)
+        history = reader.history(["obj", "x"])
+        np.testing.assert_array_equal(history["obj"].ravel(), [1.0, 4.0, 9.0])
+        np.testing.assert_array_equal(history["x"].ravel(), [1.0, 2.0, 3.0])
+
+    def test_index_reused(self):
+        _record(self.filename, [1.0, 2.0])
+        IndexedCaseReader(self.filename)
+        self.assertTrue(os.path.exists(f"{self.filename}.system.idx"))
+
+        reader = IndexedCaseReader(self.filename)
+        self.assertEqual(len(reader), 2)
+        np.testing.assert_array_equal(reader.get_case(-1).get_val("obj"), [4.0])
+
+    def test_rerecorded_file(self):
+        # the recorder replaces the file on every run; the index of the earlier run must not be used
+        _record(self.filename, np.arange(11.0))
+        self.assertEqual(len(IndexedCaseReader(self.filename)), 11)
+
+        _record(self.filename, [1.0, 2.0, 5.0])
+        reader = IndexedCaseReader(self.filename)
+        self.assertEqual(len(reader), 3)
+        np.testing.assert_array_equal(reader.get_case(-1).get_val("obj"), [25.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+
+import numpy as np
+import openmdao.api as om
+
+from pycycle import constants
+from pycycle.thermo.cea import species_data
+from pycycle.thermo.cea.chem_eq import ChemEq
+
+from cea_cache import EquilibriumCache, cache_summary, enable_cea_cache
+
+
+def _chem_eq_problem():
+    thermo = species_data.Properties(species_data.janaf, init_elements=constants.AIR_ELEMENTS)
+    prob = om.Problem(reports=False)
+    prob.model.add_subsystem("ceq", ChemEq(thermo=thermo), promotes=["*"])
+    prob.model.set_input_defaults("P", 1.034210, units="bar")
+    prob.model.set_input_defaults("T", 1500.0, units="degK")
+    prob.setup(check=False)
+    prob.set_solver_print(level=-1)
+    return prob
+
+
+class EquilibriumCacheTestCase(unittest.TestCase):
+
+    def test_nearest_after_reorder(self):
+        # hits reorder the entries; nearest() must still return the state of the closest inputs
+        cache = EquilibriumCache()
+        cache.store(np.array([1.0]), np.array([10.0]))
+        cache.store(np.array([2.0]), np.array([20.0]))
+        np.testing.assert_array_equal(cache.nearest(np.array([1.0])), [10.0])
+
+        cache.lookup(np.array([1.0]))
+        np.testing.assert_array_equal(cache.nearest(np.array([1.0])), [10.0])
+        np.testing.assert_array_equal(cache.nearest(np.array([1.9])), [20.0])
+
+        cache.store(np.array([2.0]), np.array([20.0]))
+        np.testing.assert_array_equal(cache.nearest(np.array([1.1])), [10.0])
+
+    def test_nearest_after_eviction(self):
+        cache = EquilibriumCache(maxsize=2)
+        cache.store(np.array([1.0]), np.array([10.0]))
+        cache.store(np.array([2.0]), np.array([20.0]))
+        cache.nearest(np.array([1.0]))
+        cache.lookup(np.array([1.0]))
+        cache.store(np.array([3.0]), np.array([30.0]))  # evicts 2.0, the least recently used
+
+        self.assertIsNone(cache.lookup(np.array([2.0])))
+        np.testing.assert_array_equal(cache.nearest(np.array([2.1])), [30.0])
+        np.testing.assert_array_equal(cache.nearest(np.array([1.2])), [10.0])
+
+    def test_nearest_max_dist(self):
+        cache = EquilibriumCache(max_dist=0.1)
+        cache.store(np.array([1.0]), np.array([10.0]))
+        np.testing.assert_array_equal(cache.nearest(np.array([1.05])), [10.0])
+        self.assertIsNone(cache.nearest(np.array([1.5])))
+        self.assertEqual(cache.near, 1)
+
+    def test_lookup_rounds_inputs(self):
+        cache = EquilibriumCache(digits=6)
+        cache.store(np.array([1.0, 1000.0]), np.array([5.0]))
+        np.testing.assert_array_equal(cache.lookup(np.array([1.0000001, 1000.0001])), [5.0])
+        self.assertIsNone(cache.lookup(np.array([1.001, 1000.0])))
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_chem_eq_solutions(self):
+        # the cached problem solves the same equilibria as a plain one, and hits on revisits
+        plain = _chem_eq_problem()
+        cached = _chem_eq_problem()
+        caches = enable_cea_cache(cached)
+        cache, = caches.values()
+
+        temperatures = [1500.0, 2000.0, 2500.0, 1500.0, 2000.0]
+        for T in temperatures:
+            for prob in (plain, cached):
+                prob.set_val("T", T, units="degK")
+                prob.run_model()
+            # both are converged to the equilibrium Newton tolerance, from different starts
+            np.testing.assert_allclose(cached.get_val("n"), plain.get_val("n"), rtol=1e-3, atol=1e-12)
+
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.hits + cache.misses, len(temperatures))
+        self.assertIn("5 lookups, 40.0% exact hits", cache_summary(caches))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+
+import openmdao.api as om
+from openmdao.utils.assert_utils import assert_check_partials, assert_near_equal
+
+from efficiency import Efficiency
+
+
+def _problem(inputs):
+    nn = len(inputs["Wfuel"])
+    prob = om.Problem(reports=False)
+    prob.model.add_subsystem("eff", Efficiency(num_nodes=nn))
+    prob.setup(force_alloc_complex=True)
+    for name, val in inputs.items():
+        prob.set_val(f"eff.{name}", val)
+    prob.run_model()
+    return prob
+
+
+class EfficiencyTestCase(unittest.TestCase):
+
+    def test_partials(self):
+        rng = np.random.default_rng(0)
+        nn = 4
+        prob = _problem({
+            "Wfuel": rng.uniform(0.5, 3.0, nn),
+            "Fn": rng.uniform(5.0e3, 4.0e4, nn),
+            "V_aircraft": rng.uniform(0.0, 800.0, nn),
+            "V_jet_core": rng.uniform(900.0, 1500.0, nn),
+            "V_jet_bypass": rng.uniform(600.0, 1000.0, nn),
+            "W_core": rng.uniform(40.0, 100.0, nn),
+            "W_bypass": rng.uniform(300.0, 900.0, nn),
+        })
+        data = prob.check_partials(method="cs", out_stream=None)
+        assert_check_partials(data, atol=1e-10, rtol=1e-10)
+
+    def test_known_point(self):
+        # cruise: thrust power over fuel power, and jet kinetic energy gain over fuel power
+        prob = _problem({"Wfuel": [0.6], "Fn": [5000.0], "V_aircraft": [780.0], "V_jet_core": [1300.0],
+                         "V_jet_bypass": [950.0], "W_core": [40.0], "W_bypass": [400.0]})
+        fuel_power = 0.6 * 18400.0 * 778.169
+        dKE = (40.0 * 1300.0**2 + 400.0 * 950.0**2 - 439.4 * 780.0**2) / (2.0 * 32.174)
+
+        assert_near_equal(prob.get_val("eff.eta_overall"), 5000.0 * 780.0 / fuel_power, 1e-6)
+        assert_near_equal(prob.get_val("eff.eta_thermal"), dKE / fuel_power, 1e-6)
+        assert_near_equal(prob.get_val("eff.eta_propulsive"), 5000.0 * 780.0 / dKE, 1e-6)
+        assert_near_equal(prob.get_val("eff.eta_overall"), 0.454, 1e-3)
+
+    def test_partials_zero_flows(self):
+        # no fuel, no bypass flow and a static engine, where only EPS keeps the ratios finite
+        prob = _problem({
+            "Wfuel": [0.0, 1.0, 1.0],
+            "Fn": [1.0e4, 1.0e4, 1.0e4],
+            "V_aircraft": [500.0, 500.0, 0.0],
+            "V_jet_core": [1200.0, 1200.0, 1200.0],
+            "V_jet_bypass": [900.0, 900.0, 900.0],
+            "W_core": [50.0, 50.0, 50.0],
+            "W_bypass": [500.0, 0.0, 500.0],
+        })
+        for name in ["eta_thermal", "eta_propulsive", "eta_overall"]:
+            self.assertTrue(np.all(np.isfinite(prob.get_val(f"eff.{name}"))))
+
+        data = prob.check_partials(method="cs", out_stream=None)
+        assert_check_partials(data, atol=1e-8, rtol=1e-8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import openmdao.api as om
+
+from engine_deck import EngineDeck, write_deck
+from sweep import build_problem, make_grid, run_points, solve_point
+
+
+class _Perf(om.ExplicitComponent):
+    # thrust linear in every condition, so linear interpolation of the deck is exact;
+    # points above MN 0.5 fail
+
+    def setup(self):
+        self.add_input("MN", val=0.0)
+        self.add_input("alt", val=0.0, units="ft")
+        self.add_input("dTs", val=0.0, units="degR")
+        self.add_input("PC", val=1.0)
+        self.add_output("Fn", val=0.0, units="lbf")
+        self.declare_partials("Fn", "*", method="fd")
+
+    def compute(self, inputs, outputs):
+        if inputs["MN"] > 0.5:
+            raise om.AnalysisError("toy point did not converge")
+        outputs["Fn"] = 20000.0 * inputs["PC"] * (1.0 - 0.5 * inputs["MN"]) - 0.2 * inputs["alt"] - inputs["dTs"]
+
+
+class _ToyCycle(om.Group):
+
+    def setup(self):
+        pt = self.add_subsystem("pt", om.Group())
+        fc = pt.add_subsystem("fc", om.IndepVarComp())
+        fc.add_output("MN", 0.0)
+        fc.add_output("alt", 0.0, units="ft")
+        fc.add_output("dTs", 0.0, units="degR")
+        pt.add_subsystem("perf", _Perf(), promotes_inputs=["PC"])
+        for name in ("MN", "alt", "dTs"):
+            pt.connect(f"fc.{name}", f"perf.{name}")
+        pt.nonlinear_solver = om.NewtonSolver(solve_subsystems=False, iprint=-1)
+        pt.linear_solver = om.DirectSolver()
+
+
+def _solve_deck(path, MNs, alts, throttles):
+    prob = build_problem(_ToyCycle, "pt")
+    grid = make_grid(MNs, alts, throttles=throttles)
+    values, converged = run_points(prob, "pt", grid, outputs=["perf.Fn"])
+    axes = {"MN": MNs, "alt": alts, "dTs": (0.0,), "PC": throttles}
+    write_deck(path, axes, {"perf.Fn": values[:, 0], "converged": converged}, outputs=["perf.Fn"])
+    return prob, grid, values[:, 0]
+
+
+def _solve(prob, MN, alt, PC):
+    prob.set_val("pt.fc.MN", MN)
+    prob.set_val("pt.fc.alt", alt, units="ft")
+    prob.set_val("pt.PC", PC)
+    solve_point(prob, "pt")
+    return prob.get_val("pt.perf.Fn", units="lbf")[0]
+
+
+class EngineDeckTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "deck.npz")
+
+    def test_lookups_match_solved_points(self):
+        # descending altitude and throttle axes, as decks are often swept from the top down
+        prob, grid, Fn = _solve_deck(self.path, [0.0, 0.15, 0.3, 0.45], [30000.0, 20000.0, 10000.0, 0.0],
+                                     [1.0, 0.9, 0.8, 0.7])
+        deck = EngineDeck(self.path)
+
+        nodes = deck.get("perf.Fn", MN=[p["MN"] for p in grid], alt=[p["alt"] for p in grid],
+                         PC=[p["PC"] for p in grid])
+        np.testing.assert_allclose(nodes, Fn, rtol=1e-12)
+
+        for MN, alt, PC in [(0.1, 25000.0, 0.95), (0.35, 4000.0, 0.72), (0.0, 30000.0, 1.0)]:
+            self.assertAlmostEqual(deck.get("perf.Fn", MN=MN, alt=alt, PC=PC)[()], _solve(prob, MN, alt, PC), places=6)
+
+        pchip = EngineDeck(self.path, method="pchip")
+        self.assertAlmostEqual(pchip.get("perf.Fn", MN=0.1, alt=25000.0, PC=0.95)[()],
+                               _solve(prob, 0.1, 25000.0, 0.95), places=6)
+
+    def test_failed_points_stay_local(self):
+        # MN 0.6 does not converge; only lookups that depend on it are NaN, even for cubic methods
+        prob, _, Fn = _solve_deck(self.path, [0.0, 0.2, 0.4, 0.6], [0.0, 10000.0, 20000.0, 30000.0], [1.0])
+        self.assertEqual(np.isnan(Fn).sum(), 4)
+
+        deck = EngineDeck(self.path)
+        vals = deck.get("perf.Fn", MN=[0.1, 0.3, 0.5], alt=5000.0)
+        np.testing.assert_allclose(vals[:2], [_solve(prob, MN, 5000.0, 1.0) for MN in (0.1, 0.3)], rtol=1e-12)
+        self.assertTrue(np.isnan(vals[2]))
+
+        # the pchip slopes of the 0.2 - 0.4 cell use the failed points too
+        deck = EngineDeck(self.path, method="pchip")
+        vals = deck.get("perf.Fn", MN=[0.1, 0.3, 0.5], alt=5000.0)
+        self.assertAlmostEqual(vals[0], _solve(prob, 0.1, 5000.0, 1.0), places=6)
+        self.assertTrue(np.isnan(vals[1:]).all())
+
+        with self.assertRaises(ValueError):
+            EngineDeck(self.path, nan_policy="raise").get("perf.Fn", MN=0.1, alt=5000.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
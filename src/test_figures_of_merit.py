@@ -0,0 +1,72 @@
+import unittest
+
+import numpy as np
+
+import openmdao.api as om
+from openmdao.utils.assert_utils import assert_near_equal
+
+from efficiency import Efficiency
+from figures_of_merit import SWEEP_COLUMNS, figures_of_merit, from_columns
+
+
+# a cruise point, and the same point without a converged solution
+POINT = {"Wfuel": 0.6, "Fn": 5000.0, "V_aircraft": 780.0, "V_jet_core": 1300.0, "V_jet_bypass": 950.0,
+         "W_core": 40.0, "W_bypass": 400.0}
+
+
+class FiguresOfMeritTestCase(unittest.TestCase):
+
+    def test_known_point(self):
+        fom = figures_of_merit(**POINT)
+        fuel_power = 0.6 * 18400.0 * 778.169
+        dKE = (40.0 * 1300.0**2 + 400.0 * 950.0**2 - 439.4 * 780.0**2) / (2.0 * 32.174)
+
+        assert_near_equal(fom["eta_overall"], 5000.0 * 780.0 / fuel_power, 1e-6)
+        assert_near_equal(fom["eta_thermal"], dKE / fuel_power, 1e-6)
+        assert_near_equal(fom["eta_propulsive"], 5000.0 * 780.0 / dKE, 1e-6)
+        assert_near_equal(fom["eta_thermal"] * fom["eta_propulsive"], fom["eta_overall"], 1e-12)
+
+        assert_near_equal(fom["TSFC"], 0.432, 1e-12)
+        # 0.432 lbm/hr/lbf = 0.432 * 0.45359237 kg / 3600 s / 4.4482216 N
+        assert_near_equal(fom["TSFC_SI"], 1.22373e-5, 1e-4)
+        assert_near_equal(fom["specific_thrust"], 5000.0 / 439.4, 1e-12)
+        assert_near_equal(fom["velocity_ratio"], 1300.0 / 950.0, 1e-12)
+
+    def test_matches_component(self):
+        rng = np.random.default_rng(0)
+        nn = 50
+        inputs = {name: val * rng.uniform(0.8, 1.2, nn) for name, val in POINT.items()}
+        fom = figures_of_merit(**inputs)
+
+        prob = om.Problem(reports=False)
+        prob.model.add_subsystem("eff", Efficiency(num_nodes=nn))
+        prob.setup()
+        for name, val in inputs.items():
+            prob.set_val(f"eff.{name}", val)
+        prob.run_model()
+
+        for name in ["eta_thermal", "eta_propulsive", "eta_overall"]:
+            assert_near_equal(prob.get_val(f"eff.{name}"), fom[name], 1e-12)
+
+    def test_nan_rows(self):
+        columns = {SWEEP_COLUMNS[name]: np.array([val, val, val]) for name, val in POINT.items()}
+        columns["burner.Wfuel"][1] = np.nan
+        columns["perf.Fn"][2] = np.nan
+        fom = from_columns(columns)
+
+        for name, vals in fom.items():
+            self.assertTrue(np.all(np.isfinite(vals[0])), name)
+        for name in ["eta_thermal", "eta_overall", "TSFC", "TSFC_SI", "specific_thrust"]:
+            self.assertTrue(np.isnan(fom[name][1]), name)
+        for name in ["eta_propulsive", "eta_overall", "TSFC", "TSFC_SI", "specific_thrust"]:
+            self.assertTrue(np.isnan(fom[name][2]), name)
+
+    def test_store_columns(self):
+        columns = {f"DESIGN.{SWEEP_COLUMNS[name]}": np.array([val]) for name, val in POINT.items()}
+        assert_near_equal(from_columns(columns, pt="DESIGN")["TSFC"], [0.432], 1e-12)
+        with self.assertRaises(KeyError):
+            from_columns(columns)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+import openmdao.api as om
+
+from guess_db import GuessDB, is_converged
+
+
+class _Balance(om.ImplicitComponent):
+    # FAR = 0.01 * (1 + MN) at convergence
+
+    def setup(self):
+        self.add_input("MN", val=0.5)
+        self.add_output("FAR", val=0.02)
+        self.declare_partials("FAR", "FAR", val=1.0)
+        self.declare_partials("FAR", "MN", val=-0.01)
+
+    def apply_nonlinear(self, inputs, outputs, residuals):
+        residuals["FAR"] = outputs["FAR"] - 0.01 * (1.0 + inputs["MN"])
+
+
+def _toy_problem():
+    prob = om.Problem(reports=False)
+    pt = prob.model.add_subsystem("pt", om.Group())
+    pt.add_subsystem("fc", om.IndepVarComp("MN", 0.5))
+    pt.add_subsystem("balance", _Balance())
+    pt.connect("fc.MN", "balance.MN")
+    pt.nonlinear_solver = om.NewtonSolver(solve_subsystems=False, atol=1e-8, rtol=1e-99, iprint=-1)
+    pt.linear_solver = om.DirectSolver()
+    prob.setup()
+    return prob
+
+
+class GuessDBTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "guesses.pkl")
+
+    def test_is_converged(self):
+        prob = _toy_problem()
+        prob.final_setup()
+        self.assertFalse(is_converged(prob, "pt"))
+        # within rtol of the residual it started from, though not within atol
+        self.assertTrue(is_converged(prob, "pt", norm0=1e100))
+
+        prob.run_model()
+        self.assertTrue(is_converged(prob, "pt"))
+
+    def test_record_replaces_same_point(self):
+        prob = _toy_problem()
+        db = GuessDB(self.path)
+
+        prob.run_model()
+        self.assertTrue(db.record(prob, "pt", "toy"))
+        self.assertTrue(db.record(prob, "pt", "toy"))
+        table, = db.tables.values()
+        self.assertEqual(len(table["X"]), 1)
+
+        prob.set_val("pt.balance.FAR", 0.5)
+        self.assertFalse(db.record(prob, "pt", "toy"))
+
+    def test_max_records(self):
+        prob = _toy_problem()
+        db = GuessDB(self.path, max_records=3)
+
+        for MN in [0.1, 0.2, 0.3, 0.4, 0.5]:
+            prob.set_val("pt.fc.MN", MN)
+            prob.run_model()
+            db.record(prob, "pt", "toy")
+
+        table, = db.tables.values()
+        self.assertEqual([x[0] for x in table["X"]], [0.3, 0.4, 0.5])
+
+        prob.set_val("pt.fc.MN", 0.4)
+        self.assertAlmostEqual(db.guess(prob, "pt", "toy")["balance.FAR"], 0.014)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+import openmdao.api as om
+from openmdao.utils.assert_utils import assert_near_equal
+
+from optim_hbtf import MPhbtf, OD_POINTS
+from parallel_points import enable_parallel_points
+from sweep import OD_STATES, _hbtf_setup
+
+
+# two off-design points, so the workers solve a batch of them
+TEST_OD_POINTS = {
+    "OD_TOfail": OD_POINTS["OD_TOfail"],
+    "OD_TO": {
+        "throttle_mode": "T4",
+        "defaults": dict(OD_POINTS["OD_TOfail"]["defaults"], T4_MAX=(1800.0, "degK")),
+    },
+}
+
+OF = ["DESIGN.perf.TSFC", "OD_TOfail.perf.Fn", "OD_TO.perf.Fn", "OD_TO.perf.TSFC"]
+WRT = ["fan:PRdes", "DESIGN.T4_MAX"]
+
+
+def _build():
+    prob = om.Problem(reports=False)
+    prob.model = MPhbtf(od_points=TEST_OD_POINTS)
+    prob.setup()
+    _hbtf_setup(prob)
+    for name in OD_STATES:
+        prob[f"OD_TO.{name}"] = prob[f"OD_TOfail.{name}"]
+    prob.set_solver_print(level=-1)
+    return prob
+
+
+class ParallelPointsTestCase(unittest.TestCase):
+
+    def test_matches_serial_run(self):
+        serial = _build()
+        serial.run_model()
+
+        prob = _build()
+        solver = enable_parallel_points(prob, _build)
+        try:
+            prob.run_model()
+            totals = prob.compute_totals(OF, WRT)
+        finally:
+            solver.close()
+
+        for name, val in serial.model.list_outputs(out_stream=None, return_format="dict").items():
+            assert_near_equal(prob.get_val(name), val["val"], 1e-8)
+
+        ref = serial.compute_totals(OF, WRT)
+        for key, val in ref.items():
+            assert_near_equal(totals[key], val, 1e-8)
+
+
+if __name__ == "__main__":
+    unittest.main()
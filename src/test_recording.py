@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import openmdao.api as om
+
+from recording import PROFILES, add_recording_profile
+
+
+def _toy_problem():
+    # a small optimisation with a `perf` group, so the optimisation-history includes match
+    prob = om.Problem(reports=False)
+    pt = prob.model.add_subsystem("pt", om.Group())
+    pt.add_subsystem("perf", om.ExecComp(["f = (x - 3.0)**2 + x * y + (y + 4.0)**2 - 3.0", "g = x + y"]))
+    prob.model.add_design_var("pt.perf.x", lower=-50.0, upper=50.0)
+    prob.model.add_design_var("pt.perf.y", lower=-50.0, upper=50.0)
+    prob.model.add_objective("pt.perf.f")
+    prob.model.add_constraint("pt.perf.g", lower=0.0)
+    prob.driver = om.ScipyOptimizeDriver(optimizer="SLSQP", tol=1e-9, disp=False)
+    return prob
+
+
+def _add_plain_recorder(prob, profile, filepath):
+    settings = PROFILES[profile]
+    target = prob.driver if settings["target"] == "driver" else prob.model
+    target.add_recorder(om.SqliteRecorder(filepath, record_viewer_data=settings["record_viewer_data"]))
+    for name, val in settings["options"].items():
+        target.recording_options[name] = val
+
+
+def _record(out_dir, batched):
+    os.makedirs(out_dir)
+    paths = {profile: os.path.join(out_dir, f"{profile}.sql") for profile in ("optimisation-history", "full-debug")}
+    prob = _toy_problem()
+    for profile, path in paths.items():
+        if batched:
+            add_recording_profile(prob, profile, path, batch_size=3)
+        else:
+            _add_plain_recorder(prob, profile, path)
+    prob.setup()
+    prob.run_driver()
+    prob.cleanup()
+    return {profile: om.CaseReader(path) for profile, path in paths.items()}
+
+
+class BatchedSqliteRecorderTestCase(unittest.TestCase):
+
+    def test_same_cases_as_sqlite_recorder(self):
+        out_dir = tempfile.mkdtemp()
+        batched = _record(os.path.join(out_dir, "batched"), True)
+        plain = _record(os.path.join(out_dir, "plain"), False)
+
+        for profile, source in [("optimisation-history", "driver"), ("full-debug", "root")]:
+            with self.subTest(profile=profile):
+                cases = batched[profile].list_cases(source, recurse=False, out_stream=None)
+                expected = plain[profile].list_cases(source, recurse=False, out_stream=None)
+                self.assertGreater(len(expected), 1)
+                self.assertEqual(cases, expected)
+
+                for name in expected:
+                    case = batched[profile].get_case(name)
+                    ref = plain[profile].get_case(name)
+                    self.assertEqual(case.counter, ref.counter)
+                    for attr in ("outputs", "inputs", "residuals"):
+                        vals, ref_vals = getattr(case, attr), getattr(ref, attr)
+                        if ref_vals is None:
+                            self.assertIsNone(vals)
+                            continue
+                        self.assertEqual(sorted(vals.keys()), sorted(ref_vals.keys()))
+                        for key in ref_vals.keys():
+                            np.testing.assert_array_equal(vals[key], ref_vals[key])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import io
+import unittest
+
+import openmdao.api as om
+import pycycle.api as pyc
+
+from optim_hbtf import MPhbtf
+from report import HBTF_LAYOUT, write_report
+
+
+def _viewer(prob, pt, file):
+    # the viewer optim_hbtf used before write_report, built on the pyc.print_* helpers
+    summary_data = tuple(prob[f"{pt}.{var}"].item() for var in (
+        "fc.Fl_O:stat:MN", "fc.alt", "inlet.Fl_O:stat:W", "perf.Fn", "perf.Fg", "inlet.F_ram", "perf.OPR",
+        "perf.TSFC", "splitter.BPR"))
+
+    print(file=file)
+    print(file=file)
+    print(file=file)
+    print("----------------------------------------------------------------------------", file=file)
+    print("                              POINT:", pt, file=file)
+    print("----------------------------------------------------------------------------", file=file)
+    print("                       PERFORMANCE CHARACTERISTICS", file=file)
+    print("    Mach      Alt       W      Fn      Fg    Fram     OPR     TSFC      BPR ", file=file)
+    print(" %7.5f  %7.1f %7.3f %7.1f %7.1f %7.1f %7.3f  %7.5f  %7.3f" % summary_data, file=file)
+
+    pyc.print_flow_station(prob, [f"{pt}.{fs}" for fs in HBTF_LAYOUT["flow_stations"]], file=file)
+    pyc.print_compressor(prob, [f"{pt}.{c}" for c in HBTF_LAYOUT["compressors"]], file=file)
+    pyc.print_burner(prob, [f"{pt}.{b}" for b in HBTF_LAYOUT["burners"]], file=file)
+    pyc.print_turbine(prob, [f"{pt}.{t}" for t in HBTF_LAYOUT["turbines"]], file=file)
+    pyc.print_nozzle(prob, [f"{pt}.{n}" for n in HBTF_LAYOUT["nozzles"]], file=file)
+    pyc.print_shaft(prob, [f"{pt}.{s}" for s in HBTF_LAYOUT["shafts"]], file=file)
+    pyc.print_bleed(prob, [f"{pt}.{b}" for b in HBTF_LAYOUT["bleeds"]], file=file)
+
+
+class ReportTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # the values need not be converged, only reported alike: a single pass through the points
+        cls.prob = prob = om.Problem(reports=False)
+        prob.model = MPhbtf()
+        prob.setup()
+        prob.set_solver_print(level=-1)
+        for pt in ["DESIGN"] + prob.model.od_pts:
+            solver = prob.model._get_subsystem(pt).nonlinear_solver
+            solver.options["maxiter"] = 0
+            solver.options["err_on_non_converge"] = False
+        prob.run_model()
+
+    def test_text_matches_pyc_viewers(self):
+        for pt in ["DESIGN"] + self.prob.model.od_pts:
+            with self.subTest(pt=pt):
+                expected = io.StringIO()
+                _viewer(self.prob, pt, expected)
+                text = io.StringIO()
+                write_report(self.prob, [pt], file=text)
+                self.assertEqual(text.getvalue().splitlines(), expected.getvalue().splitlines())
+
+
+if __name__ == "__main__":
+    unittest.main()
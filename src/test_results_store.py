@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from results_store import ResultsStore
+
+
+def _write(path, writer, num_rows):
+    with ResultsStore(path, chunk_size=2) as store:
+        for i in range(num_rows):
+            store.append_record({"run_id": f"writer_{writer}_row_{i}", "Fn": float(i)})
+
+
+class ResultsStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_string_columns_keep_full_width(self):
+        with ResultsStore(self.path) as store:
+            store.append_record({"run_id": "f", "Fn": 1.0})
+            store.append_record({"run_id": "fn_des_16000_t4_1850", "Fn": 2.0})
+            store.append_record({"Fn": 3.0})
+
+        run_ids = ResultsStore(self.path).query(columns=["run_id"])["run_id"]
+        self.assertEqual(list(run_ids), ["f", "fn_des_16000_t4_1850", ""])
+
+    def test_missing_columns_read_as_nan(self):
+        with ResultsStore(self.path, chunk_size=1) as store:
+            store.append_record({"run_id": "a", "Fn": 1.0})
+            store.append_record({"run_id": "b", "Fn": 2.0, "BPR": 5.0})
+
+        data = ResultsStore(self.path).query([("Fn", ">", 0.0)], ["run_id", "BPR"])
+        self.assertEqual(list(data["run_id"]), ["a", "b"])
+        np.testing.assert_array_equal(data["BPR"], [np.nan, 5.0])
+
+    def test_concurrent_writers(self):
+        # writers sharing one store must never overwrite each other's chunks
+        ctx = multiprocessing.get_context("spawn")
+        procs = [ctx.Process(target=_write, args=(self.path, writer, 40)) for writer in range(4)]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+            self.assertEqual(proc.exitcode, 0)
+
+        store = ResultsStore(self.path)
+        run_ids = store.query(columns=["run_id"])["run_id"]
+        self.assertEqual(len(store), 160)
+        self.assertEqual(len(set(run_ids)), 160)
+        self.assertFalse([name for name in os.listdir(self.path) if name.startswith("tmp_")])
+
+    def test_compact(self):
+        with ResultsStore(self.path, chunk_size=1) as store:
+            for i in range(3):
+                store.append_record({"run_id": f"run_{i}", "Fn": float(i)})
+            store.compact()
+
+        store = ResultsStore(self.path)
+        self.assertEqual(len(store._chunks()), 1)
+        np.testing.assert_array_equal(store.query(columns=["Fn"])["Fn"], [0.0, 1.0, 2.0])
+
+    def test_compact_by_another_store(self):
+        # a reader that has already listed the chunks must see the merged chunk that replaces them
+        with ResultsStore(self.path, chunk_size=1) as store:
+            for i in range(3):
+                store.append_record({"run_id": f"run_{i}", "Fn": float(i)})
+
+        reader = ResultsStore(self.path)
+        self.assertEqual(len(reader), 3)
+        ResultsStore(self.path).compact()
+
+        self.assertEqual(len(reader), 3)
+        data = reader.query([("Fn", ">", 0.5)], ["run_id"])
+        self.assertEqual(list(data["run_id"]), ["run_1", "run_2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import openmdao.api as om
+from openmdao.utils.assert_utils import assert_near_equal
+
+from optim_hbtf import MPhbtf
+from setup_cache import cached_setup
+from sweep import _hbtf_setup
+
+
+def _build():
+    prob = om.Problem(reports=False)
+    prob.model = MPhbtf()
+    return prob
+
+
+def _solve(prob):
+    # the design point converged, the off-design point only evaluated once to keep it short
+    _hbtf_setup(prob)
+    prob.set_solver_print(level=-1)
+    for pt in prob.model.od_pts:
+        solver = prob.model._get_subsystem(pt).nonlinear_solver
+        solver.options["maxiter"] = 0
+        solver.options["err_on_non_converge"] = False
+    prob.run_model()
+
+
+class SetupCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_restored_problem_solves_like_a_cold_setup(self):
+        cached_setup(_build, cache_dir=self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+        with mock.patch.object(om.Problem, "setup", side_effect=AssertionError("set up again")):
+            restored = cached_setup(_build, cache_dir=self.cache_dir)
+        _solve(restored)
+
+        cold = _build()
+        cold.setup()
+        _solve(cold)
+
+        for name, val in cold.model.list_outputs(out_stream=None, return_format="dict").items():
+            assert_near_equal(restored.get_val(name), val["val"], 1e-12)
+        for name, val in cold.model.list_inputs(out_stream=None, return_format="dict").items():
+            assert_near_equal(restored.get_val(name), val["val"], 1e-12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+import numpy as np
+import openmdao.api as om
+
+from surrogate_opt import CycleEvaluator, surrogate_optimize
+
+
+class _ToyCycle(om.Group):
+    # a single design point with a smooth objective and a linear constraint; optimum at
+    # x = 0.75, y = 0.25 on the constraint x + y <= 1
+
+    def setup(self):
+        self.od_pts = []
+        pt = self.add_subsystem("DESIGN", om.Group())
+        pt.add_subsystem("comp", om.ExecComp(["f = (x - 1.0)**2 + (y - 0.5)**2", "g = x + y"]))
+        pt.nonlinear_solver = om.NewtonSolver(solve_subsystems=False, iprint=-1)
+        pt.linear_solver = om.DirectSolver()
+
+
+def _toy_problem():
+    prob = om.Problem(reports=False)
+    prob.model = _ToyCycle()
+    prob.setup()
+    prob.final_setup()
+    prob.set_solver_print(level=-1)
+    return prob
+
+
+DESIGN_VARS = {
+    "DESIGN.comp.x": {"lower": -1.0, "upper": 2.0},
+    "DESIGN.comp.y": {"lower": -1.0, "upper": 2.0},
+}
+OBJECTIVE = ("DESIGN.comp.f", {})
+CONSTRAINTS = {"DESIGN.comp.g": {"upper": 1.0}}
+
+
+class SurrogateOptTestCase(unittest.TestCase):
+
+    def test_evaluator(self):
+        prob = _toy_problem()
+        evaluate = CycleEvaluator(prob, DESIGN_VARS, {"DESIGN.comp.f": None, "DESIGN.comp.g": None})
+        np.testing.assert_allclose(evaluate([0.0, 0.5]), [1.0, 0.5])
+        self.assertEqual(len(evaluate.X), 1)
+
+    def test_improves_on_samples(self):
+        prob = _toy_problem()
+        result = surrogate_optimize(prob, DESIGN_VARS, OBJECTIVE, CONSTRAINTS, n_init=8, seed=1)
+
+        # the best of the initial Latin hypercube samples alone
+        initial = surrogate_optimize(_toy_problem(), DESIGN_VARS, OBJECTIVE, CONSTRAINTS, n_init=8, seed=1,
+                                     max_infill=0)
+
+        self.assertTrue(result["feasible"])
+        self.assertLess(result["responses"]["DESIGN.comp.f"], initial["responses"]["DESIGN.comp.f"])
+        self.assertLess(result["responses"]["DESIGN.comp.f"], 1.1 * 0.125)
+        # the last infill lands on the optimum, to the accuracy of the metamodel
+        np.testing.assert_allclose(result["history"][-1]["x"], [0.75, 0.25], atol=0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()